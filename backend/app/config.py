@@ -0,0 +1,155 @@
+import os
+
+
+def env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment."""
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def env_float(name: str, default: float) -> float:
+    """Read a float setting from the environment."""
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+# Inference executors: one bounded pool per model family. Detector forward
+# passes are serialized per model (the YOLOv8 predictor is not thread-safe),
+# so extra detector workers only overlap decoding and post-processing.
+DETECTOR_WORKERS = env_int("DETECTOR_WORKERS", 1)
+DETECTOR_MAX_QUEUE = env_int("DETECTOR_MAX_QUEUE", 8)
+DETECTOR_TIMEOUT_SECONDS = env_float("DETECTOR_TIMEOUT_SECONDS", 10.0)
+
+CLASSIFIER_WORKERS = env_int("CLASSIFIER_WORKERS", 1)
+CLASSIFIER_MAX_QUEUE = env_int("CLASSIFIER_MAX_QUEUE", 8)
+CLASSIFIER_TIMEOUT_SECONDS = env_float("CLASSIFIER_TIMEOUT_SECONDS", 15.0)
+
+# Seconds suggested to clients in the Retry-After header when a queue is full
+RETRY_AFTER_SECONDS = env_int("RETRY_AFTER_SECONDS", 1)
+
+# Micro-batching for /detect-base64; a max batch size of 1 disables batching
+DETECT_BATCH_MAX_SIZE = env_int("DETECT_BATCH_MAX_SIZE", 8)
+DETECT_BATCH_MAX_WAIT_MS = env_float("DETECT_BATCH_MAX_WAIT_MS", 10.0)
+DETECT_BATCH_MAX_QUEUE = env_int("DETECT_BATCH_MAX_QUEUE", 64)
+
+# YOLOv8 input size (longer side, multiple of 32). DETECT_IMGSZ_PROFILES
+# overrides it per endpoint, e.g. "detect=640,detect-base64=512,stream=416";
+# endpoints are detect, detect-binary, detect-base64, stream and analyze.
+# Every DETECT_DOWNSCALE_QUEUE_DEPTH frames waiting for the detector shrink
+# the size by a quarter, down to DETECT_IMGSZ_MIN; 0 disables downscaling.
+DETECT_IMGSZ = env_int("DETECT_IMGSZ", 640)
+DETECT_IMGSZ_PROFILES = os.getenv("DETECT_IMGSZ_PROFILES", "")
+DETECT_IMGSZ_MIN = env_int("DETECT_IMGSZ_MIN", 320)
+DETECT_DOWNSCALE_QUEUE_DEPTH = env_int("DETECT_DOWNSCALE_QUEUE_DEPTH", 4)
+
+# Upper bound on images accepted by /api/classify-batch
+CLASSIFY_BATCH_MAX_IMAGES = env_int("CLASSIFY_BATCH_MAX_IMAGES", 64)
+
+# /api/analyze: detections classified per image (most confident first) and
+# the smallest box side, in pixels, worth cropping for the classifier
+ANALYZE_MAX_DETECTIONS = env_int("ANALYZE_MAX_DETECTIONS", 32)
+ANALYZE_MIN_CROP_SIZE = env_int("ANALYZE_MIN_CROP_SIZE", 16)
+
+# Where inference runs: "local" loads the models in every web worker;
+# "server" sends images over shared memory to one model server process
+# (python -m app.services.model_server) that owns the models. The socket
+# must sit in a directory only the service user can open; empty places it
+# in a per-user runtime directory. An empty auth key makes the server
+# generate one and share it through a 0600 file next to the socket.
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "local")
+MODEL_SERVER_ADDRESS = os.getenv("MODEL_SERVER_ADDRESS", "")
+MODEL_SERVER_AUTHKEY = os.getenv("MODEL_SERVER_AUTHKEY", "").encode()
+# Shared-memory ring of each web worker: one slot per concurrent request
+MODEL_SERVER_SLOTS = env_int("MODEL_SERVER_SLOTS", 4)
+MODEL_SERVER_SLOT_MB = env_int("MODEL_SERVER_SLOT_MB", 8)
+# Model server placement: CPU list such as "0-3,6" (empty leaves affinity
+# alone) and torch intra-op threads (0 uses one per pinned CPU)
+MODEL_SERVER_CPUS = os.getenv("MODEL_SERVER_CPUS", "")
+MODEL_SERVER_TORCH_THREADS = env_int("MODEL_SERVER_TORCH_THREADS", 0)
+
+# Weight ledger: SQLite file shared by all workers, and the most weigh-ins
+# written per group commit
+WEIGHT_LEDGER_PATH = os.getenv("WEIGHT_LEDGER_PATH", "weight_ledger.db")
+WEIGHT_LEDGER_BATCH_MAX = env_int("WEIGHT_LEDGER_BATCH_MAX", 512)
+
+# Confidence routing in the classification cascade: when the general model
+# is at least this confident, E-waste / Organic images are answered from
+# per-class priors (ROUTE_PRIORS_PATH) or by stage two on a
+# ROUTE_LOW_RES_SIZE input instead of the full one; 0 disables a route
+ROUTE_PRIOR_THRESHOLD = env_float("ROUTE_PRIOR_THRESHOLD", 0.0)
+ROUTE_LOW_RES_THRESHOLD = env_float("ROUTE_LOW_RES_THRESHOLD", 0.0)
+ROUTE_LOW_RES_SIZE = env_int("ROUTE_LOW_RES_SIZE", 112)
+ROUTE_PRIORS_PATH = os.getenv("ROUTE_PRIORS_PATH", "sorting_models/route_priors.json")
+
+# Sampled profiling of inference jobs: this share of jobs runs under
+# cProfile, and the profile of any taking PROFILE_SLOW_SECONDS or longer
+# is saved to PROFILE_DIR (0 disables)
+PROFILE_SAMPLE_RATE = env_float("PROFILE_SAMPLE_RATE", 0.0)
+PROFILE_SLOW_SECONDS = env_float("PROFILE_SLOW_SECONDS", 1.0)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+# Models loaded in the background at startup: comma separated registry names
+# (yolo, general, ewaste, organic, and yolo-s, ... for extra detector tiers),
+# "all", or empty to load everything lazily. Inference requests get a 503
+# with Retry-After until these have loaded
+WARMUP_MODELS = os.getenv("WARMUP_MODELS", "all")
+
+# Runtime for the organic food classifier: torch, onnx or tf (needs tensorflow-cpu)
+ORGANIC_BACKEND = os.getenv("ORGANIC_BACKEND", "torch")
+ORGANIC_ONNX_PATH = os.getenv("ORGANIC_ONNX_PATH", "sorting_models/food_classifier.onnx")
+
+# Serving backend for the detector and the general / e-waste classifiers:
+# eager (PyTorch), onnx or torchscript, using graphs from scripts/export_models.py
+DETECTOR_BACKEND = os.getenv("DETECTOR_BACKEND", "eager")
+CLASSIFIER_BACKEND = os.getenv("CLASSIFIER_BACKEND", "eager")
+ONNX_INTRA_OP_THREADS = env_int("ONNX_INTRA_OP_THREADS", 2)
+
+# Ladder of YOLOv8 sizes served by the detector, smallest first (e.g. "n,s,m").
+# Each request runs on the largest tier whose estimated latency, times the
+# frames already waiting, fits DETECTOR_LATENCY_SLO_MS. With
+# DETECTOR_ESCALATE_CONFIDENCE > 0, results whose best detection is below it
+# are re-run on the next tier when there is headroom; 0 disables escalation.
+# Larger tiers are measured on a blank frame in the background while the
+# detector is idle, and only serve requests once their estimate fits. A
+# tier's estimate not refreshed for DETECTOR_TIER_REPROBE_SECONDS is
+# measured again that way (0 never re-probes).
+DETECTOR_TIERS = os.getenv("DETECTOR_TIERS", "n")
+DETECTOR_LATENCY_SLO_MS = env_float("DETECTOR_LATENCY_SLO_MS", 200.0)
+DETECTOR_ESCALATE_CONFIDENCE = env_float("DETECTOR_ESCALATE_CONFIDENCE", 0.0)
+DETECTOR_TIER_REPROBE_SECONDS = env_float("DETECTOR_TIER_REPROBE_SECONDS", 30.0)
+
+# INT8 serving: comma separated models (general, ewaste, yolo) to serve from
+# quantized graphs, used only if scripts/quantize_models.py approved them
+QUANTIZED_MODELS = os.getenv("QUANTIZED_MODELS", "")
+QUANTIZATION_MIN_AGREEMENT = env_float("QUANTIZATION_MIN_AGREEMENT", 0.98)
+QUANTIZATION_MANIFEST = os.getenv("QUANTIZATION_MANIFEST", "sorting_models/quantization.json")
+
+# Content-addressed result cache for /api/classify and /detect-base64.
+# RESULT_CACHE_MAX_BYTES=0 disables it; RESULT_CACHE_DISK_PATH adds a SQLite
+# tier shared by workers, pruned of expired rows and capped at
+# RESULT_CACHE_DISK_MAX_ROWS (0 leaves only the TTL); RESULT_CACHE_PHASH_DISTANCE
+# >= 0 enables near-duplicate hits within that many differing perceptual-hash bits.
+RESULT_CACHE_MAX_BYTES = env_int("RESULT_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+RESULT_CACHE_TTL_SECONDS = env_float("RESULT_CACHE_TTL_SECONDS", 300.0)
+RESULT_CACHE_DISK_PATH = os.getenv("RESULT_CACHE_DISK_PATH", "")
+RESULT_CACHE_DISK_MAX_ROWS = env_int("RESULT_CACHE_DISK_MAX_ROWS", 100000)
+RESULT_CACHE_PHASH_DISTANCE = env_int("RESULT_CACHE_PHASH_DISTANCE", -1)
+
+# Concurrent requests for the same image share one inference pass; 0 disables
+COALESCE_REQUESTS = env_int("COALESCE_REQUESTS", 1)
+
+# Tracking mode for /ws/detect?track=true: full detection every Nth frame or
+# on scene change (mean abs difference of 32x32 thumbnails, 0-255)
+TRACK_DETECT_EVERY = env_int("TRACK_DETECT_EVERY", 5)
+TRACK_SCENE_CHANGE_THRESHOLD = env_float("TRACK_SCENE_CHANGE_THRESHOLD", 12.0)
+TRACK_IOU_THRESHOLD = env_float("TRACK_IOU_THRESHOLD", 0.3)
+TRACK_MAX_MISSES = env_int("TRACK_MAX_MISSES", 2)
+TRACK_CONFIDENCE_SMOOTHING = env_float("TRACK_CONFIDENCE_SMOOTHING", 0.5)
+
+# Region-of-interest keyframes for /ws/detect?track=true&roi=true: detect on
+# the tracked area plus TRACK_ROI_MARGIN (fraction of its size), with a
+# full-frame keyframe every TRACK_ROI_FULL_EVERY keyframes or when the area
+# would cover more than TRACK_ROI_MAX_AREA of the frame
+TRACK_ROI_MARGIN = env_float("TRACK_ROI_MARGIN", 0.25)
+TRACK_ROI_FULL_EVERY = env_int("TRACK_ROI_FULL_EVERY", 4)
+TRACK_ROI_MAX_AREA = env_float("TRACK_ROI_MAX_AREA", 0.6)
@@ -1,6 +1,7 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Body
+from fastapi import FastAPI, File, UploadFile, HTTPException, Body, Depends, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+import asyncio
 import numpy as np
 import io
 from PIL import Image
@@ -8,10 +9,40 @@ import base64
 import cv2
 import time
 import os
-from app.models.detection import ObjectDetector
+from typing import Optional
+from app.models.detection import get_detector, tiered_detector, to_columns
 from app.routers import classification
+from app import config
+from app.services.batching import DetectionBatcher
+from app.services.classifier import classifier
+from app.services.model_registry import ModelsWarmingUpError, registry, require_warm_models
+from app.services.image_io import decode_base64_bytes, decode_image_buffer, read_image_upload
+from app.services.metrics import (
+    LATENCY_SECONDS_BUCKETS,
+    Callback,
+    Histogram,
+    merge_families,
+    metrics,
+    render_prometheus,
+    with_labels,
+)
+from app.services.model_server import ModelServerUnavailableError, model_client
+from app.services.profiling import profiler
+from app.services.resolution import resolution
+from app.services.result_cache import cached_inference, result_cache, single_flight
+from app.services.serialization import FastJSONResponse, dumps, dumps_msgpack, encode_response, wants_msgpack
+from app.services.tiering import scheduler
+from app.services.weight_ledger import weight_ledger
+from app.services.tracking import DetectionSession, IouTracker
+from app.services.executor import (
+    InferenceTimeoutError,
+    InferenceUnavailableError,
+    QueueFullError,
+    classifier_executor,
+    detector_executor,
+)
 
-app = FastAPI(title="Sort-IQ Waste Classifier API")
+app = FastAPI(title="Sort-IQ Waste Classifier API", default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,89 +50,463 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Cache", "Retry-After"],
 )
 
 app.include_router(classification.router, prefix="/api", tags=["Classification"])
 
-detector = None
+def detect_buffer(contents: bytes, imgsz: Optional[int] = None):
+    return get_detector().detect_from_buffer(contents, imgsz)
+
+
+def detect_array(image_np: np.ndarray, scale: float = 1, imgsz: Optional[int] = None):
+    return get_detector().detect_array(image_np, scale, imgsz)
+
+
+
+def warmup_models():
+    """Registry names listed in WARMUP_MODELS ("all" expands to every model)."""
+    return registry.parse_names(config.WARMUP_MODELS)
+
+
+def warm_up(names=None):
+    """Load the given models, then measure the larger detector tiers before requests need them."""
+    registry.warm_up(names)
+    tiered_detector.start_probes()
+
+
+detection_batcher = DetectionBatcher(
+    get_detector,
+    detector_executor,
+    max_batch_size=config.DETECT_BATCH_MAX_SIZE,
+    max_wait_ms=config.DETECT_BATCH_MAX_WAIT_MS,
+    max_queue=config.DETECT_BATCH_MAX_QUEUE,
+)
+resolution.add_load(lambda: detection_batcher.queue_depth)
+scheduler.add_load(lambda: detection_batcher.queue_depth)
+
+
+REQUEST_SECONDS = metrics.register(Histogram(
+    "http_request_seconds",
+    "HTTP request latency per route and status",
+    LATENCY_SECONDS_BUCKETS,
+    labels=("method", "route", "status"),
+))
+metrics.register(detection_batcher.batch_size)
+metrics.register(detection_batcher.queue_wait)
+metrics.register(Callback(
+    "inference_executor_in_flight",
+    "Jobs running or queued on each inference executor",
+    lambda: {(e.name,): e.in_flight for e in (detector_executor, classifier_executor)},
+    labels=("executor",),
+))
+metrics.register(Callback(
+    "inference_executor_queue_depth",
+    "Jobs waiting for a worker on each inference executor",
+    lambda: {(e.name,): e.queue_depth for e in (detector_executor, classifier_executor)},
+    labels=("executor",),
+))
+metrics.register(Callback(
+    "detect_batch_queue_depth", "Frames waiting for the detection micro-batcher", lambda: detection_batcher.queue_depth
+))
+
+
+def result_cache_lookups(stats):
+    # "hits" also counts near and disk hits; split them so the outcomes add up to all lookups
+    return {
+        ("hit",): stats["hits"] - stats["near_hits"] - stats["disk_hits"],
+        ("near_hit",): stats["near_hits"],
+        ("disk_hit",): stats["disk_hits"],
+        ("miss",): stats["misses"],
+    }
+
+
+metrics.register(Callback(
+    "result_cache_lookups",
+    "Result cache lookups by outcome",
+    lambda: result_cache_lookups(result_cache.stats()),
+    labels=("outcome",),
+    kind="counter",
+))
+metrics.register(Callback("result_cache_bytes", "Encoded size of the in-memory result cache", lambda: result_cache.stats()["bytes"]))
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not the raw path, to keep cardinality bounded
+        route = request.scope.get("route")
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - start, request.method, getattr(route, "path", "unmatched"), str(status)
+        )
+
+
+@app.exception_handler(QueueFullError)
+async def queue_full_handler(request, exc: QueueFullError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(ModelServerUnavailableError)
+async def model_server_unavailable_handler(request, exc: ModelServerUnavailableError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(ModelsWarmingUpError)
+async def models_warming_up_handler(request, exc: ModelsWarmingUpError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(InferenceTimeoutError)
+async def inference_timeout_handler(request, exc: InferenceTimeoutError):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
 
 @app.on_event("startup")
 async def startup_event():
-    global detector
-    try:
-        detector = ObjectDetector(model_path="yolov8n.pt", confidence_threshold=0.25)
-        print("YOLOv8 model loaded successfully")
-    except Exception as e:
-        print(f"Error loading YOLOv8 model: {e}")
+    if config.INFERENCE_MODE == "server":
+        # The model server loads and warms up the models itself
+        return
+    names = warmup_models()
+    if names:
+        # Warm up off the event loop so the server starts accepting requests
+        # (and answering /ready) while the models load.
+        asyncio.get_running_loop().run_in_executor(None, warm_up, names)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await detection_batcher.stop()
+    detector_executor.shutdown()
+    classifier_executor.shutdown()
+    weight_ledger.close()
+    if config.INFERENCE_MODE == "server":
+        model_client.close()
 
 @app.get("/")
 async def root():
     return {"message": "Sort-IQ Waste Classifier API is running"}
 
-@app.post("/detect")
-async def detect_waste(file: UploadFile = File(...)):
+@app.get("/ready")
+async def readiness():
+    """Report each model's load state; 503 until warm-up models are loaded."""
+    if config.INFERENCE_MODE == "server":
+        try:
+            status = await asyncio.get_running_loop().run_in_executor(None, model_client.status)
+        except ModelServerUnavailableError as e:
+            return JSONResponse(status_code=503, content={"ready": False, "error": str(e)})
+        return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+    
+    ready = all(registry.is_loaded(name) for name in warmup_models())
+    
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "models": registry.status()},
+    )
+
+@app.post("/warmup")
+async def warmup(models: Optional[str] = None):
+    """Start loading the given comma separated models (all by default)."""
+    names = [name.strip() for name in models.split(",")] if models else None
+    if config.INFERENCE_MODE == "server":
+        status = await asyncio.get_running_loop().run_in_executor(None, model_client.warm_up, names)
+        return {"models": status["models"]}
+    asyncio.get_running_loop().run_in_executor(None, warm_up, names)
+    return {"models": registry.status()}
+
+@app.get("/stats")
+async def inference_stats():
+    try:
+        routes = await asyncio.get_running_loop().run_in_executor(None, classifier.route_stats)
+    except InferenceUnavailableError as e:
+        routes = {"error": str(e)}
+    return {
+        "executors": {
+            "detector": detector_executor.stats(),
+            "classifier": classifier_executor.stats(),
+        },
+        "detect_batching": detection_batcher.stats(),
+        "detect_resolution": resolution.stats(),
+        "detector_tiers": scheduler.stats() if config.INFERENCE_MODE != "server" else None,
+        "classifier_routes": routes,
+        "result_cache": result_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "profiler": profiler.stats(),
+        "model_server": model_client.stats() if config.INFERENCE_MODE == "server" else None,
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Metrics in the Prometheus text format; model server metrics are labeled process="model-server"."""
+    families = metrics.collect()
+    if config.INFERENCE_MODE == "server":
+        try:
+            remote = await asyncio.get_running_loop().run_in_executor(None, model_client.call, "metrics")
+            families = merge_families(families, with_labels(remote, process="model-server"))
+        except InferenceUnavailableError as e:
+            print(f"Error collecting model server metrics: {str(e)}")
+    return PlainTextResponse(render_prometheus(families), media_type="text/plain; version=0.0.4")
+
+def detection_response(detections, format: Optional[str] = None):
+    """
+    Shape detections into the response shared by /detect, /detect-base64 and /ws/detect.
+
+    Detections arrive sorted by confidence. With ``format="columnar"`` they
+    are returned as parallel arrays under ``columns`` instead of a list of
+    objects under ``all_detections``. ``tier`` names the YOLOv8 model that
+    produced them (absent for frames answered by the tracker).
+    """
+    if detections:
+        top_detection = detections[0]
+        
+        response = {
+            "success": True,
+            "top_detection": top_detection,
+            "message": f"Classified as {top_detection['waste_category']} (from {top_detection['class_name']})"
+        }
+        if "tier" in top_detection:
+            response["tier"] = top_detection["tier"]
+        if format == "columnar":
+            response["columns"] = to_columns(detections)
+        else:
+            response["all_detections"] = detections
+        return response
+    else:
+        return {
+            "success": False,
+            "message": "No waste detected or confidence too low"
+        }
+
+@app.post("/detect", dependencies=[Depends(require_warm_models)])
+async def detect_waste(request: Request, file: UploadFile = File(...), format: Optional[str] = None):
     if not file:
         raise HTTPException(status_code=400, detail="No file uploaded")
     
     try:
         contents = await file.read()
         
-        if detector is None:
-            raise HTTPException(status_code=500, detail="Model not loaded")
-        
-        detections = detector.detect_from_image(contents)
+        detections = await detector_executor.run(detect_buffer, contents, resolution.imgsz("detect"))
         
-        if detections:
-            detections.sort(key=lambda x: x["confidence"], reverse=True)
-            top_detection = detections[0]
+        return encode_response(detection_response(detections, format), request.headers.get("accept"))
             
-            return {
-                "success": True,
-                "top_detection": top_detection,
-                "all_detections": detections,
-                "message": f"Classified as {top_detection['waste_category']} (from {top_detection['class_name']})"
-            }
-        else:
-            return {
-                "success": False,
-                "message": "No waste detected or confidence too low"
-            }
+    except (HTTPException, InferenceUnavailableError):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
+
+@app.post("/detect-binary", dependencies=[Depends(require_warm_models)])
+async def detect_waste_binary(request: Request, format: Optional[str] = None):
+    """Detect waste in an image sent as the raw request body or a multipart file."""
+    contents = await read_image_upload(request)
+    if not contents:
+        raise HTTPException(status_code=400, detail="No image data provided")
+    
+    try:
+        imgsz = resolution.imgsz("detect-binary")
+        detections, cache_status = await cached_inference(
+            result_cache, f"detect@{imgsz}", contents, lambda: detector_executor.run(detect_buffer, contents, imgsz)
+        )
+        headers = {"X-Cache": cache_status} if cache_status is not None else None
+        
+        return encode_response(detection_response(detections, format), request.headers.get("accept"), headers=headers)
             
+    except (HTTPException, InferenceUnavailableError):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
-@app.post("/detect-base64")
-async def detect_waste_base64(data: dict = Body(...)):
+async def detect_frame(image_bytes: bytes, imgsz: int):
+    """Decode a frame off the event loop, no larger than ``imgsz`` needs, and run it through the detector.
+
+    Undecodable frames raise ValueError rather than returning no
+    detections, so the result cache never stores the failure.
+    """
+    loop = asyncio.get_running_loop()
+    image_np, factor = await loop.run_in_executor(None, lambda: decode_image_buffer(image_bytes, max_side=imgsz))
+    
+    return await detect_decoded(image_np, imgsz, factor)
+
+async def detect_decoded(image_np: np.ndarray, imgsz: Optional[int] = None, scale: float = 1):
+    """Run a decoded frame through the micro-batcher, or straight on the executor."""
+    if detection_batcher.enabled:
+        return await detection_batcher.submit(image_np, imgsz, scale)
+    return await detector_executor.run(detect_array, image_np, scale, imgsz)
+
+async def detect_frame_cached(image_bytes: bytes, imgsz: int):
+    """detect_frame behind the result cache and request coalescing; returns (detections, cache status or None)."""
+    return await cached_inference(
+        result_cache, f"detect@{imgsz}", image_bytes, lambda: detect_frame(image_bytes, imgsz)
+    )
+
+@app.post("/detect-base64", dependencies=[Depends(require_warm_models)])
+async def detect_waste_base64(request: Request, data: dict = Body(...), format: Optional[str] = None):
+    """
+    Detect waste in a base64 encoded image.
+
+    The response is JSON, or MessagePack when the Accept header asks for
+    application/msgpack.
+    """
     if "image" not in data:
         raise HTTPException(status_code=400, detail="No image data provided")
     
     try:
-        base64_image = data["image"]
+        loop = asyncio.get_running_loop()
+        try:
+            image_bytes = await loop.run_in_executor(None, decode_base64_bytes, data["image"])
+        except ValueError as e:
+            print(f"Error processing base64 image: {str(e)}")
+            image_bytes = None
         
-        if detector is None:
-            raise HTTPException(status_code=500, detail="Model not loaded")
+        detections, headers = [], None
+        if image_bytes is not None:
+            try:
+                detections, cache_status = await detect_frame_cached(image_bytes, resolution.imgsz("detect-base64"))
+            except ValueError as e:
+                print(f"Error decoding image: {str(e)}")
+            else:
+                if cache_status is not None:
+                    headers = {"X-Cache": cache_status}
         
-        detections = detector.detect_from_base64(base64_image)
-        
-        if detections:
-            detections.sort(key=lambda x: x["confidence"], reverse=True)
-            top_detection = detections[0]
-            
-            return {
-                "success": True,
-                "top_detection": top_detection,
-                "all_detections": detections,
-                "message": f"Classified as {top_detection['waste_category']} (from {top_detection['class_name']})"
-            }
-        else:
-            return {
-                "success": False,
-                "message": "No waste detected or confidence too low"
-            }
+        return encode_response(detection_response(detections, format), request.headers.get("accept"), headers=headers)
             
+    except (HTTPException, InferenceUnavailableError):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
+@app.websocket("/ws/detect")
+async def detect_waste_stream(
+    websocket: WebSocket,
+    track: bool = False,
+    every: Optional[int] = None,
+    roi: bool = False,
+    format: Optional[str] = None,
+):
+    """
+    Stream detections for live camera frames.
+
+    Clients send binary JPEG/PNG frames (base64 text frames are accepted
+    too). Only the newest frame is kept while inference is busy, so a slow
+    pass drops stale frames instead of building a backlog. Each reply has
+    the /detect-base64 response shape plus the frame number and how many
+    frames were dropped so far.
+
+    With ``?track=true`` full detection only runs every ``every``-th frame
+    or on a scene change; other frames are answered by the session tracker,
+    and every detection carries a stable ``track_id``. Adding ``&roi=true``
+    runs most keyframes on the area around the tracks only; keyframe
+    replies then carry that ``roi`` as [left, top, right, bottom], or null
+    for a full-frame pass. ``?format=columnar`` sends detections as
+    parallel arrays, as on the HTTP endpoints. Replies are JSON text
+    frames, or binary MessagePack frames when the handshake's Accept header
+    asks for application/msgpack.
+    """
+    await websocket.accept()
+    msgpack_replies = wants_msgpack(websocket.headers.get("accept"))
+    session = None
+    if track:
+        session = DetectionSession(
+            detect_decoded,
+            detect_every=every or config.TRACK_DETECT_EVERY,
+            scene_change_threshold=config.TRACK_SCENE_CHANGE_THRESHOLD,
+            tracker=IouTracker(
+                iou_threshold=config.TRACK_IOU_THRESHOLD,
+                max_misses=config.TRACK_MAX_MISSES,
+                smoothing=config.TRACK_CONFIDENCE_SMOOTHING,
+            ),
+            imgsz=lambda: resolution.imgsz("stream"),
+            roi_full_every=config.TRACK_ROI_FULL_EVERY if roi else 0,
+            roi_margin=config.TRACK_ROI_MARGIN,
+            roi_max_area=config.TRACK_ROI_MAX_AREA,
+        )
+    state = {"frame": None, "received": 0, "dropped": 0, "closed": False}
+    frame_ready = asyncio.Event()
+    
+    async def receive_frames():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                frame = message.get("bytes")
+                if frame is None and message.get("text"):
+                    try:
+                        frame = decode_base64_bytes(message["text"])
+                    except ValueError:
+                        continue
+                if not frame:
+                    continue
+                if state["frame"] is not None:
+                    state["dropped"] += 1
+                state["frame"] = frame
+                state["received"] += 1
+                frame_ready.set()
+        finally:
+            state["closed"] = True
+            frame_ready.set()
+    
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            await frame_ready.wait()
+            frame_ready.clear()
+            if state["closed"]:
+                break
+            frame, state["frame"] = state["frame"], None
+            if frame is None:
+                continue
+            
+            frame_number = state["received"]
+            try:
+                require_warm_models()
+                if session is None:
+                    detections, _ = await detect_frame_cached(frame, resolution.imgsz("stream"))
+                    message = detection_response(detections, format)
+                else:
+                    # Decode no larger than the stream's input size needs; the
+                    # session maps boxes back to the full frame
+                    max_side = resolution.base_imgsz("stream")
+                    image_np, factor = await asyncio.get_running_loop().run_in_executor(
+                        None, lambda: decode_image_buffer(frame, max_side=max_side)
+                    )
+                    detections, keyframe = await session.process(image_np, factor)
+                    message = detection_response(detections, format)
+                    message["keyframe"] = keyframe
+                    if keyframe and roi:
+                        message["roi"] = session.last_roi
+            except InferenceUnavailableError as e:
+                message = {"success": False, "message": str(e)}
+            except Exception as e:
+                message = {"success": False, "message": f"Error processing image: {str(e)}"}
+            message["frame"] = frame_number
+            message["dropped"] = state["dropped"]
+            if msgpack_replies:
+                await websocket.send_bytes(dumps_msgpack(message))
+            else:
+                await websocket.send_text(dumps(message).decode())
+    except (WebSocketDisconnect, RuntimeError):
+        # The client went away mid-send
+        pass
+    finally:
+        receiver.cancel()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
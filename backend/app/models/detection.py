@@ -1,10 +1,16 @@
-from ultralytics import YOLO
 import numpy as np
-import cv2
-from PIL import Image
-import io
-import base64
+import os
+import sys
+import threading
+import time
 from typing import List, Dict, Any, Tuple, Optional
+from app import config
+from app.services.image_io import decode_base64_bytes, decode_image_buffer
+from app.services.metrics import DETECTIONS, DETECTOR_TIER_PASSES, stage_timer
+from app.services.model_registry import registry
+from app.services.onnx_backend import exported_path
+from app.services.quantization import select_backend
+from app.services.tiering import TierScheduler, scheduler
 
 class WasteCategory:
     E_WASTE_USEFUL = 'e-waste-useful'
@@ -115,70 +121,386 @@ COCO_TO_WASTE_CATEGORY = {
     'bench': WasteCategory.NON_ORGANIC,
 }
 
+class Detection:
+    """
+    One detected box, kept in slots rather than a per-box dict.
+
+    Class names and categories are interned strings shared by every
+    detection. Detections still read like the dicts they replace
+    (``detection["bbox"]``, ``{**detection}``, ``"tier" in detection``) so
+    handlers, the tracker and the classifier keep working unchanged, and
+    app.services.serialization encodes them through ``to_dict``.
+    """
+
+    __slots__ = ("class_name", "waste_category", "confidence", "bbox", "tier")
+
+    FIELDS = ("class_name", "waste_category", "confidence", "bbox")
+
+    def __init__(self, class_name: str, waste_category: str, confidence: float, bbox: List[float], tier: Optional[str] = None):
+        self.class_name = class_name
+        self.waste_category = waste_category
+        self.confidence = confidence
+        self.bbox = bbox
+        self.tier = tier
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.FIELDS if self.tier is None else self.FIELDS + ("tier",)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.keys():
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.keys() else default
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: getattr(self, key) for key in self.keys()}
+
+    def __repr__(self) -> str:
+        return f"Detection({self.to_dict()!r})"
+
+
 class ObjectDetector:
-    def __init__(self, model_path="yolov8n.pt", confidence_threshold=0.25):
-        """Initialize the YOLOv8 object detector"""
-        self.model = YOLO(model_path)
+    def __init__(self, model_path="yolov8n.pt", confidence_threshold=0.25, backend="eager"):
+        """Initialize the YOLOv8 object detector
+
+        ``backend`` selects the eager PyTorch weights or the ONNX / TorchScript
+        graph written next to them by scripts/export_models.py; ultralytics
+        serves the exported graphs through the same predictor. Without an
+        exported graph the eager weights are served instead. A TorchScript
+        graph is traced at DETECT_IMGSZ, so it always runs at that size.
+        """
+        from ultralytics import YOLO
+
+        if backend != "eager":
+            exported = exported_path(model_path, backend)
+            if os.path.exists(exported):
+                model_path = exported
+            else:
+                print(f"{backend} graph {exported} is missing; serving {model_path} eagerly")
+                backend = "eager"
+        self.model = YOLO(model_path, task="detect")
+        self.backend = backend
+        self.imgsz = config.DETECT_IMGSZ
         self.confidence_threshold = confidence_threshold
+        # Class index -> name / waste category, built from the first result
+        self._class_lookup: Optional[Tuple[Dict[int, str], np.ndarray, np.ndarray]] = None
+        self._warmed_up = False
+        # The ultralytics predictor keeps per-call state (args, imgsz, batch),
+        # so forward passes on one instance must not overlap; decoding and
+        # post-processing still run in parallel across DETECTOR_WORKERS
+        self._predict_lock = threading.Lock()
         print(f"YOLOv8 model loaded from {model_path}")
     
-    def detect_from_image(self, image_data: bytes) -> List[Dict[str, Any]]:
+    def warm_up(self):
+        """Run one pass on a blank frame so predictor setup is not paid by a request"""
+        if self._warmed_up:
+            return
+        with self._predict_lock:
+            self.model(np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8), imgsz=self.imgsz, verbose=False)
+        self._warmed_up = True
+    
+    def detect_from_image(self, image_data: bytes, imgsz: Optional[int] = None) -> List[Dict[str, Any]]:
         """Detect objects in an image provided as bytes"""
-        image = Image.open(io.BytesIO(image_data))
-        
-        image_np = np.array(image)
-        
-        results = self.model(image_np, conf=self.confidence_threshold)
+        return self.detect_from_buffer(image_data, imgsz)
+    
+    def detect_from_buffer(self, buffer: bytes, imgsz: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Detect objects in raw upload bytes without intermediate copies
+
+        Large JPEGs are decoded at reduced scale, keeping the longer side at
+        least the model input size, and boxes are scaled back to the
+        original resolution.
+        """
+        imgsz = imgsz or self.imgsz
+        with stage_timer("detect.decode"):
+            image_np, factor = decode_image_buffer(buffer, max_side=imgsz, reuse=True)
         
-        return self._process_results(results)
+        return self.detect_array(image_np, scale=factor, imgsz=imgsz)
     
-    def detect_from_base64(self, base64_image: str) -> List[Dict[str, Any]]:
+    def detect_from_base64(self, base64_image: str, imgsz: Optional[int] = None) -> List[Dict[str, Any]]:
         """Detect objects in a base64 encoded image"""
         try:
-            if "base64," in base64_image:
-                base64_image = base64_image.split("base64,")[1]
-            
-            image_bytes = base64.b64decode(base64_image)
-            
-            image = Image.open(io.BytesIO(image_bytes))
-            
-            image_np = np.array(image)
-            
-            if image_np.shape[-1] == 4:
-                image_np = image_np[:, :, :3]
-            
-            results = self.model(image_np, conf=self.confidence_threshold)
-            
-            return self._process_results(results)
+            return self.detect_from_buffer(decode_base64_bytes(base64_image), imgsz)
         except Exception as e:
             print(f"Error processing base64 image: {str(e)}")
             return []
     
-    def _process_results(self, results) -> List[Dict[str, Any]]:
-        """Process YOLOv8 results into a standardized format"""
-        detections = []
-        result = results[0]  # Get the first result
+    def detect_array(self, image_np: np.ndarray, scale: float = 1, imgsz: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Detect objects in a decoded RGB image array, multiplying boxes by ``scale``
+
+        ``imgsz`` is the longer side of the network input (default
+        ``self.imgsz``); smaller sizes trade small-object recall for speed.
+        """
+        results, _ = self._forward(image_np, imgsz)
+        
+        with stage_timer("detect.postprocess"):
+            return self._process_results(results, scale)
+    
+    def input_size(self, imgsz: Optional[int] = None) -> int:
+        """Network input size of a pass asked to run at ``imgsz``"""
+        if not imgsz or self.backend == "torchscript":
+            return self.imgsz
+        return imgsz
+    
+    def _forward(self, images, imgsz: Optional[int] = None, verbose: bool = True):
+        """Run the model, returning its results and the seconds spent in the forward pass
+
+        The time is taken once the predictor lock is held, so waiting for
+        another worker's pass is not counted.
+        """
+        with stage_timer("detect.forward"), self._predict_lock:
+            start = time.perf_counter()
+            results = self.model(images, conf=self.confidence_threshold, imgsz=self.input_size(imgsz), verbose=verbose)
+            return results, time.perf_counter() - start
+    
+    def detect_batch(
+        self, images: List[np.ndarray], scales: Optional[List[float]] = None, imgsz: Optional[int] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Detect objects in several decoded images with one forward pass.
+
+        YOLOv8 letterboxes every image in the list to a common input size and
+        scales the boxes back to each original frame, so each entry of the
+        returned list matches what detect_from_base64 gives for that image.
+        ``scales`` multiplies each image's boxes, e.g. by its decode factor.
+        """
+        return self.detect_batch_timed(images, scales, imgsz)[0]
+    
+    def detect_batch_timed(
+        self, images: List[np.ndarray], scales: Optional[List[float]] = None, imgsz: Optional[int] = None
+    ) -> Tuple[List[List[Dict[str, Any]]], float]:
+        """detect_batch, also returning the seconds spent in the forward pass"""
+        results, forward_seconds = self._forward(images, imgsz, verbose=False)
+        
+        scales = scales or [1] * len(results)
+        with stage_timer("detect.postprocess"):
+            return [self._process_results([result], scale) for result, scale in zip(results, scales)], forward_seconds
+    
+    def _lookup(self, names: Dict[int, str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Arrays mapping class index -> class name and -> waste category."""
+        if self._class_lookup is None or self._class_lookup[0] is not names:
+            # Interned, so every Detection of a class shares the same two strings
+            class_names = np.array([sys.intern(names.get(i, str(i))) for i in range(max(names) + 1)], dtype=object)
+            categories = np.array(
+                [sys.intern(COCO_TO_WASTE_CATEGORY.get(name, WasteCategory.OTHERS)) for name in class_names],
+                dtype=object,
+            )
+            self._class_lookup = (names, class_names, categories)
+        return self._class_lookup[1], self._class_lookup[2]
+    
+    def _result_columns(self, result, scale: float = 1) -> Dict[str, np.ndarray]:
+        """
+        Detections of one YOLOv8 result as parallel arrays, most confident first.
+
+        Boxes, confidences and classes each come off the tensor in one
+        transfer; names and categories are looked up by class index.
+        """
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return {
+                "class_name": np.empty(0, dtype=object),
+                "waste_category": np.empty(0, dtype=object),
+                "confidence": np.empty(0),
+                "bbox": np.empty((0, 4)),
+            }
+        
+        xyxy = boxes.xyxy.cpu().numpy().astype(float)
+        conf = boxes.conf.cpu().numpy().astype(float)
+        cls = boxes.cls.cpu().numpy().astype(int)
+        
+        order = np.argsort(-conf, kind="stable")
+        xyxy, conf, cls = xyxy[order], conf[order], cls[order]
+        # [x, y, width, height]
+        bbox = np.concatenate([xyxy[:, :2], xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+        if scale != 1:
+            bbox *= scale
         
-        if result.boxes is not None:
-            boxes = result.boxes
-            for i, box in enumerate(boxes):
-                # Get box coordinates
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(float)
-                conf = float(box.conf[0].cpu().numpy())
-                cls = int(box.cls[0].cpu().numpy())
-                class_name = result.names[cls]
-                
-                # Map to waste category
-                waste_category = COCO_TO_WASTE_CATEGORY.get(class_name, WasteCategory.OTHERS)
-                
-                # Create detection object
-                detection = {
-                    "class_name": class_name,
-                    "waste_category": waste_category,
-                    "confidence": conf,
-                    "bbox": [float(x1), float(y1), float(x2-x1), float(y2-y1)]  # [x, y, width, height]
-                }
-                
-                detections.append(detection)
+        class_names, categories = self._lookup(result.names)
+        for index, count in zip(*np.unique(cls, return_counts=True)):
+            DETECTIONS.inc(class_names[index], categories[index], amount=int(count))
         
-        return detections
\ No newline at end of file
+        return {
+            "class_name": class_names[cls],
+            "waste_category": categories[cls],
+            "confidence": conf,
+            "bbox": bbox,
+        }
+    
+    def _process_results(self, results, scale: float = 1) -> List[Detection]:
+        """Process YOLOv8 results into a standardized format, sorted by confidence"""
+        columns = self._result_columns(results[0], scale)
+        
+        return [
+            Detection(class_name, waste_category, confidence, bbox)
+            for class_name, waste_category, confidence, bbox in zip(
+                columns["class_name"].tolist(),
+                columns["waste_category"].tolist(),
+                columns["confidence"].tolist(),
+                columns["bbox"].tolist(),
+            )
+        ]
+
+
+def to_columns(detections: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Compact columnar form of a detection list: one parallel array per field."""
+    columns = {"class_name": [], "waste_category": [], "confidence": [], "bbox": []}
+    if detections:
+        for key in columns:
+            columns[key] = [detection[key] for detection in detections]
+        if "track_id" in detections[0]:
+            columns["track_id"] = [detection.get("track_id") for detection in detections]
+    return columns
+
+
+class TieredDetector:
+    """
+    A ladder of YOLOv8 detectors (e.g. n / s / m) behind the ObjectDetector interface.
+
+    Every pass runs on the tier chosen by the TierScheduler, and its forward
+    time per image feeds the scheduler's estimate for that tier. Results
+    whose best detection is below DETECTOR_ESCALATE_CONFIDENCE are run again
+    on the next tier when the time the pass took leaves headroom. Each detection
+    carries the ``tier`` that produced it.
+
+    Larger tiers the scheduler has no fresh estimate for are loaded and
+    timed by a background probe, so requests never wait for their weights,
+    their warm-up or a pass that turns out to miss the SLO.
+    """
+
+    def __init__(self, scheduler: TierScheduler):
+        self.scheduler = scheduler
+        self.imgsz = config.DETECT_IMGSZ
+        self._probe_lock = threading.Lock()
+
+    def detector(self, tier: str) -> ObjectDetector:
+        return registry.get(tier_model_name(tier, self.scheduler.tiers))
+
+    def detect_from_image(self, image_data: bytes, imgsz: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.detect_from_buffer(image_data, imgsz)
+
+    def detect_from_base64(self, base64_image: str, imgsz: Optional[int] = None) -> List[Dict[str, Any]]:
+        try:
+            return self.detect_from_buffer(decode_base64_bytes(base64_image), imgsz)
+        except Exception as e:
+            print(f"Error processing base64 image: {str(e)}")
+            return []
+
+    def detect_from_buffer(self, buffer: bytes, imgsz: Optional[int] = None) -> List[Dict[str, Any]]:
+        imgsz = imgsz or self.imgsz
+        with stage_timer("detect.decode"):
+            image_np, factor = decode_image_buffer(buffer, max_side=imgsz, reuse=True)
+        return self.detect_array(image_np, scale=factor, imgsz=imgsz)
+
+    def detect_array(self, image_np: np.ndarray, scale: float = 1, imgsz: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.detect_batch([image_np], [scale], imgsz)[0]
+
+    def _run(self, tier: str, reason: str, images, scales, imgsz) -> Tuple[List[List[Dict[str, Any]]], float]:
+        """Detect on one tier, returning the results and the seconds the pass took."""
+        # Loading (possibly downloading) the weights and the predictor's first
+        # call stay outside the timing, or they would be taken for the
+        # tier's latency and keep it from ever being picked
+        detector = self.detector(tier)
+        detector.warm_up()
+        start = time.perf_counter()
+        results, forward_seconds = detector.detect_batch_timed(images, scales, imgsz)
+        elapsed = time.perf_counter() - start
+        # Only the forward pass is the tier's latency; time spent waiting for
+        # another worker's pass on the same model is load, not model speed
+        self.scheduler.observe(tier, forward_seconds / len(images))
+        DETECTOR_TIER_PASSES.inc(tier, reason, amount=len(images))
+        for detections in results:
+            for detection in detections:
+                detection["tier"] = tier
+        return results, elapsed
+
+    def probe(self, tiers: List[str]):
+        """Load, warm up and time each tier on a blank frame at the default input size."""
+        frame = np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)
+        for tier in tiers:
+            try:
+                detector = self.detector(tier)
+                detector.warm_up()
+                _, forward_seconds = detector.detect_batch_timed([frame], imgsz=self.imgsz)
+            except Exception as e:
+                print(f"Error probing detector tier '{tier}': {str(e)}")
+                continue
+            self.scheduler.observe(tier, forward_seconds)
+
+    def start_probes(self):
+        """Probe the tiers listed by the scheduler's probe_due() on a background thread, one probe at a time."""
+        tiers = self.scheduler.probe_due()
+        if not tiers or not self._probe_lock.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self.probe(tiers)
+            finally:
+                self._probe_lock.release()
+
+        threading.Thread(target=run, name="detector-tier-probe", daemon=True).start()
+
+    def detect_batch(
+        self, images: List[np.ndarray], scales: Optional[List[float]] = None, imgsz: Optional[int] = None
+    ) -> List[List[Dict[str, Any]]]:
+        scales = scales or [1] * len(images)
+        tier = self.scheduler.pick()
+        results, spent = self._run(tier, "scheduled", images, scales, imgsz)
+
+        low = [i for i, detections in enumerate(results) if self.scheduler.low_confidence(detections)]
+        larger = self.scheduler.escalation(tier, spent, len(low)) if low else None
+        if larger is not None:
+            escalated, _ = self._run(larger, "escalated", [images[i] for i in low], [scales[i] for i in low], imgsz)
+            for index, detections in zip(low, escalated):
+                results[index] = detections
+        self.start_probes()
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return self.scheduler.stats()
+
+
+def tier_model_name(tier: str, tiers: List[str]) -> str:
+    """Registry name of a tier; the smallest one keeps the name "yolo"."""
+    return "yolo" if tier == tiers[0] else f"yolo-{tier}"
+
+
+def _register_tier(tier: str):
+    name = tier_model_name(tier, scheduler.tiers)
+    weights = f"yolov8{tier}.pt"
+    registry.register(
+        name,
+        lambda: ObjectDetector(
+            model_path=weights,
+            confidence_threshold=0.25,
+            backend=select_backend(name, weights, config.DETECTOR_BACKEND),
+        ),
+    )
+
+
+for _tier in scheduler.tiers:
+    _register_tier(_tier)
+
+tiered_detector = TieredDetector(scheduler)
+
+
+def get_detector():
+    """The tiered YOLOv8 detector, or its model server proxy when INFERENCE_MODE=server."""
+    if config.INFERENCE_MODE == "server":
+        from app.services.model_server import remote_detector
+        return remote_detector
+    return tiered_detector
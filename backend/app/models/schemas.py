@@ -1,3 +1,4 @@
+from datetime import datetime
 from enum import Enum
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, List
@@ -19,14 +20,60 @@ class ClassificationResponse(BaseModel):
     category: Optional[WasteCategory] = None
     confidence: float
     recyclable: Optional[bool] = None
+    route: Optional[str] = Field(None, description="Cascade route: general, prior, low-res or full")
     error: Optional[str] = None
 
 
+class BatchClassificationRequest(BaseModel):
+    images: List[str] = Field(..., description="Base64 encoded images, classified in order")
+
+
+class BatchClassificationResponse(BaseModel):
+    results: List[ClassificationResponse]
+
+
+class AnalyzedDetection(BaseModel):
+    class_name: str
+    waste_category: str = Field(..., description="Category mapped from the COCO class")
+    confidence: float
+    bbox: List[float] = Field(..., description="[x, y, width, height] in original image pixels")
+    tier: Optional[str] = Field(None, description="YOLOv8 tier (n, s, m, ...) that found the object")
+    category: Optional[WasteCategory] = None
+    category_confidence: float = 0.0
+    recyclable: Optional[bool] = None
+    route: Optional[str] = None
+    error: Optional[str] = None
+
+
+class AnalyzeResponse(BaseModel):
+    success: bool
+    detections: List[AnalyzedDetection]
+    counts: Dict[WasteCategory, int]
+    message: str
+
+
 class WeightUpdateRequest(BaseModel):
     category: WasteCategory
     weight: float  # in kilograms
+    site: Optional[str] = Field(None, description="Sorting station the weigh-in comes from")
 
 
 class WeightSummaryResponse(BaseModel):
     weights: Dict[WasteCategory, float]
-    total_weight: float
\ No newline at end of file
+    total_weight: float
+
+
+class WeightHistoryBucket(BaseModel):
+    start: datetime
+    weights: Dict[WasteCategory, float]
+    total_weight: float
+
+
+class WeightHistoryResponse(BaseModel):
+    granularity: str
+    start: datetime
+    end: datetime
+    site: Optional[str] = None
+    buckets: List[WeightHistoryBucket]
+    weights: Dict[WasteCategory, float] = Field(..., description="Totals over the whole window")
+    total_weight: float
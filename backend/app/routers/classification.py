@@ -1,86 +1,258 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from app import config
+from app.models.detection import get_detector
 from app.models.schemas import (
+    AnalyzeResponse,
+    BatchClassificationRequest,
+    BatchClassificationResponse,
     ClassificationRequest,
     ClassificationResponse,
+    WeightHistoryBucket,
+    WeightHistoryResponse,
     WeightUpdateRequest,
     WeightSummaryResponse,
-    WasteCategory
 )
+from app.services.analysis import category_counts, classify_detections
 from app.services.classifier import classifier
-from typing import Dict
+from app.services.executor import classifier_executor, detector_executor
+from app.services.image_io import decode_base64_bytes, decode_image_buffer, read_image_upload
+from app.services.metrics import stage_timer
+from app.services.model_registry import require_warm_models
+from app.services.resolution import resolution
+from app.services.result_cache import cached_inference, result_cache
+from app.services.weight_ledger import GRANULARITIES, weight_ledger
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 
 
 router = APIRouter()
 
-# Store for weights
-weight_store: Dict[WasteCategory, float] = {
-    WasteCategory.E_WASTE_USEFUL: 0.0,
-    WasteCategory.E_WASTE_NOT_USEFUL: 0.0,
-    WasteCategory.NON_ORGANIC: 0.0,
-    WasteCategory.BIOGAS: 0.0,
-    WasteCategory.COMPOST: 0.0
-}
-
-
-@router.post("/classify", response_model=ClassificationResponse)
-async def classify_waste(request: ClassificationRequest):
+@router.post("/classify", response_model=ClassificationResponse, dependencies=[Depends(require_warm_models)])
+async def classify_waste(request: ClassificationRequest, response: Response):
     """
     Classify a waste image and return the predicted category with confidence.
+    The X-Cache header tells whether the result came from the result cache.
     """
     if not request.image_data:
         raise HTTPException(status_code=400, detail="No image data provided")
     
-    result = classifier.classify(request.image_data)
+    loop = asyncio.get_running_loop()
+    try:
+        image_bytes = await loop.run_in_executor(None, decode_base64_bytes, request.image_data)
+    except ValueError as e:
+        return ClassificationResponse(category=None, confidence=0.0, recyclable=None, error=str(e))
+    
+    result, cache_status = await cached_inference(
+        result_cache,
+        "classify",
+        image_bytes,
+        lambda: classifier_executor.run(classifier.classify, image_bytes),
+        cacheable=lambda result: result["error"] is None,
+    )
+    if cache_status is not None:
+        response.headers["X-Cache"] = cache_status
     
     response = ClassificationResponse(
         category=result["category"],
         confidence=result["confidence"],
         recyclable=result["recyclable"],
+        route=result.get("route"),
         error=result["error"]
     )
     
     return response
 
 
-@router.post("/update-weight", response_model=WeightSummaryResponse)
-async def update_weight(request: WeightUpdateRequest):
+@router.post("/classify-binary", response_model=ClassificationResponse, dependencies=[Depends(require_warm_models)])
+async def classify_waste_binary(request: Request, response: Response):
     """
-    Update the weight for a specific waste category.
+    Classify a waste image sent as the raw request body or as a multipart
+    file upload, skipping the base64 JSON round trip.
     """
-    weight_store[request.category] += request.weight
+    image_bytes = await read_image_upload(request)
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="No image data provided")
     
-    total_weight = sum(weight_store.values())
+    result, cache_status = await cached_inference(
+        result_cache,
+        "classify",
+        image_bytes,
+        lambda: classifier_executor.run(classifier.classify_buffer, image_bytes),
+        cacheable=lambda result: result["error"] is None,
+    )
+    if cache_status is not None:
+        response.headers["X-Cache"] = cache_status
     
-    return WeightSummaryResponse(
-        weights=weight_store,
-        total_weight=total_weight
+    return ClassificationResponse(**result)
+
+
+@router.post("/classify-batch", response_model=BatchClassificationResponse, dependencies=[Depends(require_warm_models)])
+async def classify_waste_batch(request: BatchClassificationRequest):
+    """
+    Classify a list of waste images in one call. Results and per-item errors
+    are returned in the same order as the input images.
+    """
+    if not request.images:
+        raise HTTPException(status_code=400, detail="No image data provided")
+    if len(request.images) > config.CLASSIFY_BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {config.CLASSIFY_BATCH_MAX_IMAGES} images can be classified per request"
+        )
+    
+    results = await classifier_executor.run(classifier.classify_batch, request.images)
+    
+    return BatchClassificationResponse(
+        results=[ClassificationResponse(**result) for result in results]
     )
 
 
-@router.post("/reset-weights", response_model=WeightSummaryResponse)
-async def reset_weights():
+async def analyze_image(image_bytes: bytes, imgsz: int):
+    """Decode once, detect once, then classify every detection crop in one cascade pass."""
+    loop = asyncio.get_running_loop()
+    with stage_timer("analyze.decode"):
+        image_np, _ = await loop.run_in_executor(None, decode_image_buffer, image_bytes)
+    
+    detections = await detector_executor.run(lambda: get_detector().detect_array(image_np, imgsz=imgsz))
+    if not detections:
+        return []
+    return await classifier_executor.run(classify_detections, image_np, detections)
+
+
+@router.post("/analyze", response_model=AnalyzeResponse, dependencies=[Depends(require_warm_models)])
+async def analyze_waste(request: Request, response: Response):
     """
-    Reset all weights to zero.
+    Detect every object in a mixed-waste photo and classify each one.
+
+    The image is sent as the raw request body, a multipart file upload or a
+    JSON body with base64 ``image_data``. YOLOv8 runs once on the photo and
+    all box crops are classified together by the waste classifier cascade.
+    Each detection gets a fine-grained ``category``; ``counts`` holds the
+    number of detections per category.
     """
-    global weight_store
+    if request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            data = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+        if not isinstance(data, dict) or not isinstance(data.get("image_data") or "", str):
+            raise HTTPException(status_code=400, detail="Expected a JSON object with base64 image_data")
+        try:
+            image_bytes = decode_base64_bytes(data.get("image_data") or "")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        image_bytes = await read_image_upload(request)
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="No image data provided")
     
-    for category in weight_store:
-        weight_store[category] = 0.0
+    try:
+        imgsz = resolution.imgsz("analyze")
+        detections, cache_status = await cached_inference(
+            result_cache, f"analyze@{imgsz}", image_bytes, lambda: analyze_image(image_bytes, imgsz)
+        )
+        if cache_status is not None:
+            response.headers["X-Cache"] = cache_status
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    counts = category_counts(detections)
+    if counts:
+        summary = ", ".join(f"{count} {category}" for category, count in counts.items())
+        message = f"Found {len(detections)} objects: {summary}"
+    elif detections:
+        message = f"Found {len(detections)} objects, none could be classified"
+    else:
+        message = "No waste detected or confidence too low"
+    
+    return AnalyzeResponse(success=bool(detections), detections=detections, counts=counts, message=message)
+
+
+async def weight_summary(site: Optional[str] = None) -> WeightSummaryResponse:
+    loop = asyncio.get_running_loop()
+    weights = await loop.run_in_executor(None, weight_ledger.totals, site)
     
     return WeightSummaryResponse(
-        weights=weight_store,
-        total_weight=0.0
+        weights=weights,
+        total_weight=sum(weights.values())
     )
 
 
+@router.post("/update-weight", response_model=WeightSummaryResponse)
+async def update_weight(request: WeightUpdateRequest):
+    """
+    Record a weigh-in for a waste category and return the running totals
+    (of the request's site, if it names one).
+    """
+    await asyncio.wrap_future(
+        weight_ledger.record(request.category.value, request.weight, request.site or "")
+    )
+    
+    return await weight_summary(request.site)
+
+
+@router.post("/reset-weights", response_model=WeightSummaryResponse)
+async def reset_weights(site: Optional[str] = None):
+    """
+    Reset the running totals to zero, for one site or for all of them.
+    The weigh-in history is kept.
+    """
+    await asyncio.wrap_future(weight_ledger.reset(site))
+    
+    return await weight_summary(site)
+
+
 @router.get("/weight-summary", response_model=WeightSummaryResponse)
-async def get_weight_summary():
+async def get_weight_summary(site: Optional[str] = None):
+    """
+    Get the running totals since the last reset.
+    """
+    return await weight_summary(site)
+
+
+@router.get("/weight-history", response_model=WeightHistoryResponse)
+async def get_weight_history(
+    granularity: str = "hour",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    site: Optional[str] = None,
+):
     """
-    Get the current weight summary.
+    Weight per category in each hourly or daily bucket of a time window
+    (the last 24 hours by default), plus the totals over the window.
+    Naive datetimes are taken as UTC. Resets do not affect the history.
     """
-    total_weight = sum(weight_store.values())
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of: {', '.join(GRANULARITIES)}")
     
-    return WeightSummaryResponse(
-        weights=weight_store,
-        total_weight=total_weight
-    )
\ No newline at end of file
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=1)
+    start, end = (value if value.tzinfo else value.replace(tzinfo=timezone.utc) for value in (start, end))
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    
+    loop = asyncio.get_running_loop()
+    buckets = await loop.run_in_executor(
+        None, weight_ledger.history, granularity, start.timestamp(), end.timestamp(), site
+    )
+    weights = await loop.run_in_executor(
+        None, weight_ledger.window_totals, start.timestamp(), end.timestamp(), site
+    )
+    
+    return WeightHistoryResponse(
+        granularity=granularity,
+        start=start,
+        end=end,
+        site=site,
+        buckets=[
+            WeightHistoryBucket(
+                start=datetime.fromtimestamp(bucket["start"], timezone.utc),
+                weights=bucket["weights"],
+                total_weight=sum(bucket["weights"].values()),
+            )
+            for bucket in buckets
+        ],
+        weights=weights,
+        total_weight=sum(weights.values()),
+    )
@@ -0,0 +1,47 @@
+from collections import Counter
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app import config
+from app.models.schemas import WasteCategory
+from app.services.classifier import classifier
+
+
+def classify_detections(image_np: np.ndarray, detections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Give every detection a fine-grained waste category from the classifier.
+
+    All box crops go through the classifier cascade together, so each stage
+    runs one forward pass for the whole frame. Only the
+    ANALYZE_MAX_DETECTIONS most confident boxes are classified; the
+    detector already returns them sorted by confidence. Each keeps the
+    detector's COCO-mapped ``waste_category`` and gains ``category``,
+    ``category_confidence``, ``recyclable`` and ``error``.
+    """
+    classified = detections[:config.ANALYZE_MAX_DETECTIONS]
+    results = classifier.classify_regions(
+        image_np, [d["bbox"] for d in classified], config.ANALYZE_MIN_CROP_SIZE
+    )
+
+    analyzed = []
+    for index, detection in enumerate(detections):
+        result = results.get(index)
+        if result is None:
+            reason = "Detection too small to classify" if index < len(classified) else "Detection limit reached"
+            result = {"category": None, "confidence": 0.0, "recyclable": None, "route": None, "error": reason}
+        analyzed.append({
+            **detection,
+            "category": result["category"],
+            "category_confidence": result["confidence"],
+            "recyclable": result["recyclable"],
+            "route": result["route"],
+            "error": result["error"],
+        })
+    return analyzed
+
+
+def category_counts(analyzed: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Number of classified detections per fine-grained category."""
+    # Cached results come back from the disk tier with plain string categories
+    return dict(Counter(WasteCategory(d["category"]).value for d in analyzed if d["category"] is not None))
@@ -0,0 +1,156 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app import config
+from app.services.executor import InferenceExecutor, QueueFullError
+from app.services.metrics import BATCH_SIZE_BUCKETS, WAIT_SECONDS_BUCKETS, Histogram
+
+
+class DetectionBatcher:
+    """
+    Dynamic micro-batcher in front of ObjectDetector.
+
+    Concurrent callers submit decoded frames; a background task gathers up
+    to ``max_batch_size`` of them, or whatever arrived within
+    ``max_wait_ms`` of the first one, and runs a single batched forward pass
+    on the detector executor. Each caller gets back its own detections.
+    Frames asking for different input sizes share a batch but get one
+    forward pass per size.
+    """
+
+    def __init__(
+        self,
+        get_detector: Callable[[], Any],
+        executor: InferenceExecutor,
+        max_batch_size: int,
+        max_wait_ms: float,
+        max_queue: int,
+    ):
+        self.get_detector = get_detector
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+        self.batch_size = Histogram(
+            "detect_batch_size", "Frames per batched YOLOv8 forward pass", BATCH_SIZE_BUCKETS
+        )
+        self.queue_wait = Histogram(
+            "detect_batch_queue_wait_seconds", "Time a frame waited before its batch ran", WAIT_SECONDS_BUCKETS
+        )
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_batch_size > 1
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            # One batch per executor worker may be in flight at a time; the
+            # next batch keeps filling while every worker is busy.
+            self._slots = asyncio.Semaphore(self.executor.workers)
+            self._task = asyncio.get_running_loop().create_task(self._collect())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, image_np: np.ndarray, imgsz: Optional[int] = None, scale: float = 1) -> List[Dict[str, Any]]:
+        """Queue one decoded frame and wait for its detections, with boxes multiplied by ``scale``."""
+        self.start()
+        if self._queue.qsize() >= self.max_queue:
+            raise QueueFullError("detector batch", config.RETRY_AFTER_SECONDS)
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((image_np, imgsz, scale, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            try:
+                batch = [await self._queue.get()]
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    if not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+            except BaseException:
+                self._slots.release()
+                raise
+
+            # Callers that went away while queued do not need a forward pass
+            batch = [item for item in batch if not item[3].done()]
+            if not batch:
+                self._slots.release()
+                continue
+            loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        try:
+            now = time.perf_counter()
+            self.batch_size.observe(len(batch))
+            for *_, enqueued_at in batch:
+                self.queue_wait.observe(now - enqueued_at)
+
+            frames = [(image_np, imgsz, scale) for image_np, imgsz, scale, _, _ in batch]
+            try:
+                results = await self.executor.run(self._detect, frames)
+            except Exception as e:
+                for _, _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            for (_, _, _, future, _), detections in zip(batch, results):
+                if not future.done():
+                    future.set_result(detections)
+        finally:
+            self._slots.release()
+
+    def _detect(self, frames: List[Tuple[np.ndarray, Optional[int], float]]) -> List[List[Dict[str, Any]]]:
+        # Runs on an executor thread, so a first-use model load stays off the loop
+        detector = self.get_detector()
+        groups: Dict[Optional[int], List[int]] = defaultdict(list)
+        for index, (_, imgsz, _) in enumerate(frames):
+            groups[imgsz].append(index)
+
+        results: List[List[Dict[str, Any]]] = [[] for _ in frames]
+        for imgsz, indices in groups.items():
+            images = [frames[i][0] for i in indices]
+            scales = [frames[i][2] for i in indices]
+            for index, detections in zip(indices, detector.detect_batch(images, scales, imgsz)):
+                results[index] = detections
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self.queue_depth,
+            "batch_size": self.batch_size.snapshot(),
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+        }
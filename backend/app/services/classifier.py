@@ -1,51 +1,102 @@
-import base64
-import io
+import json
+import os
 import random
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple, Union
 from PIL import Image
 from app.models.schemas import WasteCategory
-from transformers import AutoImageProcessor, TFAutoModelForImageClassification
-import tensorflow as tf
-from torchvision import models
-import torchvision.transforms as transforms
-import torch
-from sorting_models.skeleton_model import custom_model
+from app import config
+from app.services.metrics import CASCADE_ROUTES, CLASSIFICATIONS, stage_timer
+from app.services.model_registry import registry
+from app.services.onnx_backend import load_exported_module
+from app.services.preprocessing import PreparedImage, food_batch, general_batch, prepare_crops, prepare_image
+from app.services.quantization import select_backend
+from app.services.organic import load_organic_model
+
+
+EWASTE_WEIGHTS = "sorting_models/trained_resnet18.keras"
+GENERAL_WEIGHTS = "sorting_models/custom_cnn.keras"
+
+
+def load_ewaste_model(backend: str = "eager"):
+    """E-waste segregation model"""
+    if backend != "eager":
+        return load_exported_module(EWASTE_WEIGHTS, backend)
+
+    import torch
+    from torchvision import models
+
+    # Create the model architecture first
+    ewaste_model = models.resnet18(pretrained=False)
+
+    # Adjust the final layer to match your number of classes (2 in this case: Battery and Metal)
+    num_classes = 2
+    ewaste_model.fc = torch.nn.Linear(ewaste_model.fc.in_features, num_classes)
+
+    # Load the state dictionary
+    state_dict = torch.load(EWASTE_WEIGHTS)
+    ewaste_model.load_state_dict(state_dict)
+    ewaste_model.eval()
+    return ewaste_model
+
+
+def load_general_model(backend: str = "eager"):
+    """Organic / Non Organic / E-waste segregation model"""
+    if backend != "eager":
+        return load_exported_module(GENERAL_WEIGHTS, backend)
+
+    import torch
+    from sorting_models.skeleton_model import custom_model
+
+    # Load the state dictionary
+    state_dict = torch.load(GENERAL_WEIGHTS)
+    custom_model.load_state_dict(state_dict)
+    custom_model.eval()
+    return custom_model
+
+
+def load_route_priors(path: str) -> Dict[str, Dict[str, float]]:
+    """
+    Per general class, the share of each fine-grained category, e.g.
+    {"Organic": {"compost": 0.7, "biogas": 0.3}}. Written by
+    scripts/benchmark_routing.py; an empty dict disables the prior route.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+registry.register(
+    "general",
+    lambda: load_general_model(select_backend("general", GENERAL_WEIGHTS, config.CLASSIFIER_BACKEND)),
+)
+registry.register(
+    "ewaste",
+    lambda: load_ewaste_model(select_backend("ewaste", EWASTE_WEIGHTS, config.CLASSIFIER_BACKEND)),
+)
+registry.register(
+    "organic", lambda: load_organic_model(config.ORGANIC_BACKEND, config.ORGANIC_ONNX_PATH)
+)
+
 
 class WasteClassifier:
     """
     Waste classification service simulation.
     todo: use the Hugging Face model.
+
+    Models are fetched from the model registry, so each one is loaded the
+    first time a request reaches its stage of the cascade.
+
+    E-waste and organic images take one of three routes to their final
+    category, chosen by the general model's confidence (see _route):
+    "prior" answers from per-class priors without a second model, "low-res"
+    runs stage two on a smaller input and "full" runs it as trained.
+    Non-organic results end at the general model ("general"). The route is
+    part of every result and counted in the classifier_cascade_routes metric.
     """
 
     def __init__(self):
-        # E-waste segregation model
-        # Create the model architecture first
-        self.ewaste_model = models.resnet18(pretrained=False)
-
-        # Adjust the final layer to match your number of classes (2 in this case: Battery and Metal)
-        num_classes = 2
-        self.ewaste_model.fc = torch.nn.Linear(self.ewaste_model.fc.in_features, num_classes)
-    
-        # Load the state dictionary
-        state_dict1 = torch.load("sorting_models/trained_resnet18.keras")
-        self.ewaste_model.load_state_dict(state_dict1)
-        self.ewaste_model.eval()
-
-        # Organic / Non Organic / E-waste segregation model
-        self.general_model = custom_model
-
-        # Load the state dictionary
-        state_dict2 = torch.load("sorting_models/custom_cnn.keras")
-        self.general_model.load_state_dict(state_dict2)
-        self.general_model.eval()
-
-        # Organic waste segregation model
-        self.organic_processor = AutoImageProcessor.from_pretrained(
-            "Kaludi/food-category-classification-v2.0"
-        )
-        self.organic_model = TFAutoModelForImageClassification.from_pretrained(
-            "Kaludi/food-category-classification-v2.0", from_pt=True
-        )
-        
         self.categories = [
             WasteCategory.E_WASTE_USEFUL,
             WasteCategory.E_WASTE_NOT_USEFUL,
@@ -62,103 +113,232 @@ class WasteClassifier:
             WasteCategory.BIOGAS: True,
             WasteCategory.COMPOST: False
         }
+        self.general_labels = ["E-waste", "Non-organic", "Organic"]
+        self.ewaste_labels = ["Battery", "Metal"]
+        self.useful_ewaste = ["Battery"]
+        self.compost_labels = ["Vegetable", "Fruit", "Eggs", "Bread", "Noodles", "Rice"]
+        self.biogas_labels = ["Dairy, Dessert", "Fried Food", "Meat", "Seafood", "Soup"]
+        
+        # Confidence routing; a threshold of 0 disables its route
+        self.prior_threshold = config.ROUTE_PRIOR_THRESHOLD
+        self.low_res_threshold = config.ROUTE_LOW_RES_THRESHOLD
+        self.low_res_size = config.ROUTE_LOW_RES_SIZE
+        self.priors = load_route_priors(config.ROUTE_PRIORS_PATH)
     
-    def decode_image(self, base64_image: str) -> Image.Image:
-        """Decode a base64 image to a PIL Image."""
-        try:
-            # Remove the data URI prefix if present
-            if "base64," in base64_image:
-                base64_image = base64_image.split("base64,")[1]
-                
-            image_data = base64.b64decode(base64_image)
-            image = Image.open(io.BytesIO(image_data))
-            return image
-        except Exception as e:
-            raise ValueError(f"Invalid image data: {str(e)}")
+    @property
+    def general_model(self):
+        return registry.get("general")
+    
+    @property
+    def ewaste_model(self):
+        return registry.get("ewaste")
+    
+    @property
+    def organic_model(self):
+        return registry.get("organic")
+    
+    def classify(self, base64_image: Union[str, bytes]):
+        return self.classify_batch([base64_image])[0]
+    
+    def classify_buffer(self, buffer: bytes):
+        """Classify raw upload bytes, decoding large JPEGs at reduced scale."""
+        return self.classify_batch([buffer])[0]
+    
+    def classify_batch(self, base64_images: List[Union[str, bytes, Image.Image]]) -> List[Dict[str, Any]]:
+        """
+        Classify several images, running each cascade stage once per batch.
+
+        Each image is decoded and resized once (see app.services.preprocessing).
+        The general model sees every decodable image as one tensor; images are
+        then grouped by general class so the e-waste and organic models each
+        run a single forward pass over their group. Results keep input order.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(base64_images)
+        prepared: Dict[int, PreparedImage] = {}
+        with stage_timer("classify.prepare"):
+            for index, base64_image in enumerate(base64_images):
+                try:
+                    prepared[index] = prepare_image(base64_image)
+                except ValueError as e:
+                    results[index] = self._error_result(e)
+                except Exception as e:
+                    results[index] = self._error_result(f"Invalid image data: {str(e)}")
+        
+        for index, result in self.classify_prepared(prepared).items():
+            results[index] = result
+        return results
+    
+    def classify_regions(self, image_np, boxes, min_size: int = 1) -> Dict[int, Dict[str, Any]]:
+        """Classify the crops of [x, y, width, height] boxes in one decoded image, keyed by box index."""
+        return self.classify_prepared(prepare_crops(image_np, boxes, min_size))
+    
+    def classify_prepared(self, prepared: Dict[int, PreparedImage]) -> Dict[int, Dict[str, Any]]:
+        """Run the cascade over already prepared images, keyed by caller-chosen ids."""
+        results = self._cascade(prepared)
+        for result in results.values():
+            CLASSIFICATIONS.inc(result["category"].value if result["category"] is not None else "error")
+        return results
     
-    def classify(self, base64_image: str):
+    def _cascade(self, prepared: Dict[int, PreparedImage]) -> Dict[int, Dict[str, Any]]:
+        import torch
+
+        results: Dict[int, Dict[str, Any]] = {}
+        if not prepared:
+            return results
+        
+        # General Segregation
+        indices = list(prepared)
         try:
-            # General Segregation
-            image = self.decode_image(base64_image)
-            category = None
-            general_transform = transforms.Compose([
-                transforms.Resize(256),
-                transforms.CenterCrop(224),
-                transforms.ToTensor(),
-                transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-            ])
-
-            general_labels = ["E-waste", "Non-organic", "Organic"]
-            general_image_tensor = general_transform(image).unsqueeze(0)
-            with torch.no_grad():
-                general_outputs = self.general_model(general_image_tensor)
-                general_probs = torch.nn.functional.softmax(general_outputs[0], dim=0)
-                general_predicted_class = torch.argmax(general_probs).item()
-                general_confidence = general_probs[general_predicted_class].item()
-            
-            general_class = general_labels[general_predicted_class]
+            with stage_timer("classify.preprocess"):
+                batch = general_batch([prepared[i] for i in indices])
+            with stage_timer("classify.general"), torch.no_grad():
+                general_outputs = self.general_model(batch)
+                general_probs = torch.nn.functional.softmax(general_outputs, dim=1)
+                general_confidences, general_predicted = torch.max(general_probs, dim=1)
+        except Exception as e:
+            return {i: self._error_result(e) for i in indices}
+        
+        groups: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        routes = Counter()
+        for position, i in enumerate(indices):
+            general_class = self.general_labels[general_predicted[position].item()]
+            confidence = general_confidences[position].item()
             if general_class == "Non-organic":
-                category = WasteCategory.NON_ORGANIC
-                return {
-                    "category": category,
-                    "confidence": general_confidence,
-                    "recyclable": self.recyclable_map[category],
-                    "error": None
-                }
-            elif general_class == "E-waste":
-                # Divide the type of e-waste
-                class_labels = ["Battery", "Metal"]
-                with torch.no_grad():
-                    outputs = self.ewaste_model(general_image_tensor)
-                    probs = torch.nn.functional.softmax(outputs[0], dim=0)
-                    predicted_ewaste_label = torch.argmax(probs).item()
-                    confidence = probs[predicted_ewaste_label].item()
-
-                predicted_ewaste_class = class_labels[predicted_ewaste_label]
-                useful_ewaste = ["Battery"]
-                non_useful_ewaste = ["Metal"]
-
-                if predicted_ewaste_class in useful_ewaste:
-                    category = WasteCategory.E_WASTE_USEFUL
+                results[i] = self._result(WasteCategory.NON_ORGANIC, confidence, "general")
+                routes[(general_class, "general")] += 1
+                continue
+            
+            route = self._route(general_class, confidence)
+            routes[(general_class, route)] += 1
+            if route == "prior":
+                results[i] = self._prior_result(general_class, confidence)
+            else:
+                groups[(general_class, route)].append(position)
+        
+        for (general_class, route), count in routes.items():
+            CASCADE_ROUTES.inc(general_class, route, amount=count)
+        
+        for (general_class, route), positions in groups.items():
+            group_indices = [indices[p] for p in positions]
+            if general_class == "E-waste":
+                if route == "low-res":
+                    ewaste_batch = general_batch([prepared[i] for i in group_indices], self.low_res_size)
                 else:
-                    category = WasteCategory.E_WASTE_NOT_USEFUL
-                
-                return {
-                    "category": category,
-                    "confidence": confidence,
-                    "recyclable": self.recyclable_map[category],
-                    "error": None
-                }
+                    ewaste_batch = batch[positions]
+                self._classify_ewaste(group_indices, ewaste_batch, results, route)
             else:
-                # Divide organic compost and organic biogas
-                inputs = self.organic_processor(images=image, return_tensors='tf')
-                outputs = self.organic_model(**inputs)
-                probs = tf.nn.softmax(outputs.logits, axis=-1)
-                predicted_class = tf.argmax(probs, axis=-1).numpy()[0]
-                predicted_label = self.organic_model.config.id2label[predicted_class]
-                confidence = probs[0][predicted_class].numpy()
-                compostLabel = ["Vegetable", "Fruit", "Eggs", "Bread", "Noodles", "Rice"]
-                biogasLabel = ["Dairy, Dessert", "Fried Food", "Meat", "Seafood", "Soup"]
-                
-                if predicted_label in compostLabel:
-                    category = WasteCategory.COMPOST
-                elif predicted_label in biogasLabel:
-                    category = WasteCategory.BIOGAS
-                
-                return {
-                    "category": category,
-                    "confidence": confidence,
-                    "recyclable": self.recyclable_map[category],
-                    "error": None
-                }
+                self._classify_organic(group_indices, [prepared[i] for i in group_indices], results, route)
+        
+        return results
+    
+    def _route(self, general_class: str, confidence: float) -> str:
+        """Pick how an E-waste or Organic image reaches its final category."""
+        if self.prior_threshold and confidence >= self.prior_threshold and general_class in self.priors:
+            return "prior"
+        if self.low_res_threshold and confidence >= self.low_res_threshold and self._low_res_supported(general_class):
+            return "low-res"
+        return "full"
+    
+    def _low_res_supported(self, general_class: str) -> bool:
+        """Exported ONNX graphs have a fixed input size; eager models do not."""
+        try:
+            if general_class == "E-waste":
+                import torch
 
+                return isinstance(self.ewaste_model, torch.nn.Module)
+            return self.organic_model.resizable_input
+        except Exception:
+            # Let the full route report the load error
+            return False
+    
+    def _prior_result(self, general_class: str, confidence: float) -> Dict[str, Any]:
+        """The class's most common category, with the general model's confidence that cleared the threshold."""
+        category = max(self.priors[general_class].items(), key=lambda item: item[1])[0]
+        return self._result(WasteCategory(category), confidence, "prior")
+    
+    def route_stats(self) -> Dict[str, Any]:
+        routes = {}
+        for (general_class, route), count in CASCADE_ROUTES.values().items():
+            routes.setdefault(general_class, {})[route] = count
+        return {
+            "prior_threshold": self.prior_threshold,
+            "low_res_threshold": self.low_res_threshold,
+            "low_res_size": self.low_res_size,
+            "routes": routes,
+        }
+    
+    def _classify_ewaste(self, indices: List[int], batch, results, route: str = "full"):
+        """Divide the type of e-waste for one group of images"""
+        import torch
+
+        try:
+            with stage_timer("classify.ewaste"), torch.no_grad():
+                outputs = self.ewaste_model(batch)
+                probs = torch.nn.functional.softmax(outputs, dim=1)
+                confidences, predicted = torch.max(probs, dim=1)
+        except Exception as e:
+            for i in indices:
+                results[i] = self._error_result(e)
+            return
+        
+        for position, i in enumerate(indices):
+            predicted_ewaste_class = self.ewaste_labels[predicted[position].item()]
+            if predicted_ewaste_class in self.useful_ewaste:
+                category = WasteCategory.E_WASTE_USEFUL
+            else:
+                category = WasteCategory.E_WASTE_NOT_USEFUL
+            results[i] = self._result(category, confidences[position].item(), route)
+    
+    def _classify_organic(self, indices: List[int], prepared: List[PreparedImage], results, route: str = "full"):
+        """Divide organic compost and organic biogas for one group of images"""
+        try:
+            organic_model = self.organic_model
+            spec = organic_model.input_spec
+            if route == "low-res":
+                spec = spec.with_size(self.low_res_size, self.low_res_size)
+            with stage_timer("classify.organic"):
+                probs = organic_model.predict_pixels(food_batch(prepared, spec))
         except Exception as e:
-            return {
-                "category": None,
-                "confidence": 0.0,
-                "recyclable": None,
-                "error": str(e)
-            }
+            for i in indices:
+                results[i] = self._error_result(e)
+            return
+        
+        predicted = probs.argmax(axis=-1)
+        for position, i in enumerate(indices):
+            predicted_class = int(predicted[position])
+            predicted_label = organic_model.id2label[predicted_class]
+            category = None
+            if predicted_label in self.compost_labels:
+                category = WasteCategory.COMPOST
+            elif predicted_label in self.biogas_labels:
+                category = WasteCategory.BIOGAS
+            
+            if category is None:
+                results[i] = self._error_result(f"Unmapped organic label: {predicted_label}")
+            else:
+                results[i] = self._result(category, float(probs[position][predicted_class]), route)
+    
+    def _result(self, category: WasteCategory, confidence: float, route: str) -> Dict[str, Any]:
+        return {
+            "category": category,
+            "confidence": confidence,
+            "recyclable": self.recyclable_map[category],
+            "route": route,
+            "error": None
+        }
+    
+    @staticmethod
+    def _error_result(error) -> Dict[str, Any]:
+        return {
+            "category": None,
+            "confidence": 0.0,
+            "recyclable": None,
+            "route": None,
+            "error": str(error)
+        }
 
 
-classifier = WasteClassifier()
\ No newline at end of file
+if config.INFERENCE_MODE == "server":
+    from app.services.model_server import remote_classifier as classifier
+else:
+    classifier = WasteClassifier()
\ No newline at end of file
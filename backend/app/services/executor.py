@@ -0,0 +1,111 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from app import config
+from app.services.profiling import profiler
+
+
+class InferenceUnavailableError(Exception):
+    """Base error for requests the inference executors could not serve."""
+
+
+class QueueFullError(InferenceUnavailableError):
+    """Raised when an executor already holds its maximum number of jobs."""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} inference queue is full")
+        self.retry_after = retry_after
+
+
+class InferenceTimeoutError(InferenceUnavailableError):
+    """Raised when a job does not finish within the executor timeout."""
+
+    def __init__(self, name: str, timeout: float):
+        super().__init__(f"{name} inference timed out after {timeout:.1f}s")
+
+
+class InferenceExecutor:
+    """
+    Bounded worker pool for one model family.
+
+    Jobs run on dedicated threads so the event loop stays free for cheap
+    endpoints. At most ``workers + max_queue`` jobs are admitted at once;
+    anything beyond that is rejected straight away with QueueFullError.
+    """
+
+    def __init__(self, name: str, workers: int, max_queue: int, timeout: float):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-inference")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.max_queue
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._in_flight - self.workers)
+
+    def _acquire(self):
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                raise QueueFullError(self.name, config.RETRY_AFTER_SECONDS)
+            self._in_flight += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run ``fn`` on the pool, enforcing admission control and the timeout."""
+        self._acquire()
+        try:
+            future = self._pool.submit(profiler.wrap(self.name, fn), *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        # The slot is freed when the job really finishes, not when we stop
+        # waiting for it, so timed-out jobs still count against the bound.
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise InferenceTimeoutError(self.name, self.timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "timeout_seconds": self.timeout,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+detector_executor = InferenceExecutor(
+    "detector",
+    workers=config.DETECTOR_WORKERS,
+    max_queue=config.DETECTOR_MAX_QUEUE,
+    timeout=config.DETECTOR_TIMEOUT_SECONDS,
+)
+
+classifier_executor = InferenceExecutor(
+    "classifier",
+    workers=config.CLASSIFIER_WORKERS,
+    max_queue=config.CLASSIFIER_MAX_QUEUE,
+    timeout=config.CLASSIFIER_TIMEOUT_SECONDS,
+)
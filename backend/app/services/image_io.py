@@ -0,0 +1,127 @@
+import base64
+import binascii
+import io
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from app.services.metrics import stage_timer
+
+_REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+_local = threading.local()
+
+
+def decode_base64_bytes(base64_image: str) -> bytes:
+    """Decode a base64 image string, with or without a data URI prefix, to bytes."""
+    marker = base64_image.find("base64,")
+    if marker != -1:
+        base64_image = base64_image[marker + len("base64,"):]
+    try:
+        with stage_timer("decode.base64"):
+            return base64.b64decode(base64_image)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"Invalid image data: {str(e)}")
+
+
+def reduction_factor(width: int, height: int, min_side: Optional[int] = None, max_side: Optional[int] = None) -> int:
+    """
+    Largest JPEG DCT scale (8, 4, 2) that keeps the image big enough for the
+    model: the shorter side at least ``min_side`` or the longer side at
+    least ``max_side``.
+    """
+    for factor in (8, 4, 2):
+        if min_side and min(width, height) // factor >= min_side:
+            return factor
+        if max_side and max(width, height) // factor >= max_side:
+            return factor
+    return 1
+
+
+def _reusable_buffer(shape: Tuple[int, int, int]) -> np.ndarray:
+    """Per-thread RGB output buffer, grown only when a bigger image arrives."""
+    size = shape[0] * shape[1] * shape[2]
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None or buffer.size < size:
+        buffer = np.empty(size, dtype=np.uint8)
+        _local.buffer = buffer
+    return buffer[:size].reshape(shape)
+
+
+def decode_image_buffer(
+    buffer: bytes,
+    min_side: Optional[int] = None,
+    max_side: Optional[int] = None,
+    reuse: bool = False,
+) -> Tuple[np.ndarray, int]:
+    """
+    Decode encoded image bytes straight to an RGB array.
+
+    The bytes are wrapped with np.frombuffer instead of being copied, and
+    JPEGs larger than the model needs (see reduction_factor) are decoded at
+    1/2, 1/4 or 1/8 scale by libjpeg. Returns (rgb, factor); multiply pixel
+    coordinates by ``factor`` to map them back to the original image.
+
+    With ``reuse`` the result lives in a per-thread buffer that the next
+    decode on the same thread overwrites, so only use it when the array is
+    consumed before the thread decodes again.
+    """
+    data = np.frombuffer(memoryview(buffer), dtype=np.uint8)
+
+    factor = 1
+    if min_side or max_side:
+        try:
+            # Image.open only parses the header here
+            with Image.open(io.BytesIO(buffer)) as header:
+                if header.format == "JPEG":
+                    factor = reduction_factor(header.width, header.height, min_side, max_side)
+        except Exception as e:
+            raise ValueError(f"Invalid image data: {str(e)}")
+
+    # PIL does not apply EXIF orientation either, so keep results consistent
+    bgr = cv2.imdecode(data, _REDUCED_FLAGS[factor] | cv2.IMREAD_IGNORE_ORIENTATION)
+    if bgr is None:
+        raise ValueError("Invalid image data: could not decode image")
+
+    if reuse:
+        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=_reusable_buffer(bgr.shape))
+    else:
+        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+    return rgb, factor
+
+
+def load_images(folder: str, limit: int) -> List[Image.Image]:
+    """
+    Up to ``limit`` RGB images from ``folder`` in name order, or as many
+    seeded random 640x480 frames without a folder. Used by the scripts and
+    benchmarks, not by the endpoints.
+    """
+    if not folder:
+        rng = np.random.default_rng(0)
+        return [Image.fromarray(rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)) for _ in range(limit)]
+
+    names = sorted(n for n in os.listdir(folder) if n.lower().endswith(IMAGE_EXTENSIONS))[:limit]
+    return [Image.open(os.path.join(folder, n)).convert("RGB") for n in names]
+
+
+async def read_image_upload(request) -> bytes:
+    """Image bytes from a raw request body or the first file of a multipart form."""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        for value in form.values():
+            if hasattr(value, "read"):
+                return await value.read()
+        return b""
+    return await request.body()
@@ -0,0 +1,231 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+# A collected metric family: (name, type, help, samples) where every sample
+# is (name suffix, labels, value). Counter families are named with their
+# "_total" suffix, as in prometheus_client, so TYPE and samples agree
+Family = Tuple[str, str, str, List[Tuple[str, Dict[str, str], float]]]
+
+
+class Histogram:
+    """Thread-safe cumulative histogram with fixed upper-bound buckets."""
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float], labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.buckets = sorted(buckets)
+        self.labels = tuple(labels)
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _copy(self) -> Dict[Tuple[str, ...], Tuple[List[int], float, int]]:
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Cumulative buckets, sum and count over every label combination."""
+        counts = [0] * (len(self.buckets) + 1)
+        total, count = 0.0, 0
+        for series_counts, series_total, series_count in self._copy().values():
+            counts = [a + b for a, b in zip(counts, series_counts)]
+            total += series_total
+            count += series_count
+
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = count
+
+        return {
+            "description": self.description,
+            "buckets": buckets,
+            "sum": total,
+            "count": count,
+        }
+
+    def collect(self) -> Family:
+        samples = []
+        for label_values, (counts, total, count) in sorted(self._copy().items()):
+            labels = dict(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append(("_bucket", {**labels, "le": str(bound)}, cumulative))
+            samples.append(("_bucket", {**labels, "le": "+Inf"}, count))
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, count))
+        return self.name, "histogram", self.description, samples
+
+
+class Counter:
+    """Thread-safe monotonically increasing counter, optionally labeled."""
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def collect(self) -> Family:
+        samples = [
+            ("", dict(zip(self.labels, label_values)), value)
+            for label_values, value in sorted(self.values().items())
+        ]
+        return f"{self.name}_total", "counter", self.description, samples
+
+
+class Callback:
+    """
+    Gauge or counter read from existing state when metrics are scraped.
+
+    ``read`` returns a number, or a dict from label value tuples to numbers.
+    """
+
+    def __init__(self, name: str, description: str, read: Callable[[], Any], labels: Sequence[str] = (), kind: str = "gauge"):
+        self.name = name
+        self.description = description
+        self.read = read
+        self.labels = tuple(labels)
+        self.kind = kind
+
+    def collect(self) -> Family:
+        values = self.read()
+        if not isinstance(values, dict):
+            values = {(): values}
+        name = f"{self.name}_total" if self.kind == "counter" else self.name
+        samples = [
+            ("", dict(zip(self.labels, label_values)), value)
+            for label_values, value in sorted(values.items())
+        ]
+        return name, self.kind, self.description, samples
+
+
+class MetricsRegistry:
+    """Process-wide set of metrics rendered by GET /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def collect(self) -> List[Family]:
+        return [metric.collect() for metric in self._metrics.values()]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_prometheus(families: List[Family]) -> str:
+    """Prometheus text exposition format (0.0.4) of collected families."""
+    lines = []
+    for name, kind, description, samples in families:
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for suffix, labels, value in samples:
+            label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            lines.append(f"{name}{suffix}{{{label_text}}} {float(value)!r}" if label_text else f"{name}{suffix} {float(value)!r}")
+    return "\n".join(lines) + "\n"
+
+
+def with_labels(families: List[Family], **extra: str) -> List[Family]:
+    """Add constant labels to every sample, e.g. to tell processes apart."""
+    return [
+        (name, kind, description, [(suffix, {**labels, **extra}, value) for suffix, labels, value in samples])
+        for name, kind, description, samples in families
+    ]
+
+
+def merge_families(*groups: List[Family]) -> List[Family]:
+    """Merge families of the same name collected in different processes."""
+    merged: Dict[str, Family] = {}
+    for families in groups:
+        for name, kind, description, samples in families:
+            if name in merged:
+                merged[name][3].extend(samples)
+            else:
+                merged[name] = (name, kind, description, list(samples))
+    return list(merged.values())
+
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+WAIT_SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+LATENCY_SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.register(Histogram(
+    "inference_stage_seconds",
+    "Time spent in each stage of detection and classification",
+    LATENCY_SECONDS_BUCKETS,
+    labels=("stage",),
+))
+CASCADE_ROUTES = metrics.register(Counter(
+    "classifier_cascade_routes",
+    "Images per general class and cascade route taken",
+    labels=("general_class", "route"),
+))
+CLASSIFICATIONS = metrics.register(Counter(
+    "classifier_results",
+    "Classification results per final category (error when none)",
+    labels=("category",),
+))
+DETECTIONS = metrics.register(Counter(
+    "detector_detections",
+    "YOLOv8 detections per COCO class and mapped waste category",
+    labels=("class_name", "waste_category"),
+))
+
+DETECT_INPUT_SIZES = metrics.register(Counter(
+    "detector_input_size_requests",
+    "Detection requests per endpoint and chosen YOLOv8 input size",
+    labels=("endpoint", "imgsz"),
+))
+
+DETECTOR_TIER_PASSES = metrics.register(Counter(
+    "detector_tier_images",
+    "Images detected per YOLOv8 tier, scheduled by the SLO or escalated for low confidence",
+    labels=("tier", "reason"),
+))
+
+SINGLE_FLIGHT_REQUESTS = metrics.register(Counter(
+    "inference_single_flight_requests",
+    "Requests per namespace that computed a result or joined an identical one in flight",
+    labels=("namespace", "outcome"),
+))
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Observe the duration of the enclosed block as ``stage`` in STAGE_SECONDS."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage)
@@ -0,0 +1,141 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app import config
+from app.services.executor import InferenceUnavailableError
+
+
+class ModelState:
+    NOT_LOADED = 'not-loaded'
+    LOADING = 'loading'
+    READY = 'ready'
+    FAILED = 'failed'
+
+
+class ModelLoadError(RuntimeError):
+    """Raised when a registered model cannot be loaded."""
+
+
+class ModelsWarmingUpError(InferenceUnavailableError):
+    """Raised for inference requests that arrive before the warm-up models have loaded."""
+
+    def __init__(self, pending: List[str]):
+        super().__init__(f"Models still warming up: {', '.join(pending)}")
+        self.pending = pending
+        self.retry_after = config.RETRY_AFTER_SECONDS
+
+
+class _Entry:
+    def __init__(self, loader: Callable[[], Any]):
+        self.loader = loader
+        self.model: Any = None
+        self.state = ModelState.NOT_LOADED
+        self.load_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Loads models the first time they are needed.
+
+    Each model is registered with a loader that does its own framework
+    imports, so nothing heavy is imported until a request (or an explicit
+    warm-up) asks for that model. Loading is serialised per model; a failed
+    load is retried on the next request.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, _Entry] = {}
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        self._entries[name] = _Entry(loader)
+
+    @property
+    def names(self):
+        return list(self._entries)
+
+    def is_loaded(self, name: str) -> bool:
+        return self._entries[name].state == ModelState.READY
+
+    def pending(self, names: Iterable[str]) -> List[str]:
+        """The given models that have neither loaded nor failed yet."""
+        return [
+            name for name in names if self._entries[name].state in (ModelState.NOT_LOADED, ModelState.LOADING)
+        ]
+
+    def get(self, name: str) -> Any:
+        entry = self._entries[name]
+        if entry.state == ModelState.READY:
+            return entry.model
+
+        with entry.lock:
+            if entry.state == ModelState.READY:
+                return entry.model
+
+            entry.state = ModelState.LOADING
+            start = time.perf_counter()
+            try:
+                model = entry.loader()
+            except Exception as e:
+                entry.state = ModelState.FAILED
+                entry.error = str(e)
+                print(f"Error loading model '{name}': {e}")
+                raise ModelLoadError(f"Model '{name}' failed to load: {e}")
+
+            entry.model = model
+            entry.load_seconds = time.perf_counter() - start
+            entry.error = None
+            entry.state = ModelState.READY
+            print(f"Model '{name}' loaded in {entry.load_seconds:.2f}s")
+            return model
+
+    def parse_names(self, spec: str) -> List[str]:
+        """Registered names in a comma separated list ("all" expands to every model, empty to none)."""
+        names = [name.strip() for name in spec.split(",") if name.strip()]
+        if names == ["all"]:
+            return self.names
+        return [name for name in names if name in self._entries]
+
+    def warm_up(self, names: Optional[Iterable[str]] = None):
+        """Load the given models (all registered ones by default), ignoring failures."""
+        for name in names if names is not None else self.names:
+            if name not in self._entries:
+                print(f"Unknown model '{name}' requested for warm-up")
+                continue
+            try:
+                self.get(name)
+            except ModelLoadError:
+                pass
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {
+                "state": entry.state,
+                "load_seconds": entry.load_seconds,
+                "error": entry.error,
+            }
+            for name, entry in self._entries.items()
+        }
+
+
+registry = ModelRegistry()
+
+
+def require_warm_models():
+    """
+    Route dependency of the inference endpoints: raise ModelsWarmingUpError
+    while any model listed in WARMUP_MODELS is still loading.
+
+    Loading takes far longer than the executor timeouts, so a request that
+    triggered it would end in a 504 anyway; a 503 with Retry-After tells the
+    client when to come back. Models that failed to warm up are retried on
+    demand as before. In server mode the model server applies the same
+    check itself.
+    """
+    if config.INFERENCE_MODE == "server":
+        return
+    pending = registry.pending(registry.parse_names(config.WARMUP_MODELS))
+    if pending:
+        raise ModelsWarmingUpError(pending)
@@ -0,0 +1,484 @@
+"""
+Model server: one process owns the models and serves every web worker.
+
+    python -m app.services.model_server --cpus 0-3
+    INFERENCE_MODE=server uvicorn app.main:app --workers 4
+
+Each web worker creates one shared-memory segment split into
+MODEL_SERVER_SLOTS slots and opens one connection per slot. A request
+copies its image bytes (or decoded frames) into a free slot and sends a
+small message naming the operation and where its inputs are; the server
+reads them in place and sends back the results. Inputs that do not fit
+in a slot travel over the connection instead.
+
+The connections carry pickles, so the socket lives in a directory only
+the service user can open, and every connection must present the auth
+key. Without MODEL_SERVER_AUTHKEY the server generates a key at startup
+and writes it, readable only by its user, next to the socket
+(<socket>.key), where the web workers read it.
+"""
+import argparse
+import os
+import queue
+import secrets
+import tempfile
+import threading
+from multiprocessing import AuthenticationError, resource_tracker
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app import config
+from app.services.executor import InferenceUnavailableError
+from app.services.model_registry import ModelsWarmingUpError
+
+# Start of every input in a slot, so arrays of any dtype are aligned
+ALIGNMENT = 64
+
+
+class ModelServerUnavailableError(InferenceUnavailableError):
+    """Raised when the model server cannot be reached."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Model server unavailable: {reason}")
+        self.retry_after = config.RETRY_AFTER_SECONDS
+
+
+def default_address() -> str:
+    """Socket path in a per-user runtime directory."""
+    base = os.getenv("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(base, f"sort-iq-{os.getuid()}", "model-server.sock")
+
+
+def authkey_path(address: str) -> str:
+    return address + ".key"
+
+
+def ensure_private_dir(path: str):
+    """Create ``path`` as 0700, or refuse to use it if anyone else can reach into it."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.stat(path)
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise SystemExit(
+            f"{path} must be owned by this user and closed to everyone else (chmod 700) to hold the model server socket"
+        )
+
+
+def read_authkey(address: str) -> bytes:
+    """The key written next to the socket by a model server that generated its own."""
+    try:
+        with open(authkey_path(address), "rb") as f:
+            return f.read()
+    except OSError as e:
+        raise ModelServerUnavailableError(f"no auth key ({e}); set MODEL_SERVER_AUTHKEY or start the model server")
+
+
+def write_authkey(address: str, authkey: bytes):
+    path = authkey_path(address)
+    if os.path.lexists(path):
+        os.unlink(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(authkey)
+
+
+def parse_cpus(spec: str) -> List[int]:
+    """Parse a CPU list such as "0-3,6" into [0, 1, 2, 3, 6]."""
+    cpus = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-")
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def pack_inputs(buf: memoryview, start: int, end: int, inputs: Sequence[Any]) -> List[tuple]:
+    """
+    Copy inputs (bytes, base64 strings or arrays) into ``buf[start:end]``.
+
+    Returns one descriptor per input; an input that does not fit is sent
+    inline with its descriptor instead.
+    """
+    specs = []
+    offset = start
+    for item in inputs:
+        if isinstance(item, np.ndarray):
+            kind, data, nbytes = "array", item, item.nbytes
+        else:
+            kind = "str" if isinstance(item, str) else "bytes"
+            data = item.encode() if kind == "str" else item
+            nbytes = memoryview(data).nbytes
+
+        position = -(-offset // ALIGNMENT) * ALIGNMENT
+        if position + nbytes > end:
+            specs.append(("inline", item))
+            continue
+
+        if kind == "array":
+            np.ndarray(data.shape, dtype=data.dtype, buffer=buf, offset=position)[...] = data
+            specs.append((kind, position, nbytes, data.shape, data.dtype.str))
+        else:
+            buf[position:position + nbytes] = memoryview(data).cast("B")
+            specs.append((kind, position, nbytes))
+        offset = position + nbytes
+    return specs
+
+
+def unpack_input(buf: memoryview, spec: tuple) -> Any:
+    """Inverse of pack_inputs; bytes and arrays are views into the slot, not copies."""
+    kind = spec[0]
+    if kind == "inline":
+        return spec[1]
+    position, nbytes = spec[1], spec[2]
+    if kind == "array":
+        return np.ndarray(spec[3], dtype=np.dtype(spec[4]), buffer=buf, offset=position)
+    if kind == "str":
+        return bytes(buf[position:position + nbytes]).decode()
+    return buf[position:position + nbytes]
+
+
+class _Slot:
+    __slots__ = ("offset", "size", "conn")
+
+    def __init__(self, offset: int, size: int):
+        self.offset = offset
+        self.size = size
+        self.conn = None
+
+
+class ModelClient:
+    """
+    Web-worker side of the model server.
+
+    Calls are blocking and meant to run on the inference executors, which
+    already bound how many are in flight; a call waits for a free slot if
+    every slot is busy. The shared-memory ring is created on first use.
+    """
+
+    def __init__(self, address: str, authkey: bytes, slots: int, slot_bytes: int):
+        self.address = address or default_address()
+        # Empty: read the key the model server generated, at connect time
+        self.authkey = authkey
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self._shm: Optional[SharedMemory] = None
+        self._free: "queue.Queue[_Slot]" = queue.Queue()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.inline_inputs = 0
+        self.failures = 0
+
+    def _start(self):
+        with self._lock:
+            if self._shm is not None:
+                return
+            self._shm = SharedMemory(create=True, size=self.slots * self.slot_bytes)
+            for index in range(self.slots):
+                self._free.put(_Slot(index * self.slot_bytes, self.slot_bytes))
+
+    def _connect(self, slot: _Slot):
+        try:
+            conn = Client(self.address, authkey=self.authkey or read_authkey(self.address))
+            conn.send(("attach", self._shm.name))
+        except (OSError, EOFError, AuthenticationError) as e:
+            self.failures += 1
+            raise ModelServerUnavailableError(str(e))
+        slot.conn = conn
+
+    def call(self, op: str, inputs: Sequence[Any] = (), **kwargs) -> Any:
+        """Run ``op`` on the model server with ``inputs`` passed through shared memory."""
+        self._start()
+        slot = self._free.get()
+        try:
+            if slot.conn is None:
+                self._connect(slot)
+            specs = pack_inputs(self._shm.buf, slot.offset, slot.offset + slot.size, inputs)
+            try:
+                slot.conn.send((op, specs, kwargs))
+                status, value = slot.conn.recv()
+            except (OSError, EOFError) as e:
+                slot.conn.close()
+                slot.conn = None
+                self.failures += 1
+                raise ModelServerUnavailableError(str(e))
+        finally:
+            self._free.put(slot)
+
+        self.calls += 1
+        self.inline_inputs += sum(1 for spec in specs if spec[0] == "inline")
+        if status == "warming-up":
+            raise ModelsWarmingUpError(value)
+        if status == "error":
+            error_type, message = value
+            raise (ValueError if error_type == "ValueError" else RuntimeError)(message)
+        return value
+
+    def status(self) -> Dict[str, Any]:
+        return self.call("status")
+
+    def warm_up(self, names: Optional[List[str]] = None):
+        return self.call("warm_up", names=names)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "address": self.address,
+            "slots": self.slots,
+            "slot_bytes": self.slot_bytes,
+            "free_slots": self._free.qsize() if self._shm is not None else self.slots,
+            "calls": self.calls,
+            "inline_inputs": self.inline_inputs,
+            "failures": self.failures,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._shm is None:
+                return
+            while not self._free.empty():
+                slot = self._free.get()
+                if slot.conn is not None:
+                    slot.conn.close()
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+class RemoteDetector:
+    """The ObjectDetector methods used by the web workers, served by the model server."""
+
+    imgsz = config.DETECT_IMGSZ
+
+    def __init__(self, client: ModelClient):
+        self.client = client
+
+    def detect_from_buffer(self, buffer: bytes, imgsz: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.client.call("detect_buffer", [buffer], imgsz=imgsz)
+
+    def detect_array(self, image_np: np.ndarray, scale: float = 1, imgsz: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.client.call("detect_array", [image_np], scale=scale, imgsz=imgsz)
+
+    def detect_batch(
+        self, images: List[np.ndarray], scales: Optional[List[float]] = None, imgsz: Optional[int] = None
+    ) -> List[List[Dict[str, Any]]]:
+        return self.client.call("detect_batch", images, scales=scales, imgsz=imgsz)
+
+
+class RemoteClassifier:
+    """The WasteClassifier methods used by the web workers, served by the model server."""
+
+    def __init__(self, client: ModelClient):
+        self.client = client
+
+    def classify(self, image) -> Dict[str, Any]:
+        return self.classify_batch([image])[0]
+
+    def classify_buffer(self, buffer: bytes) -> Dict[str, Any]:
+        return self.classify_batch([buffer])[0]
+
+    def classify_batch(self, images) -> List[Dict[str, Any]]:
+        return self.client.call("classify_batch", images)
+
+    def classify_regions(self, image_np: np.ndarray, boxes, min_size: int = 1) -> Dict[int, Dict[str, Any]]:
+        boxes = [[float(v) for v in box] for box in boxes]
+        return self.client.call("classify_regions", [image_np], boxes=boxes, min_size=min_size)
+
+    def route_stats(self) -> Dict[str, Any]:
+        return self.client.call("route_stats")
+
+
+model_client = ModelClient(
+    config.MODEL_SERVER_ADDRESS,
+    config.MODEL_SERVER_AUTHKEY,
+    slots=config.MODEL_SERVER_SLOTS,
+    slot_bytes=config.MODEL_SERVER_SLOT_MB * 1024 * 1024,
+)
+remote_detector = RemoteDetector(model_client)
+remote_classifier = RemoteClassifier(model_client)
+
+
+def pin_process(cpus: List[int], threads: int):
+    """Pin this process to ``cpus`` and size the torch / OpenMP thread pools."""
+    if cpus:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cpus)
+        else:
+            print("CPU pinning is not supported on this platform")
+    threads = threads or len(cpus) or os.cpu_count() or 1
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    os.environ.setdefault("MKL_NUM_THREADS", str(threads))
+
+    import torch
+
+    torch.set_num_threads(threads)
+    print(f"Model server using CPUs {cpus or 'all'} with {threads} torch threads")
+
+
+class ModelServer:
+    """
+    Owns the models and runs inference for the web workers.
+
+    One thread serves each worker connection. DETECTOR_WORKERS and
+    CLASSIFIER_WORKERS bound how many jobs run on each model family at once,
+    as they do for the executors in local mode; each YOLOv8 model still runs
+    one forward pass at a time.
+    """
+
+    def __init__(self):
+        # Importing these registers the yolo / general / ewaste / organic loaders
+        from app.models import detection  # noqa: F401
+        from app.services.classifier import WasteClassifier
+        from app.services.model_registry import registry
+
+        self.registry = registry
+        self.detector = detection.tiered_detector
+        self.classifier = WasteClassifier()
+        self._detector_slots = threading.BoundedSemaphore(config.DETECTOR_WORKERS)
+        # Web workers' frames waiting for a detector slot drive the tier choice here
+        self._detect_waiting = 0
+        self._waiting_lock = threading.Lock()
+        self.detector.scheduler.add_load(lambda: self._detect_waiting)
+        self._classifier_slots = threading.BoundedSemaphore(config.CLASSIFIER_WORKERS)
+        self.ops = {
+            "detect_buffer": lambda inputs, imgsz=None: self._detect(lambda d: d.detect_from_buffer(inputs[0], imgsz)),
+            "detect_array": lambda inputs, scale=1, imgsz=None: self._detect(
+                lambda d: d.detect_array(inputs[0], scale, imgsz)
+            ),
+            "detect_batch": lambda inputs, scales=None, imgsz=None: self._detect(
+                lambda d: d.detect_batch(inputs, scales, imgsz)
+            ),
+            "classify_batch": lambda inputs: self._classify(lambda c: c.classify_batch(inputs)),
+            "classify_regions": lambda inputs, boxes, min_size: self._classify(
+                lambda c: c.classify_regions(inputs[0], boxes, min_size)
+            ),
+            "route_stats": lambda inputs: self.classifier.route_stats(),
+            "metrics": lambda inputs: self.metrics(),
+            "status": lambda inputs: self.status(),
+            "warm_up": lambda inputs, names=None: self.start_warm_up(names),
+        }
+
+    def _require_warm(self):
+        # Same rule as require_warm_models() in local mode
+        pending = self.registry.pending(self.warmup_names())
+        if pending:
+            raise ModelsWarmingUpError(pending)
+
+    def _detect(self, fn):
+        self._require_warm()
+        with self._waiting_lock:
+            self._detect_waiting += 1
+        try:
+            self._detector_slots.acquire()
+        finally:
+            with self._waiting_lock:
+                self._detect_waiting -= 1
+        try:
+            return fn(self.detector)
+        finally:
+            self._detector_slots.release()
+
+    def _classify(self, fn):
+        self._require_warm()
+        with self._classifier_slots:
+            return fn(self.classifier)
+
+    def metrics(self):
+        from app.services.metrics import metrics
+
+        return metrics.collect()
+
+    def warmup_names(self) -> List[str]:
+        # Same meaning as in local mode: empty loads every model lazily
+        return self.registry.parse_names(config.WARMUP_MODELS)
+
+    def warm_up(self, names: Optional[List[str]] = None):
+        self.registry.warm_up(names)
+        self.detector.start_probes()
+
+    def start_warm_up(self, names: Optional[List[str]] = None):
+        threading.Thread(target=self.warm_up, args=(names,), daemon=True).start()
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": all(self.registry.is_loaded(name) for name in self.warmup_names()),
+            "models": self.registry.status(),
+        }
+
+    def handle(self, conn):
+        shm = None
+        try:
+            _, name = conn.recv()
+            shm = SharedMemory(name=name)
+            # The web worker owns the segment; keep this process's resource
+            # tracker from unlinking it when the server exits.
+            resource_tracker.unregister(shm._name, "shared_memory")
+            while True:
+                try:
+                    op, specs, kwargs = conn.recv()
+                except EOFError:
+                    break
+                try:
+                    inputs = [unpack_input(shm.buf, spec) for spec in specs]
+                    reply = ("ok", self.ops[op](inputs, **kwargs))
+                except ModelsWarmingUpError as e:
+                    reply = ("warming-up", e.pending)
+                except Exception as e:
+                    reply = ("error", (type(e).__name__, str(e)))
+                # Drop the views into the slot before the worker reuses it
+                inputs = None
+                conn.send(reply)
+        except (OSError, EOFError) as e:
+            print(f"Model server connection closed: {e}")
+        finally:
+            conn.close()
+            if shm is not None:
+                try:
+                    shm.close()
+                except BufferError:
+                    pass
+
+    def serve(self, address: str, authkey: bytes):
+        ensure_private_dir(os.path.dirname(os.path.abspath(address)))
+        if not authkey:
+            authkey = secrets.token_bytes(32)
+            write_authkey(address, authkey)
+            print(f"Model server auth key written to {authkey_path(address)}")
+        if os.path.exists(address):
+            os.unlink(address)
+        # Create the socket without group / other permissions
+        umask = os.umask(0o177)
+        try:
+            listener = Listener(address, authkey=authkey)
+        finally:
+            os.umask(umask)
+        print(f"Model server listening on {address}")
+        self.start_warm_up(self.warmup_names())
+        while True:
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError, AuthenticationError) as e:
+                print(f"Rejected model server connection: {e}")
+                continue
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the detection and classification models to the web workers")
+    parser.add_argument("--address", default=config.MODEL_SERVER_ADDRESS or default_address(), help="unix socket path")
+    parser.add_argument("--cpus", default=config.MODEL_SERVER_CPUS, help='CPUs to pin to, e.g. "0-3,6"')
+    parser.add_argument("--threads", type=int, default=config.MODEL_SERVER_TORCH_THREADS, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    pin_process(parse_cpus(args.cpus), args.threads)
+    ModelServer().serve(args.address, config.MODEL_SERVER_AUTHKEY)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import os
+
+from app import config
+
+BACKENDS = ("eager", "onnx", "torchscript", "int8")
+
+
+def create_session(path: str, intra_op_threads: int = None):
+    """Create a CPU onnxruntime session tuned for small-batch inference."""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    # Requests are already parallelised by the inference executors, so each
+    # session gets a fixed intra-op budget instead of every core.
+    options.intra_op_num_threads = intra_op_threads or config.ONNX_INTRA_OP_THREADS
+    options.inter_op_num_threads = 1
+    return ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+class OnnxModule:
+    """
+    Drop-in replacement for an eager classifier module served by onnxruntime.
+
+    Takes and returns torch tensors so the cascade code is the same for
+    every backend.
+    """
+
+    def __init__(self, path: str, intra_op_threads: int = None):
+        self.path = path
+        self.session = create_session(path, intra_op_threads)
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch):
+        import torch
+
+        array = batch.detach().cpu().numpy()
+        logits = self.session.run(None, {self.input_name: array})[0]
+        return torch.from_numpy(logits)
+
+    def eval(self):
+        return self
+
+
+def exported_path(weights_path: str, backend: str) -> str:
+    """Where the export CLI writes ``weights_path`` for the given backend."""
+    stem, _ = os.path.splitext(weights_path)
+    if backend == "onnx":
+        return f"{stem}.onnx"
+    if backend == "torchscript":
+        return f"{stem}.torchscript"
+    if backend == "int8":
+        return f"{stem}.int8.onnx"
+    return weights_path
+
+
+def load_exported_module(weights_path: str, backend: str):
+    """Load the exported graph of a classifier module for a non-eager backend."""
+    path = exported_path(weights_path, backend)
+    if not os.path.exists(path):
+        script = "scripts.quantize_models" if backend == "int8" else "scripts.export_models"
+        raise FileNotFoundError(f"No {backend} export at {path}; run python -m {script} first")
+
+    if backend in ("onnx", "int8"):
+        return OnnxModule(path)
+    if backend == "torchscript":
+        import torch
+
+        module = torch.jit.load(path, map_location="cpu")
+        module.eval()
+        return module
+    raise ValueError(f"Unknown backend: {backend}")
@@ -0,0 +1,182 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List
+
+import numpy as np
+from PIL import Image
+
+from app.services.preprocessing import NormalizeSpec
+
+ORGANIC_MODEL_NAME = "Kaludi/food-category-classification-v2.0"
+ORGANIC_ONNX_PATH = "sorting_models/food_classifier.onnx"
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+class OrganicModel(ABC):
+    """
+    Food category classifier behind the organic branch of the cascade.
+
+    Every backend shares the Hugging Face label map and returns softmax
+    probabilities as a NumPy array, so the compost / biogas mapping in
+    WasteClassifier does not depend on the runtime serving it. The cascade
+    feeds predict_pixels with inputs built by app.services.preprocessing;
+    predict_proba runs the Hugging Face processor for PIL images instead.
+    """
+
+    backend = None
+    # Whether predict_pixels accepts inputs smaller than input_spec
+    resizable_input = False
+
+    def __init__(self, processor, id2label: Dict[int, str]):
+        self.processor = processor
+        self.id2label = id2label
+        self.input_spec = NormalizeSpec.from_processor(processor)
+
+    @abstractmethod
+    def predict_pixels(self, pixel_values: np.ndarray) -> np.ndarray:
+        """Softmax probabilities for a batch of normalized NCHW pixel values."""
+
+    def predict_proba(self, images: List[Image.Image]) -> np.ndarray:
+        pixel_values = self.processor(images=images, return_tensors="np")["pixel_values"]
+        return self.predict_pixels(pixel_values.astype(np.float32))
+
+
+class TorchOrganicModel(OrganicModel):
+    backend = "torch"
+    resizable_input = True
+
+    def __init__(self, processor, model):
+        super().__init__(processor, model.config.id2label)
+        self.model = model
+
+    def predict_pixels(self, pixel_values: np.ndarray) -> np.ndarray:
+        import torch
+
+        kwargs = {}
+        if pixel_values.shape[-2:] != (self.input_spec.height, self.input_spec.width):
+            # Reduced-resolution input: interpolate the ViT position embeddings
+            kwargs["interpolate_pos_encoding"] = True
+        with torch.no_grad():
+            logits = self.model(pixel_values=torch.from_numpy(pixel_values), **kwargs).logits
+        return torch.nn.functional.softmax(logits, dim=-1).numpy()
+
+
+class TFOrganicModel(OrganicModel):
+    backend = "tf"
+
+    def __init__(self, processor, model):
+        super().__init__(processor, model.config.id2label)
+        self.model = model
+
+    def predict_pixels(self, pixel_values: np.ndarray) -> np.ndarray:
+        import tensorflow as tf
+
+        outputs = self.model(pixel_values=tf.convert_to_tensor(pixel_values))
+        return tf.nn.softmax(outputs.logits, axis=-1).numpy()
+
+
+class TorchScriptOrganicModel(OrganicModel):
+    backend = "torchscript"
+
+    def __init__(self, processor, module, id2label: Dict[int, str]):
+        super().__init__(processor, id2label)
+        self.module = module
+
+    def predict_pixels(self, pixel_values: np.ndarray) -> np.ndarray:
+        import torch
+
+        with torch.no_grad():
+            # Traced Hugging Face models return a tuple with the logits first
+            logits = self.module(torch.from_numpy(pixel_values))[0]
+        return torch.nn.functional.softmax(logits, dim=-1).numpy()
+
+
+class OnnxOrganicModel(OrganicModel):
+    backend = "onnx"
+
+    def __init__(self, processor, session, id2label: Dict[int, str]):
+        super().__init__(processor, id2label)
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+
+    def predict_pixels(self, pixel_values: np.ndarray) -> np.ndarray:
+        logits = self.session.run(None, {self.input_name: pixel_values})[0]
+        return _softmax(logits)
+
+
+def load_organic_model(backend: str = "torch", onnx_path: str = ORGANIC_ONNX_PATH) -> OrganicModel:
+    """Load the food classifier on the requested runtime (torch, onnx, torchscript or tf)."""
+    from transformers import AutoImageProcessor
+
+    processor = AutoImageProcessor.from_pretrained(ORGANIC_MODEL_NAME)
+
+    if backend == "torch":
+        from transformers import AutoModelForImageClassification
+
+        model = AutoModelForImageClassification.from_pretrained(ORGANIC_MODEL_NAME)
+        model.eval()
+        return TorchOrganicModel(processor, model)
+
+    if backend == "onnx":
+        from transformers import AutoConfig
+        from app.services.onnx_backend import create_session
+
+        id2label = AutoConfig.from_pretrained(ORGANIC_MODEL_NAME).id2label
+        session = create_session(onnx_path)
+        return OnnxOrganicModel(processor, session, id2label)
+
+    if backend == "torchscript":
+        import torch
+        from transformers import AutoConfig
+        from app.services.onnx_backend import exported_path
+
+        id2label = AutoConfig.from_pretrained(ORGANIC_MODEL_NAME).id2label
+        module = torch.jit.load(exported_path(onnx_path, "torchscript"), map_location="cpu")
+        module.eval()
+        return TorchScriptOrganicModel(processor, module, id2label)
+
+    if backend == "tf":
+        from transformers import TFAutoModelForImageClassification
+
+        model = TFAutoModelForImageClassification.from_pretrained(ORGANIC_MODEL_NAME, from_pt=True)
+        return TFOrganicModel(processor, model)
+
+    raise ValueError(f"Unknown organic backend: {backend}")
+
+
+def export_organic_onnx(path: str = ORGANIC_ONNX_PATH, opset: int = 17):
+    """Export the torch food classifier to an ONNX graph with a dynamic batch axis."""
+    import torch
+    from transformers import AutoModelForImageClassification
+
+    model = AutoModelForImageClassification.from_pretrained(ORGANIC_MODEL_NAME)
+    model.eval()
+    # The model returns an ImageClassifierOutput; export only the logits
+    model.config.return_dict = False
+
+    size = getattr(model.config, "image_size", 224)
+    dummy = torch.randn(1, 3, size, size)
+    torch.onnx.export(
+        model,
+        (dummy,),
+        path,
+        input_names=["pixel_values"],
+        output_names=["logits"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=opset,
+    )
+    print(f"Food classifier exported to {path}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the organic food classifier to ONNX")
+    parser.add_argument("--output", default=ORGANIC_ONNX_PATH)
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+    export_organic_onnx(args.output, args.opset)
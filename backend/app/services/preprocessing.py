@@ -0,0 +1,150 @@
+from typing import Dict, List, Sequence, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from app.services.image_io import decode_base64_bytes, decode_image_buffer
+
+# Geometry and normalisation of the general / e-waste models
+# (Resize(256) -> CenterCrop(224) -> ToTensor -> Normalize(ImageNet))
+RESIZE_SHORT_SIDE = 256
+CROP_SIZE = 224
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+class NormalizeSpec:
+    """
+    Target size plus per-channel affine map from uint8 pixels to model input.
+
+    ``x * scale + offset`` is the fused form of ``(x / 255 - mean) / std``,
+    so a whole batch is normalised with one vectorised multiply-add.
+    """
+
+    def __init__(self, height: int, width: int, mean, std, rescale: float = 1 / 255.0):
+        self.height = height
+        self.width = width
+        self.scale = (rescale / np.asarray(std, dtype=np.float32)).astype(np.float32)
+        self.offset = (-np.asarray(mean, dtype=np.float32) / np.asarray(std, dtype=np.float32)).astype(np.float32)
+    
+    def with_size(self, height: int, width: int) -> "NormalizeSpec":
+        """The same normalisation at another input size."""
+        spec = NormalizeSpec.__new__(NormalizeSpec)
+        spec.height, spec.width = height, width
+        spec.scale, spec.offset = self.scale, self.offset
+        return spec
+
+    def apply(self, pixels: np.ndarray) -> np.ndarray:
+        """uint8 HWC (or NHWC) pixels -> float32 CHW (or NCHW) model input."""
+        normalized = pixels.astype(np.float32) * self.scale + self.offset
+        return np.ascontiguousarray(np.moveaxis(normalized, -1, -3))
+
+    @classmethod
+    def from_processor(cls, processor) -> "NormalizeSpec":
+        """Build the spec a Hugging Face image processor would apply."""
+        size = processor.size
+        if "height" in size:
+            height, width = size["height"], size["width"]
+        else:
+            height = width = size["shortest_edge"]
+        mean = processor.image_mean if processor.do_normalize else (0.0, 0.0, 0.0)
+        std = processor.image_std if processor.do_normalize else (1.0, 1.0, 1.0)
+        rescale = processor.rescale_factor if processor.do_rescale else 1.0
+        return cls(height, width, mean, std, rescale)
+
+
+GENERAL_SPEC = NormalizeSpec(CROP_SIZE, CROP_SIZE, IMAGENET_MEAN, IMAGENET_STD)
+
+
+def resize_short_side(rgb: np.ndarray, short_side: int) -> np.ndarray:
+    height, width = rgb.shape[:2]
+    scale = short_side / min(height, width)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    # INTER_AREA when shrinking approximates the antialiased PIL resize
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    return cv2.resize(rgb, size, interpolation=interpolation)
+
+
+def center_crop(rgb: np.ndarray, size: int) -> np.ndarray:
+    height, width = rgb.shape[:2]
+    top = max(0, (height - size) // 2)
+    left = max(0, (width - size) // 2)
+    return rgb[top:top + size, left:left + size]
+
+
+class PreparedImage:
+    """
+    An image decoded once and resized once for the whole cascade.
+
+    ``resized`` is the uint8 intermediate with its shorter side at 256; the
+    224 center crop for the general / e-waste models and the food-model
+    input are both cut from it. The food input is only built when the image
+    actually reaches the organic stage.
+    """
+
+    __slots__ = ("resized", "general_pixels")
+
+    def __init__(self, rgb: np.ndarray):
+        if rgb.ndim == 2:
+            rgb = cv2.cvtColor(rgb, cv2.COLOR_GRAY2RGB)
+        elif rgb.shape[-1] == 4:
+            rgb = rgb[:, :, :3]
+        self.resized = resize_short_side(rgb, RESIZE_SHORT_SIDE)
+        self.general_pixels = center_crop(self.resized, CROP_SIZE)
+
+    def food_pixels(self, spec: NormalizeSpec) -> np.ndarray:
+        return cv2.resize(self.resized, (spec.width, spec.height), interpolation=cv2.INTER_AREA)
+
+
+def prepare_image(image: Union[str, bytes, np.ndarray, Image.Image]) -> PreparedImage:
+    """Decode (base64 string, encoded bytes, PIL image or RGB array) and prepare once."""
+    if isinstance(image, str):
+        image = decode_base64_bytes(image)
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        rgb, _ = decode_image_buffer(image, min_side=RESIZE_SHORT_SIDE)
+    elif isinstance(image, Image.Image):
+        rgb = np.asarray(image.convert("RGB"))
+    else:
+        rgb = image
+    return PreparedImage(rgb)
+
+
+def prepare_crops(image_np: np.ndarray, boxes: Sequence[Sequence[float]], min_size: int) -> Dict[int, PreparedImage]:
+    """
+    Prepare the crop of each [x, y, width, height] box, keyed by box index.
+
+    Crops are views into the decoded frame, so nothing is decoded twice.
+    Boxes whose shorter side is below ``min_size`` pixels are left out.
+    """
+    height, width = image_np.shape[:2]
+    prepared = {}
+    for index, (x, y, w, h) in enumerate(boxes):
+        left, top = max(0, int(x)), max(0, int(y))
+        right, bottom = min(width, int(round(x + w))), min(height, int(round(y + h)))
+        if min(right - left, bottom - top) < min_size:
+            continue
+        prepared[index] = PreparedImage(image_np[top:bottom, left:right])
+    return prepared
+
+
+def general_batch(prepared: List[PreparedImage], size: int = CROP_SIZE):
+    """
+    Normalised NCHW torch batch for the general and e-waste models, with
+    the 224 crops downscaled to ``size`` when a smaller input is asked for.
+    """
+    import torch
+
+    if size == CROP_SIZE:
+        pixels = np.stack([p.general_pixels for p in prepared])
+    else:
+        pixels = np.stack([
+            cv2.resize(p.general_pixels, (size, size), interpolation=cv2.INTER_AREA) for p in prepared
+        ])
+    return torch.from_numpy(GENERAL_SPEC.apply(pixels))
+
+
+def food_batch(prepared: List[PreparedImage], spec: NormalizeSpec) -> np.ndarray:
+    """Normalised NCHW float32 batch for the food classifier."""
+    pixels = np.stack([p.food_pixels(spec) for p in prepared])
+    return spec.apply(pixels)
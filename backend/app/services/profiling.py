@@ -0,0 +1,78 @@
+import cProfile
+import io
+import os
+import pstats
+import random
+import time
+from typing import Any, Callable, Dict
+
+from app import config
+
+
+class SlowJobProfiler:
+    """
+    Sampled cProfile hook for inference jobs.
+
+    A ``sample_rate`` share of jobs runs under cProfile. When one of them
+    takes at least ``slow_seconds``, its profile is written to ``directory``
+    as a .prof file (load it with pstats or snakeviz) and the slowest call
+    stacks by cumulative time are printed. Profiling is per thread, so only
+    the sampled job pays for it.
+    """
+
+    def __init__(self, sample_rate: float, slow_seconds: float, directory: str, top: int = 25):
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.directory = directory
+        self.top = top
+        self.sampled = 0
+        self.dumped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def wrap(self, name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """``fn`` itself, or for sampled jobs ``fn`` running under cProfile."""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return fn
+
+        def profiled(*args, **kwargs):
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            try:
+                return profiler.runcall(fn, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.sampled += 1
+                if elapsed >= self.slow_seconds:
+                    self._dump(name, profiler, elapsed)
+
+        return profiled
+
+    def _dump(self, name: str, profiler: cProfile.Profile, elapsed: float):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{name}-{int(time.time() * 1000)}.prof")
+            profiler.dump_stats(path)
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(self.top)
+            self.dumped += 1
+            print(f"Slow {name} job took {elapsed:.2f}s, profile saved to {path}\n{stream.getvalue()}")
+        except Exception as e:
+            print(f"Error saving profile: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sample_rate": self.sample_rate,
+            "slow_seconds": self.slow_seconds,
+            "sampled": self.sampled,
+            "dumped": self.dumped,
+        }
+
+
+profiler = SlowJobProfiler(
+    sample_rate=config.PROFILE_SAMPLE_RATE,
+    slow_seconds=config.PROFILE_SLOW_SECONDS,
+    directory=config.PROFILE_DIR,
+)
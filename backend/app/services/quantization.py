@@ -0,0 +1,118 @@
+import json
+import os
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import numpy as np
+
+from app import config
+from app.services.onnx_backend import exported_path
+
+QUANTIZABLE_MODELS = ("general", "ewaste", "yolo")
+
+
+def read_manifest(path: str = None) -> Dict[str, Dict[str, Any]]:
+    path = path or config.QUANTIZATION_MANIFEST
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_manifest(manifest: Dict[str, Dict[str, Any]], path: str = None):
+    path = path or config.QUANTIZATION_MANIFEST
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def select_backend(name: str, weights_path: str, backend: str) -> str:
+    """
+    Return "int8" when ``name`` is listed in QUANTIZED_MODELS and its quantized
+    graph passed the agreement gate, otherwise the configured ``backend``.
+    """
+    requested = [m.strip() for m in config.QUANTIZED_MODELS.split(",") if m.strip()]
+    if name not in requested:
+        return backend
+
+    entry = read_manifest().get(name)
+    if entry is None:
+        print(f"INT8 {name} requested but never evaluated; serving {backend}")
+        return backend
+    if entry["agreement"] < config.QUANTIZATION_MIN_AGREEMENT:
+        print(
+            f"INT8 {name} refused: top-1 agreement {entry['agreement']:.3f} is below "
+            f"{config.QUANTIZATION_MIN_AGREEMENT:.3f}; serving {backend}"
+        )
+        return backend
+    if not os.path.exists(exported_path(weights_path, "int8")):
+        print(f"INT8 {name} approved but {exported_path(weights_path, 'int8')} is missing; serving {backend}")
+        return backend
+    return "int8"
+
+
+def letterbox(image: np.ndarray, size: int = 640) -> np.ndarray:
+    """Resize and pad an RGB frame to a square YOLOv8 input tensor (1x3xSxS, 0-1)."""
+    import cv2
+
+    height, width = image.shape[:2]
+    scale = size / max(height, width)
+    resized = cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top = (size - resized.shape[0]) // 2
+    left = (size - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return (canvas.transpose(2, 0, 1)[None].astype(np.float32)) / 255.0
+
+
+class ImageFolderCalibrationReader:
+    """
+    onnxruntime CalibrationDataReader over the images in a local folder.
+
+    ``preprocess`` turns an RGB array into the model's input tensor, so the
+    same reader calibrates the classifiers and the detector. The images are
+    kept, so rewind() starts another pass over the same set.
+    """
+
+    def __init__(self, input_name: str, images: Iterable[np.ndarray], preprocess: Callable):
+        self.input_name = input_name
+        self._images = list(images)
+        self._iterator = iter(self._images)
+        self._preprocess = preprocess
+
+    def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+        image = next(self._iterator, None)
+        if image is None:
+            return None
+        return {self.input_name: self._preprocess(image)}
+
+    def rewind(self):
+        self._iterator = iter(self._images)
+
+
+def quantize(fp32_path: str, int8_path: str, mode: str, calibration_reader=None):
+    """Write an INT8 copy of an ONNX graph, statically (calibrated) or dynamically."""
+    from onnxruntime import quantization
+
+    if mode == "dynamic":
+        quantization.quantize_dynamic(fp32_path, int8_path, weight_type=quantization.QuantType.QInt8)
+        return
+
+    if calibration_reader is None:
+        raise ValueError("Static quantization needs a calibration reader")
+
+    # Static quantization needs shape information on every node
+    preprocessed = f"{fp32_path}.prep.onnx"
+    quantization.quant_pre_process(fp32_path, preprocessed)
+    try:
+        quantization.quantize_static(
+            preprocessed,
+            int8_path,
+            calibration_reader,
+            quant_format=quantization.QuantFormat.QDQ,
+            activation_type=quantization.QuantType.QUInt8,
+            weight_type=quantization.QuantType.QInt8,
+            per_channel=True,
+            calibrate_method=quantization.CalibrationMethod.MinMax,
+        )
+    finally:
+        if os.path.exists(preprocessed):
+            os.remove(preprocessed)
@@ -0,0 +1,86 @@
+from typing import Any, Callable, Dict, List
+
+from app import config
+from app.services.executor import detector_executor
+from app.services.metrics import DETECT_INPUT_SIZES
+
+# YOLOv8 input sizes must be multiples of the largest feature stride
+STRIDE = 32
+# Each DETECT_DOWNSCALE_QUEUE_DEPTH waiting frames shrink the input this much
+DOWNSCALE_STEP = 0.75
+
+
+def round_imgsz(size: float, minimum: int = STRIDE) -> int:
+    """Nearest multiple of STRIDE, at least ``minimum``."""
+    return max(minimum, STRIDE, int(round(size / STRIDE)) * STRIDE)
+
+
+def parse_profiles(text: str) -> Dict[str, int]:
+    """Parse "endpoint=size,endpoint=size" into {endpoint: size}."""
+    profiles = {}
+    for entry in text.split(","):
+        if "=" not in entry:
+            continue
+        endpoint, size = entry.split("=", 1)
+        profiles[endpoint.strip()] = round_imgsz(int(size))
+    return profiles
+
+
+class ResolutionPolicy:
+    """
+    Picks the YOLOv8 input size of each detection request.
+
+    Every endpoint has a size (its profile, or the default). While frames
+    are waiting for the detector, the size shrinks by DOWNSCALE_STEP for
+    every ``downscale_depth`` of them, but never below ``min_imgsz``: CPU
+    inference time grows with the pixel count, so this keeps a loaded
+    detector from falling further behind.
+    """
+
+    def __init__(self, profiles: Dict[str, int], default: int, min_imgsz: int, downscale_depth: int):
+        self.profiles = profiles
+        self.default = round_imgsz(default)
+        self.min_imgsz = min_imgsz
+        self.downscale_depth = downscale_depth
+        self.load_sources: List[Callable[[], int]] = []
+
+    def add_load(self, source: Callable[[], int]):
+        """Count the frames reported by ``source`` as waiting for the detector."""
+        self.load_sources.append(source)
+
+    def load(self) -> int:
+        return sum(source() for source in self.load_sources)
+
+    def base_imgsz(self, endpoint: str) -> int:
+        """The endpoint's size before any downscaling; imgsz() never exceeds it."""
+        return self.profiles.get(endpoint, self.default)
+
+    def imgsz(self, endpoint: str) -> int:
+        size = self.base_imgsz(endpoint)
+        if self.downscale_depth > 0:
+            steps = self.load() // self.downscale_depth
+            if steps:
+                size = round_imgsz(size * DOWNSCALE_STEP ** steps, min(size, self.min_imgsz))
+        DETECT_INPUT_SIZES.inc(endpoint, str(size))
+        return size
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "default": self.default,
+            "profiles": self.profiles,
+            "min_imgsz": self.min_imgsz,
+            "downscale_queue_depth": self.downscale_depth,
+            "load": self.load(),
+            "requests": {
+                f"{endpoint}@{size}": count for (endpoint, size), count in DETECT_INPUT_SIZES.values().items()
+            },
+        }
+
+
+resolution = ResolutionPolicy(
+    parse_profiles(config.DETECT_IMGSZ_PROFILES),
+    config.DETECT_IMGSZ,
+    config.DETECT_IMGSZ_MIN,
+    config.DETECT_DOWNSCALE_QUEUE_DEPTH,
+)
+resolution.add_load(lambda: detector_executor.queue_depth)
@@ -0,0 +1,342 @@
+import asyncio
+import hashlib
+import io
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from PIL import Image
+
+from app import config
+from app.services.metrics import SINGLE_FLIGHT_REQUESTS
+from app.services.serialization import dumps
+
+HIT = "HIT"
+NEAR_HIT = "HIT-NEAR"
+MISS = "MISS"
+
+
+def image_digest(image_bytes: bytes) -> str:
+    """Content address of an image: SHA-256 of its decoded bytes."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def perceptual_hash(image_bytes: bytes) -> int:
+    """
+    64-bit difference hash of an image.
+
+    Near-identical frames (recompression, sensor noise) hash to values a few
+    bits apart. JPEGs are decoded in draft mode at a fraction of full size,
+    which keeps this cheap next to inference.
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    image.draft("L", (64, 64))
+    pixels = list(image.convert("L").resize((9, 8), Image.BILINEAR).getdata())
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires_at", "namespace", "phash")
+
+    def __init__(self, value, size, expires_at, namespace, phash):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.namespace = namespace
+        self.phash = phash
+
+
+class ResultCache:
+    """
+    Content-addressed cache of inference results.
+
+    Results are keyed by (namespace, image digest). The memory tier is an LRU
+    bounded by the encoded size of its results and a TTL; the optional SQLite
+    tier is shared by every worker on the host; every PRUNE_INTERVAL_SECONDS
+    a writer deletes its expired rows and the oldest ones beyond
+    ``disk_max_rows``. Near-duplicate lookups compare perceptual hashes of
+    the most recent in-memory entries.
+    """
+
+    NEAR_SCAN_LIMIT = 256
+    PRUNE_INTERVAL_SECONDS = 60.0
+
+    def __init__(
+        self, max_bytes: int, ttl: float, disk_path: str = "", phash_distance: int = -1, disk_max_rows: int = 0
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.phash_distance = phash_distance
+        self.disk_max_rows = disk_max_rows
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_pruned = 0
+        self._db = None
+        self._next_prune = 0.0
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "namespace TEXT NOT NULL, digest TEXT NOT NULL, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, PRIMARY KEY (namespace, digest))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_expires_at ON results (expires_at)")
+            self._db_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @property
+    def near_duplicates(self) -> bool:
+        return self.phash_distance >= 0
+
+    def lookup(self, namespace: str, image_bytes: bytes) -> Tuple[Optional[Any], str, str, Optional[int]]:
+        """
+        Look up the result for an image.
+
+        Returns (value, HIT / HIT-NEAR / MISS, digest, phash); pass the digest
+        and phash back to put() after computing a missed result.
+        """
+        now = time.time()
+        digest = image_digest(image_bytes)
+        value = self._get_exact(namespace, digest, now)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return value, HIT, digest, None
+
+        phash = None
+        if self.near_duplicates:
+            try:
+                phash = perceptual_hash(image_bytes)
+            except Exception:
+                phash = None
+        if phash is not None:
+            value = self._get_near(namespace, phash, now)
+            if value is not None:
+                with self._lock:
+                    self.hits += 1
+                    self.near_hits += 1
+                return value, NEAR_HIT, digest, phash
+
+        with self._lock:
+            self.misses += 1
+        return None, MISS, digest, phash
+
+    def _get_exact(self, namespace, digest, now) -> Optional[Any]:
+        key = (namespace, digest)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                return entry.value
+            if entry is not None:
+                self._remove(key)
+
+        value, expires_at = self._disk_get(namespace, digest, now)
+        if value is not None:
+            # Keep the row's expiry, so a disk hit never outlives the disk entry
+            self._store(namespace, digest, value, expires_at, None)
+            with self._lock:
+                self.disk_hits += 1
+        return value
+
+    def _get_near(self, namespace, phash, now) -> Optional[Any]:
+        with self._lock:
+            for scanned, entry in enumerate(reversed(self._entries.values())):
+                if scanned >= self.NEAR_SCAN_LIMIT:
+                    break
+                if (
+                    entry.namespace == namespace
+                    and entry.phash is not None
+                    and entry.expires_at > now
+                    and bin(entry.phash ^ phash).count("1") <= self.phash_distance
+                ):
+                    return entry.value
+        return None
+
+    def put(self, namespace: str, digest: str, value: Any, phash: Optional[int] = None):
+        now = time.time()
+        encoded = self._store(namespace, digest, value, now + self.ttl, phash)
+        if self._db is not None and encoded is not None:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (namespace, digest, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (namespace, digest, encoded, now + self.ttl),
+                )
+                if now >= self._next_prune:
+                    self._next_prune = now + self.PRUNE_INTERVAL_SECONDS
+                    self._prune_disk(now)
+
+    def _prune_disk(self, now: float):
+        """Delete expired rows, then the oldest rows beyond disk_max_rows (caller holds _db_lock)."""
+        pruned = self._db.execute("DELETE FROM results WHERE expires_at <= ?", (now,)).rowcount
+        if self.disk_max_rows > 0:
+            excess = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.disk_max_rows
+            if excess > 0:
+                # Every row gets the same TTL, so the earliest expiry is the oldest write
+                pruned += self._db.execute(
+                    "DELETE FROM results WHERE rowid IN (SELECT rowid FROM results ORDER BY expires_at LIMIT ?)",
+                    (excess,),
+                ).rowcount
+        with self._lock:
+            self.disk_pruned += pruned
+
+    def _store(self, namespace, digest, value, expires_at, phash) -> Optional[str]:
+        encoded = dumps(value).decode()
+        size = len(encoded)
+        if size > self.max_bytes:
+            return None
+
+        key = (namespace, digest)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, size, expires_at, namespace, phash)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return encoded
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _disk_get(self, namespace, digest, now) -> Tuple[Optional[Any], Optional[float]]:
+        """The disk tier's (value, expires_at) for a key, or (None, None)."""
+        if self._db is None:
+            return None, None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM results WHERE namespace = ? AND digest = ? AND expires_at > ?",
+                (namespace, digest, now),
+            ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else (None, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_pruned": self.disk_pruned,
+            }
+
+
+class SingleFlight:
+    """
+    Shares one in-flight computation between concurrent identical requests.
+
+    The first request for a key starts the computation as its own task;
+    requests arriving with the same key before it finishes await that task
+    instead of starting another pass, and all of them get the same result
+    (or exception). Nothing is kept once the task is done, so this only
+    merges bursts; the result cache is what serves later repeats.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._tasks: Dict[Tuple[str, str], asyncio.Future] = {}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    async def run(self, namespace: str, digest: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return (result, whether this request ran the computation)."""
+        key = (namespace, digest)
+        task = self._tasks.get(key)
+        leader = task is None
+        if leader:
+            task = asyncio.ensure_future(compute())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            SINGLE_FLIGHT_REQUESTS.inc(namespace, "computed")
+        else:
+            SINGLE_FLIGHT_REQUESTS.inc(namespace, "coalesced")
+        # A caller that goes away must not cancel the pass the others wait on
+        return await asyncio.shield(task), leader
+
+    def _finish(self, key, task):
+        self._tasks.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved when every caller went away
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        counts = SINGLE_FLIGHT_REQUESTS.values()
+        return {
+            "enabled": self.enabled,
+            "in_flight": self.in_flight,
+            "computed": sum(count for (_, outcome), count in counts.items() if outcome == "computed"),
+            "coalesced": sum(count for (_, outcome), count in counts.items() if outcome == "coalesced"),
+        }
+
+
+async def cached_inference(
+    cache: ResultCache,
+    namespace: str,
+    image_bytes: bytes,
+    compute: Callable[[], Awaitable[Any]],
+    cacheable: Callable[[Any], bool] = lambda value: True,
+) -> Tuple[Any, Optional[str]]:
+    """
+    Serve an inference result from ``cache`` or compute and store it.
+
+    Concurrent misses for the same image share one computation through
+    ``single_flight``, whether or not the cache is enabled. Hashing and the
+    disk tier run on the default thread pool so the event loop never blocks
+    on them. Returns (result, cache status, or None when the cache is off).
+    """
+    loop = asyncio.get_running_loop()
+    status = digest = phash = None
+    if cache.enabled:
+        value, status, digest, phash = await loop.run_in_executor(None, cache.lookup, namespace, image_bytes)
+        if value is not None:
+            return value, status
+    elif single_flight.enabled:
+        digest = await loop.run_in_executor(None, image_digest, image_bytes)
+
+    if not single_flight.enabled:
+        value, leader = await compute(), True
+    else:
+        value, leader = await single_flight.run(namespace, digest, compute)
+    if cache.enabled and leader and cacheable(value):
+        await loop.run_in_executor(None, cache.put, namespace, digest, value, phash)
+    return value, status
+
+
+result_cache = ResultCache(
+    max_bytes=config.RESULT_CACHE_MAX_BYTES,
+    ttl=config.RESULT_CACHE_TTL_SECONDS,
+    disk_path=config.RESULT_CACHE_DISK_PATH,
+    phash_distance=config.RESULT_CACHE_PHASH_DISTANCE,
+    disk_max_rows=config.RESULT_CACHE_DISK_MAX_ROWS,
+)
+single_flight = SingleFlight(enabled=config.COALESCE_REQUESTS > 0)
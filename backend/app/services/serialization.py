@@ -0,0 +1,66 @@
+import json
+from enum import Enum
+from typing import Any, Dict, Optional
+
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # plain json is slower but produces the same documents
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+def to_builtin(obj: Any) -> Any:
+    """Encoder fallback for values that are not plain JSON types."""
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    if isinstance(obj, Enum):
+        return obj.value
+    if hasattr(obj, "tolist"):
+        # numpy arrays and scalars
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Compact JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(content, default=to_builtin, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=to_builtin, separators=(",", ":")).encode()
+
+
+def dumps_msgpack(content: Any) -> bytes:
+    return msgpack.packb(content, default=to_builtin, use_bin_type=True)
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """Whether an Accept header asks for MessagePack and it can be produced."""
+    return msgpack is not None and bool(accept) and any(media in accept for media in MSGPACK_MEDIA_TYPES)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with dumps() instead of the standard library encoder."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def encode_response(
+    content: Any, accept: Optional[str] = None, status_code: int = 200, headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Serialize ``content`` directly into a response, skipping FastAPI's
+    jsonable_encoder pass: MessagePack when the Accept header asks for it,
+    JSON otherwise.
+    """
+    headers = {**(headers or {}), "Vary": "Accept"}
+    if wants_msgpack(accept):
+        return Response(dumps_msgpack(content), status_code=status_code, headers=headers, media_type=MSGPACK_MEDIA_TYPES[0])
+    return Response(dumps(content), status_code=status_code, headers=headers, media_type="application/json")
@@ -0,0 +1,126 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app import config
+from app.services.executor import detector_executor
+from app.services.metrics import Callback, metrics
+
+# Weight of the newest observation in each tier's latency average
+EWMA_ALPHA = 0.2
+
+
+def parse_tiers(text: str) -> List[str]:
+    """Tier letters ("n,s,m") in the configured order, smallest model first."""
+    tiers = [tier.strip() for tier in text.split(",") if tier.strip()]
+    return tiers or ["n"]
+
+
+class TierScheduler:
+    """
+    Chooses the YOLOv8 tier of each detection pass.
+
+    Every tier keeps an exponentially weighted average of its latency per
+    image. A pass runs on the largest tier whose average, times the images
+    already waiting plus one, fits the latency SLO; the smallest tier is the
+    fallback. Requests only go to tiers with a fresh average that fits:
+    tiers without one are listed by probe_due() while nothing is waiting,
+    to be measured off the request path. An average not refreshed for
+    ``reprobe_seconds`` is stale, and the next probe replaces it, so one
+    slow sample (a busy host, a cold cache) cannot rule a tier out for good.
+    """
+
+    def __init__(
+        self, tiers: List[str], slo_seconds: float, escalate_confidence: float, reprobe_seconds: float = 30.0
+    ):
+        self.tiers = tiers
+        self.slo = slo_seconds
+        self.escalate_confidence = escalate_confidence
+        self.reprobe_seconds = reprobe_seconds
+        self.latency: Dict[str, Optional[float]] = {tier: None for tier in tiers}
+        self.observed_at: Dict[str, float] = {}
+        self.load_sources: List[Callable[[], int]] = []
+        self._lock = threading.Lock()
+
+    def add_load(self, source: Callable[[], int]):
+        """Count the images reported by ``source`` as waiting for the detector."""
+        self.load_sources.append(source)
+
+    def load(self) -> int:
+        return sum(source() for source in self.load_sources)
+
+    def _stale(self, tier: str) -> bool:
+        observed_at = self.observed_at.get(tier)
+        return observed_at is None or (
+            self.reprobe_seconds > 0 and time.monotonic() - observed_at > self.reprobe_seconds
+        )
+
+    def observe(self, tier: str, seconds_per_image: float):
+        with self._lock:
+            previous = None if self._stale(tier) else self.latency[tier]
+            self.latency[tier] = (
+                seconds_per_image if previous is None else EWMA_ALPHA * seconds_per_image + (1 - EWMA_ALPHA) * previous
+            )
+            self.observed_at[tier] = time.monotonic()
+
+    def _fits(self, tier: str, waiting: int, spent: float = 0.0, images: int = 1) -> bool:
+        estimate = self.latency[tier]
+        if estimate is None or self._stale(tier):
+            return False
+        return spent + estimate * (waiting + images) <= self.slo
+
+    def probe_due(self) -> List[str]:
+        """Larger tiers to measure in the background: unmeasured or stale ones, and only while nothing is waiting."""
+        if len(self.tiers) == 1 or self.slo <= 0 or self.load() > 0:
+            return []
+        return [tier for tier in self.tiers[1:] if self._stale(tier)]
+
+    def pick(self) -> str:
+        if len(self.tiers) == 1 or self.slo <= 0:
+            return self.tiers[0]
+        waiting = self.load()
+        for tier in reversed(self.tiers[1:]):
+            if self._fits(tier, waiting):
+                return tier
+        return self.tiers[0]
+
+    def escalation(self, tier: str, spent: float, images: int = 1) -> Optional[str]:
+        """
+        The next larger tier for ``images`` low-confidence results of a pass
+        on ``tier`` that already took ``spent`` seconds, if running them again
+        still fits the SLO.
+        """
+        if self.escalate_confidence <= 0 or tier == self.tiers[-1]:
+            return None
+        larger = self.tiers[self.tiers.index(tier) + 1]
+        return larger if self._fits(larger, self.load(), spent, images) else None
+
+    def low_confidence(self, detections: List[Dict[str, Any]]) -> bool:
+        # Empty results are not escalated: most frames simply hold no waste
+        return bool(detections) and detections[0]["confidence"] < self.escalate_confidence
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tiers": self.tiers,
+            "slo_ms": self.slo * 1000.0,
+            "escalate_confidence": self.escalate_confidence,
+            "load": self.load(),
+            "latency_ms": {
+                tier: latency * 1000.0 if latency is not None else None for tier, latency in self.latency.items()
+            },
+        }
+
+
+scheduler = TierScheduler(
+    parse_tiers(config.DETECTOR_TIERS),
+    config.DETECTOR_LATENCY_SLO_MS / 1000.0,
+    config.DETECTOR_ESCALATE_CONFIDENCE,
+    config.DETECTOR_TIER_REPROBE_SECONDS,
+)
+scheduler.add_load(lambda: detector_executor.queue_depth)
+metrics.register(Callback(
+    "detector_tier_latency_seconds",
+    "Moving average of the YOLOv8 latency per image of each tier",
+    lambda: {(tier,): latency for tier, latency in scheduler.latency.items() if latency is not None},
+    labels=("tier",),
+))
@@ -0,0 +1,253 @@
+import itertools
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from app.services.resolution import STRIDE, round_imgsz
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of two arrays of [x, y, width, height] boxes."""
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)))
+
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    left = np.maximum(a[..., 0], b[..., 0])
+    top = np.maximum(a[..., 1], b[..., 1])
+    right = np.minimum(a[..., 0] + a[..., 2], b[..., 0] + b[..., 2])
+    bottom = np.minimum(a[..., 1] + a[..., 3], b[..., 1] + b[..., 3])
+    intersection = np.clip(right - left, 0, None) * np.clip(bottom - top, 0, None)
+    union = a[..., 2] * a[..., 3] + b[..., 2] * b[..., 3] - intersection
+    return intersection / np.maximum(union, 1e-9)
+
+
+class Track:
+    __slots__ = (
+        "track_id", "anchor", "bbox", "velocity", "frames", "class_name",
+        "waste_category", "confidence", "misses", "age",
+    )
+
+    def __init__(self, track_id: int, detection: Dict[str, Any]):
+        self.track_id = track_id
+        # Box at the last matched keyframe, and frames elapsed since then
+        self.anchor = np.array(detection["bbox"], dtype=float)
+        self.bbox = self.anchor.copy()
+        self.velocity = np.zeros(2)
+        self.frames = 0
+        self.class_name = detection["class_name"]
+        self.waste_category = detection["waste_category"]
+        self.confidence = detection["confidence"]
+        self.misses = 0
+        self.age = 0
+
+    def advance(self):
+        self.frames += 1
+        self.bbox = self.anchor.copy()
+        self.bbox[:2] += self.velocity * self.frames
+
+    def to_detection(self) -> Dict[str, Any]:
+        return {
+            "class_name": self.class_name,
+            "waste_category": self.waste_category,
+            "confidence": float(self.confidence),
+            "bbox": [float(v) for v in self.bbox],
+            "track_id": self.track_id,
+        }
+
+
+class IouTracker:
+    """
+    Greedy IoU tracker with a constant-velocity motion model.
+
+    Keyframe detections are matched to existing tracks of the same class by
+    IoU; matched tracks take the new box, update their per-frame velocity
+    and blend the confidence with an exponential moving average. On the
+    frames in between, every track is moved along its velocity.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_misses: int = 2, smoothing: float = 0.5):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.smoothing = smoothing
+        self.tracks: List[Track] = []
+        self._ids = itertools.count(1)
+
+    def update(self, detections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Match a keyframe's detections to the tracks and return them with track ids."""
+        boxes = np.array([d["bbox"] for d in detections], dtype=float).reshape(-1, 4)
+        # Compare detections against where each track is expected to be now
+        for track in self.tracks:
+            track.advance()
+        predicted = np.array([t.bbox for t in self.tracks], dtype=float).reshape(-1, 4)
+        ious = iou_matrix(predicted, boxes)
+
+        matched_tracks, matched_detections = set(), set()
+        for track_index, detection_index in zip(*np.unravel_index(np.argsort(-ious, axis=None), ious.shape)):
+            if ious[track_index, detection_index] < self.iou_threshold:
+                break
+            if track_index in matched_tracks or detection_index in matched_detections:
+                continue
+            track = self.tracks[track_index]
+            detection = detections[detection_index]
+            if track.class_name != detection["class_name"]:
+                continue
+
+            new_bbox = boxes[detection_index]
+            track.velocity = (new_bbox[:2] - track.anchor[:2]) / track.frames
+            track.anchor = new_bbox
+            track.bbox = new_bbox.copy()
+            track.frames = 0
+            track.confidence = self.smoothing * track.confidence + (1 - self.smoothing) * detection["confidence"]
+            track.misses = 0
+            track.age += 1
+            matched_tracks.add(track_index)
+            matched_detections.add(detection_index)
+
+        survivors = []
+        for index, track in enumerate(self.tracks):
+            if index not in matched_tracks:
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    continue
+            survivors.append(track)
+        for index, detection in enumerate(detections):
+            if index not in matched_detections:
+                survivors.append(Track(next(self._ids), detection))
+        self.tracks = survivors
+
+        return self._confirmed()
+
+    def _confirmed(self) -> List[Dict[str, Any]]:
+        """Detections of the tracks seen this keyframe, most confident first."""
+        confirmed = [t for t in self.tracks if t.misses == 0]
+        confirmed.sort(key=lambda t: t.confidence, reverse=True)
+        return [t.to_detection() for t in confirmed]
+
+    def predict(self) -> List[Dict[str, Any]]:
+        """Advance every confirmed track by one frame along its velocity."""
+        for track in self.tracks:
+            track.advance()
+        return self._confirmed()
+
+
+def frame_thumbnail(image_np: np.ndarray, size: int = 32) -> np.ndarray:
+    """Small grayscale copy of a frame used to detect scene changes."""
+    gray = cv2.cvtColor(image_np, cv2.COLOR_RGB2GRAY) if image_np.ndim == 3 else image_np
+    return cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+class DetectionSession:
+    """
+    Per-stream detection state for live camera feeds.
+
+    Full detection runs on every ``detect_every``-th frame, or sooner when
+    the frame differs from the last keyframe by more than
+    ``scene_change_threshold`` (mean absolute difference of 32x32 grayscale
+    thumbnails, 0-255). Frames in between are answered from the tracker.
+
+    With ``roi_full_every`` > 0, keyframes only look at the area around the
+    current tracks (grown by ``roi_margin`` of its size) at an input size
+    scaled down with the crop, so the detector processes fewer pixels. Every
+    ``roi_full_every``-th keyframe, scene changes, and areas covering more
+    than ``roi_max_area`` of the frame fall back to a full-frame pass, which
+    is what picks up objects entering elsewhere.
+
+    Frames may be decoded at reduced scale: ``process`` takes the factor
+    mapping them back to the original frame, and the tracks, ROIs and
+    returned boxes stay in original-frame coordinates.
+    """
+
+    def __init__(
+        self,
+        detect: Callable[[np.ndarray, Optional[int], float], Awaitable[List[Dict[str, Any]]]],
+        detect_every: int = 5,
+        scene_change_threshold: float = 12.0,
+        tracker: Optional[IouTracker] = None,
+        imgsz: Optional[Callable[[], int]] = None,
+        roi_full_every: int = 0,
+        roi_margin: float = 0.25,
+        roi_max_area: float = 0.6,
+    ):
+        self.detect = detect
+        self.detect_every = max(1, detect_every)
+        self.scene_change_threshold = scene_change_threshold
+        self.tracker = tracker or IouTracker()
+        self.imgsz = imgsz
+        self.roi_full_every = roi_full_every
+        self.roi_margin = roi_margin
+        self.roi_max_area = roi_max_area
+        self.frames_since_keyframe = 0
+        self.keyframes_since_full = 0
+        self.keyframe_thumbnail: Optional[np.ndarray] = None
+        self.last_roi: Optional[List[int]] = None
+        self.keyframes = 0
+        self.roi_keyframes = 0
+        self.frames = 0
+
+    def scene_changed(self, thumbnail: np.ndarray) -> bool:
+        if self.keyframe_thumbnail is None:
+            return True
+        change = float(np.abs(thumbnail - self.keyframe_thumbnail).mean())
+        return change > self.scene_change_threshold
+
+    def roi_box(self, height: int, width: int) -> Optional[List[int]]:
+        """[left, top, right, bottom] around the current tracks, or None for a full-frame pass."""
+        if self.roi_full_every <= 0 or self.keyframes_since_full >= self.roi_full_every or not self.tracker.tracks:
+            return None
+        boxes = np.array([t.bbox for t in self.tracker.tracks], dtype=float)
+        x0, y0 = boxes[:, :2].min(axis=0)
+        x1, y1 = (boxes[:, :2] + boxes[:, 2:]).max(axis=0)
+        margin_x = max(STRIDE, (x1 - x0) * self.roi_margin)
+        margin_y = max(STRIDE, (y1 - y0) * self.roi_margin)
+        left, top = max(0, int(x0 - margin_x)), max(0, int(y0 - margin_y))
+        right, bottom = min(width, int(np.ceil(x1 + margin_x))), min(height, int(np.ceil(y1 + margin_y)))
+        if right <= left or bottom <= top or (right - left) * (bottom - top) > self.roi_max_area * width * height:
+            return None
+        return [left, top, right, bottom]
+
+    async def detect_keyframe(self, image_np: np.ndarray, scene_changed: bool, scale: float = 1) -> List[Dict[str, Any]]:
+        imgsz = self.imgsz() if self.imgsz is not None else None
+        height, width = image_np.shape[:2]
+        roi = None if scene_changed else self.roi_box(int(height * scale), int(width * scale))
+        self.last_roi = roi
+        if roi is None:
+            self.keyframes_since_full = 0
+            return await self.detect(image_np, imgsz, scale)
+
+        # The ROI is in original-frame coordinates; crop the decoded image
+        left, top = int(roi[0] / scale), int(roi[1] / scale)
+        right, bottom = int(np.ceil(roi[2] / scale)), int(np.ceil(roi[3] / scale))
+        if imgsz:
+            # Keep the crop at the scale the full frame would have been detected at
+            imgsz = round_imgsz(imgsz * max(right - left, bottom - top) / max(width, height))
+        detections = await self.detect(np.ascontiguousarray(image_np[top:bottom, left:right]), imgsz, scale)
+        self.keyframes_since_full += 1
+        self.roi_keyframes += 1
+        offset_x, offset_y = left * scale, top * scale
+        return [
+            {**d, "bbox": [d["bbox"][0] + offset_x, d["bbox"][1] + offset_y, d["bbox"][2], d["bbox"][3]]}
+            for d in detections
+        ]
+
+    async def process(self, image_np: np.ndarray, scale: float = 1):
+        """
+        Return (detections with track ids, whether full detection ran).
+
+        ``scale`` maps ``image_np`` pixels back to the original frame, as
+        returned by decode_image_buffer.
+        """
+        self.frames += 1
+        thumbnail = frame_thumbnail(image_np)
+        scene_changed = self.scene_changed(thumbnail)
+        if not scene_changed and self.frames_since_keyframe < self.detect_every:
+            self.frames_since_keyframe += 1
+            return self.tracker.predict(), False
+
+        detections = await self.detect_keyframe(image_np, scene_changed, scale)
+        tracked = self.tracker.update(detections)
+        self.keyframe_thumbnail = thumbnail
+        self.frames_since_keyframe = 1
+        self.keyframes += 1
+        return tracked, True
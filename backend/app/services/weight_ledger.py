@@ -0,0 +1,260 @@
+import queue
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from app import config
+from app.models.schemas import WasteCategory
+
+# Rollup granularities and their bucket size in seconds (UTC-aligned)
+GRANULARITIES = {"hour": 3600, "day": 86400}
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS events ("
+    "id INTEGER PRIMARY KEY, ts REAL NOT NULL, site TEXT NOT NULL, "
+    "category TEXT NOT NULL, weight REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS resets (id INTEGER PRIMARY KEY, ts REAL NOT NULL, site TEXT)",
+    "CREATE TABLE IF NOT EXISTS rollups ("
+    "granularity TEXT NOT NULL, bucket INTEGER NOT NULL, site TEXT NOT NULL, category TEXT NOT NULL, "
+    "weight REAL NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (granularity, bucket, site, category))",
+    "CREATE TABLE IF NOT EXISTS totals ("
+    "site TEXT NOT NULL, category TEXT NOT NULL, weight REAL NOT NULL, count INTEGER NOT NULL, "
+    "PRIMARY KEY (site, category))",
+)
+
+
+def empty_weights() -> Dict[WasteCategory, float]:
+    return {category: 0.0 for category in WasteCategory}
+
+
+def bucket_start(ts: float, size: int) -> int:
+    return int(ts // size) * size
+
+
+class WeightLedger:
+    """
+    Append-only ledger of weigh-ins in SQLite (WAL mode).
+
+    Each weigh-in is appended to ``events`` and, in the same transaction,
+    added to the hourly and daily ``rollups`` and to the running ``totals``.
+    All writes go through one writer thread that commits everything queued
+    so far as a single transaction (group commit), so a burst of weigh-ins
+    costs one commit. A reset is recorded in ``resets`` and only zeroes the
+    running totals; events and rollups keep the full history. Worker
+    processes share the database file, so every worker sees the same totals.
+    """
+
+    def __init__(self, path: str, batch_max: int = 512):
+        self.path = path
+        self.batch_max = batch_max
+        self._queue: "queue.Queue[Optional[Tuple[tuple, Future]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._db = None
+        self._read_lock = threading.Lock()
+        self.commits = 0
+        self.events = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _start(self):
+        if self._writer is not None:
+            return
+        with self._lock:
+            if self._writer is not None:
+                return
+            writer_db = self._connect()
+            for statement in SCHEMA:
+                writer_db.execute(statement)
+            self._db = self._connect()
+            self._writer = threading.Thread(
+                target=self._write_loop, args=(writer_db,), name="weight-ledger-writer", daemon=True
+            )
+            self._writer.start()
+
+    def record(self, category: str, weight: float, site: str = "") -> Future:
+        """Queue a weigh-in; the future resolves once it is committed."""
+        return self._submit(("record", time.time(), site, category, weight))
+
+    def reset(self, site: Optional[str] = None) -> Future:
+        """Queue a reset of the running totals (of one site, or all of them)."""
+        return self._submit(("reset", time.time(), site))
+
+    def _submit(self, op: tuple) -> Future:
+        self._start()
+        future: Future = Future()
+        self._queue.put((op, future))
+        return future
+
+    def _write_loop(self, db: sqlite3.Connection):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            stop = False
+            while len(batch) < self.batch_max:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                self._apply(db, [op for op, _ in batch])
+                db.execute("COMMIT")
+            except Exception as e:
+                print(f"Error writing weight ledger: {str(e)}")
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                self.commits += 1
+                self.events += len(batch)
+                for _, future in batch:
+                    future.set_result(None)
+            if stop:
+                break
+        db.close()
+
+    def _apply(self, db: sqlite3.Connection, ops: List[tuple]):
+        """Write one batch, aggregating rollup and total deltas per key first."""
+        events = []
+        rollups: Dict[tuple, List[float]] = defaultdict(lambda: [0.0, 0])
+        totals: Dict[tuple, List[float]] = defaultdict(lambda: [0.0, 0])
+        for op in ops:
+            if op[0] == "reset":
+                # Totals queued before the reset must land before it zeroes them
+                self._add_totals(db, totals)
+                totals.clear()
+                _, ts, site = op
+                db.execute("INSERT INTO resets (ts, site) VALUES (?, ?)", (ts, site))
+                if site is None:
+                    db.execute("UPDATE totals SET weight = 0, count = 0")
+                else:
+                    db.execute("UPDATE totals SET weight = 0, count = 0 WHERE site = ?", (site,))
+                continue
+
+            _, ts, site, category, weight = op
+            events.append((ts, site, category, weight))
+            for granularity, size in GRANULARITIES.items():
+                delta = rollups[(granularity, bucket_start(ts, size), site, category)]
+                delta[0] += weight
+                delta[1] += 1
+            delta = totals[(site, category)]
+            delta[0] += weight
+            delta[1] += 1
+
+        db.executemany("INSERT INTO events (ts, site, category, weight) VALUES (?, ?, ?, ?)", events)
+        db.executemany(
+            "INSERT INTO rollups (granularity, bucket, site, category, weight, count) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (granularity, bucket, site, category) DO UPDATE SET "
+            "weight = weight + excluded.weight, count = count + excluded.count",
+            [key + tuple(delta) for key, delta in rollups.items()],
+        )
+        self._add_totals(db, totals)
+
+    @staticmethod
+    def _add_totals(db: sqlite3.Connection, totals: Dict[tuple, List[float]]):
+        db.executemany(
+            "INSERT INTO totals (site, category, weight, count) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (site, category) DO UPDATE SET "
+            "weight = weight + excluded.weight, count = count + excluded.count",
+            [key + tuple(delta) for key, delta in totals.items()],
+        )
+
+    def _query(self, sql: str, params: tuple) -> List[tuple]:
+        self._start()
+        with self._read_lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def totals(self, site: Optional[str] = None) -> Dict[WasteCategory, float]:
+        """Running totals per category since the last reset."""
+        sql = "SELECT category, SUM(weight) FROM totals"
+        params: tuple = ()
+        if site is not None:
+            sql += " WHERE site = ?"
+            params = (site,)
+        weights = empty_weights()
+        for category, weight in self._query(sql + " GROUP BY category", params):
+            weights[WasteCategory(category)] = weight
+        return weights
+
+    def history(self, granularity: str, start: float, end: float, site: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Per-category weight of every hourly or daily bucket in [start, end)."""
+        size = GRANULARITIES[granularity]
+        sql = "SELECT bucket, category, SUM(weight) FROM rollups WHERE granularity = ? AND bucket >= ? AND bucket < ?"
+        params: tuple = (granularity, bucket_start(start, size), end)
+        if site is not None:
+            sql += " AND site = ?"
+            params += (site,)
+
+        buckets: Dict[int, Dict[str, float]] = {}
+        for bucket, category, weight in self._query(sql + " GROUP BY bucket, category ORDER BY bucket", params):
+            buckets.setdefault(bucket, empty_weights())[WasteCategory(category)] = weight
+        return [{"start": bucket, "weights": weights} for bucket, weights in buckets.items()]
+
+    def window_totals(self, start: float, end: float, site: Optional[str] = None) -> Dict[WasteCategory, float]:
+        """
+        Per-category weight over [start, end), at hour resolution.
+
+        Whole days inside the window come from the daily rollups and only the
+        partial days at either end from the hourly ones, so a query over a
+        year reads a few hundred rows whatever the event volume.
+        """
+        hour, day = GRANULARITIES["hour"], GRANULARITIES["day"]
+        start = bucket_start(start, hour)
+        end = -bucket_start(-end, hour)
+        first_day = -bucket_start(-start, day)
+        last_day = bucket_start(end, day)
+        if first_day >= last_day:
+            first_day = last_day = end
+
+        sql = (
+            "SELECT category, SUM(weight) FROM rollups WHERE ("
+            "(granularity = 'day' AND bucket >= ? AND bucket < ?) OR "
+            "(granularity = 'hour' AND ((bucket >= ? AND bucket < ?) OR (bucket >= ? AND bucket < ?))))"
+        )
+        params: tuple = (first_day, last_day, start, first_day, last_day, end)
+        if site is not None:
+            sql += " AND site = ?"
+            params += (site,)
+
+        weights = empty_weights()
+        for category, weight in self._query(sql + " GROUP BY category", params):
+            weights[WasteCategory(category)] = weight
+        return weights
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "pending": self._queue.qsize(),
+            "commits": self.commits,
+            "events": self.events,
+        }
+
+    def close(self):
+        """Flush queued writes and stop the writer thread."""
+        with self._lock:
+            if self._writer is None:
+                return
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+            self._db.close()
+            self._db = None
+
+
+weight_ledger = WeightLedger(config.WEIGHT_LEDGER_PATH, batch_max=config.WEIGHT_LEDGER_BATCH_MAX)
@@ -0,0 +1,87 @@
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+# Metrics compared against a baseline, and whether higher is better
+METRICS = {
+    "mean_ms": False,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "throughput": True,
+}
+
+
+def summarize(latencies: Sequence[float], elapsed: float = None) -> Dict[str, float]:
+    """Latency percentiles (ms) and throughput (per second) of one benchmark."""
+    values = np.asarray(latencies, dtype=float) * 1000.0
+    elapsed = elapsed if elapsed is not None else float(np.sum(latencies))
+    return {
+        "count": len(values),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "throughput": len(values) / elapsed if elapsed else 0.0,
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def sample_images(folder: str, count: int) -> List[bytes]:
+    """JPEG bytes of the images in ``folder``, or of synthetic 640x480 frames."""
+    from app.services.image_io import load_images
+
+    encoded = []
+    for image in load_images(folder, count):
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=90)
+        encoded.append(buffer.getvalue())
+    return encoded
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def write_results(suite: str, results: Dict[str, Any], path: str, settings: Dict[str, Any]):
+    payload = {
+        "suite": suite,
+        "revision": git_revision(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "settings": settings,
+        "peak_rss_mb": peak_rss_mb(),
+        "results": results,
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    print(f"Results written to {path} (peak RSS {payload['peak_rss_mb']:.0f} MB)")
+
+
+def print_row(name: str, stats: Dict[str, float]):
+    print(
+        f"{name:24s} n={stats['count']:<5d} mean={stats['mean_ms']:8.2f}ms p50={stats['p50_ms']:8.2f}ms "
+        f"p95={stats['p95_ms']:8.2f}ms p99={stats['p99_ms']:8.2f}ms {stats['throughput']:8.1f}/s"
+    )
@@ -0,0 +1,76 @@
+"""
+Compare benchmark results against a stored baseline.
+
+    python -m benchmarks.compare benchmarks/results/micro.json --baseline benchmarks/baselines/micro.json
+
+Every benchmark present in both files is compared metric by metric; a
+latency more than --tolerance above the baseline, or a throughput more
+than --tolerance below it, is a regression and makes the command exit
+non-zero. --update copies the current results over the baseline instead.
+"""
+import argparse
+import json
+import os
+import shutil
+
+from benchmarks.common import METRICS
+
+
+def compare(current, baseline, tolerance: float):
+    """Yield (benchmark, metric, baseline value, current value, change, regressed)."""
+    for name, stats in current["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if metric not in stats or not reference.get(metric):
+                continue
+            change = stats[metric] / reference[metric] - 1.0
+            regressed = change < -tolerance if higher_is_better else change > tolerance
+            yield name, metric, reference[metric], stats[metric], change, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flag benchmark regressions against a baseline")
+    parser.add_argument("results", help="results JSON written by benchmarks.micro or benchmarks.load")
+    parser.add_argument("--baseline", required=True, help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative change (default 10%%)")
+    parser.add_argument("--update", action="store_true", help="replace the baseline with these results")
+    args = parser.parse_args()
+
+    if args.update:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        shutil.copyfile(args.results, args.baseline)
+        print(f"Baseline {args.baseline} updated")
+        return
+
+    with open(args.results) as f:
+        current = json.load(f)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if current["suite"] != baseline["suite"]:
+        raise SystemExit(f"Cannot compare a {current['suite']} run with a {baseline['suite']} baseline")
+
+    print(f"{current['suite']}: {baseline['revision']} -> {current['revision']}")
+    regressions = 0
+    for name, metric, before, after, change, regressed in compare(current, baseline, args.tolerance):
+        regressions += regressed
+        print(
+            f"{name:24s} {metric:10s} {before:10.2f} -> {after:10.2f} {change:+7.1%} "
+            f"{'REGRESSION' if regressed else ''}"
+        )
+
+    rss_change = current["peak_rss_mb"] / baseline["peak_rss_mb"] - 1.0 if baseline["peak_rss_mb"] else 0.0
+    rss_regressed = rss_change > args.tolerance
+    regressions += rss_regressed
+    print(
+        f"{'peak RSS':24s} {'mb':10s} {baseline['peak_rss_mb']:10.0f} -> {current['peak_rss_mb']:10.0f} "
+        f"{rss_change:+7.1%} {'REGRESSION' if rss_regressed else ''}"
+    )
+
+    if regressions:
+        raise SystemExit(f"{regressions} regression(s) beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
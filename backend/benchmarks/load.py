@@ -0,0 +1,114 @@
+"""
+In-process load generator for the HTTP endpoints.
+
+    python -m benchmarks.load --concurrency 1,4,16 --requests 200 --output benchmarks/results/load.json
+
+Requests go straight to the ASGI app through httpx (no network, no
+uvicorn), so the numbers cover the handlers, executors, batching and
+models. Each scenario sends --requests requests from ``concurrency``
+clients and reports throughput, latency percentiles and non-200 answers.
+The result cache and request coalescing are off and the weight ledger uses
+a temporary file unless RESULT_CACHE_MAX_BYTES / COALESCE_REQUESTS /
+WEIGHT_LEDGER_PATH are set.
+"""
+import argparse
+import asyncio
+import base64
+import os
+import random
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.common import print_row, sample_images, summarize, write_results
+
+SCENARIOS = ("detect-base64", "classify", "update-weight")
+CATEGORIES = ("e-waste-useful", "e-waste-not-useful", "non-organic", "biogas", "compost")
+
+
+def request_factory(scenario: str, images: List[bytes]) -> Callable[[int], Tuple[str, str, Dict[str, Any]]]:
+    """Scenario -> function building the (method, path, json body) of request ``n``."""
+    encoded = [base64.b64encode(image).decode() for image in images]
+    if scenario == "detect-base64":
+        return lambda n: ("POST", "/detect-base64", {"image": encoded[n % len(encoded)]})
+    if scenario == "classify":
+        return lambda n: ("POST", "/api/classify", {"image_data": encoded[n % len(encoded)]})
+    if scenario == "update-weight":
+        rng = random.Random(0)
+        return lambda n: (
+            "POST",
+            "/api/update-weight",
+            {"category": rng.choice(CATEGORIES), "weight": round(rng.uniform(0.1, 5.0), 2), "site": f"bench-{n % 4}"},
+        )
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+async def drive(client, build_request, total: int, concurrency: int):
+    """Send ``total`` requests from ``concurrency`` concurrent clients."""
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    counter = iter(range(total))
+
+    async def worker():
+        for n in counter:
+            method, path, body = build_request(n)
+            start = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return latencies, elapsed, statuses
+
+
+async def run(args) -> Dict[str, Any]:
+    import httpx
+    from app.main import app
+
+    images = sample_images(args.images, args.limit)
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for scenario in args.scenarios.split(","):
+            build_request = request_factory(scenario, images)
+            # Load the models and fill the pools outside of the measurement
+            await drive(client, build_request, args.warmup, 1)
+            for concurrency in (int(c) for c in args.concurrency.split(",")):
+                latencies, elapsed, statuses = await drive(client, build_request, args.requests, concurrency)
+                name = f"{scenario}@c{concurrency}"
+                results[name] = {
+                    **summarize(latencies, elapsed),
+                    "concurrency": concurrency,
+                    "errors": sum(count for status, count in statuses.items() if status != 200),
+                    "statuses": {str(status): count for status, count in statuses.items()},
+                }
+                print_row(name, results[name])
+                if results[name]["errors"]:
+                    print(f"{'':24s} non-200 answers: {results[name]['statuses']}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the API endpoints in-process at controlled concurrency")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma separated: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma separated client counts")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and concurrency")
+    parser.add_argument("--warmup", type=int, default=5, help="requests sent before measuring each scenario")
+    parser.add_argument("--images", default="", help="folder of sample images (default: synthetic frames)")
+    parser.add_argument("--limit", type=int, default=8, help="number of sample images")
+    parser.add_argument("--output", default="benchmarks/results/load.json")
+    args = parser.parse_args()
+
+    # Settings are read when app.config is imported, so set them first
+    os.environ.setdefault("RESULT_CACHE_MAX_BYTES", "0")
+    os.environ.setdefault("COALESCE_REQUESTS", "0")
+    os.environ.setdefault("WEIGHT_LEDGER_PATH", os.path.join(tempfile.mkdtemp(), "weight_ledger.db"))
+
+    results = asyncio.run(run(args))
+    write_results("load", results, args.output, vars(args))
+
+
+if __name__ == "__main__":
+    main()
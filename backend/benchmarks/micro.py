@@ -0,0 +1,146 @@
+"""
+Microbenchmarks of each step behind the inference endpoints.
+
+    python -m benchmarks.micro --images path/to/samples --output benchmarks/results/micro.json
+
+Decode, preprocessing, every model's forward pass and the YOLOv8 result
+post-processing are timed separately on the same images. --only limits the
+run to benchmarks whose name starts with one of the given prefixes, e.g.
+--only decode,preprocess to skip loading any model.
+"""
+import argparse
+import io
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+from PIL import Image
+
+from app.services.image_io import decode_image_buffer
+from app.services.model_registry import registry
+from app.services.preprocessing import food_batch, general_batch, prepare_image
+from benchmarks.common import print_row, sample_images, summarize, write_results
+
+
+def decode_pil(image_bytes: bytes) -> np.ndarray:
+    """The full-resolution PIL decode the endpoints used before decode_image_buffer."""
+    image_np = np.array(Image.open(io.BytesIO(image_bytes)))
+    if image_np.shape[-1] == 4:
+        image_np = image_np[:, :, :3]
+    return image_np
+
+
+def time_calls(fn: Callable[[], object], repeats: int, warmup: int = 2) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def cycle(items):
+    """Callable returning the next item on every call."""
+    state = {"index": -1}
+
+    def next_item():
+        state["index"] = (state["index"] + 1) % len(items)
+        return items[state["index"]]
+
+    return next_item
+
+
+def build_benchmarks(images: List[bytes], batch_size: int) -> Dict[str, Callable[[], Callable[[], object]]]:
+    """
+    Benchmark name -> factory returning the timed callable.
+
+    Factories load their models, so only the selected benchmarks pay for it.
+    """
+    next_image = cycle(images)
+    frames = [decode_pil(image) for image in images]
+    next_frame = cycle(frames)
+    prepared = [prepare_image(image) for image in images]
+    batch = [prepared[i % len(prepared)] for i in range(batch_size)]
+
+    def yolo_results():
+        detector = registry.get("yolo")
+        return detector, [detector.model(frame, conf=detector.confidence_threshold, verbose=False) for frame in frames]
+
+    def process_results():
+        detector, results = yolo_results()
+        next_results = cycle(results)
+        return lambda: detector._process_results(next_results())
+
+    def yolo_forward():
+        detector = registry.get("yolo")
+        return lambda: detector.model(next_frame(), conf=detector.confidence_threshold, verbose=False)
+
+    def classifier_forward(name):
+        def factory():
+            import torch
+            from app.services.classifier import WasteClassifier
+
+            model = getattr(WasteClassifier(), f"{name}_model")
+            tensor = general_batch(batch)
+
+            def forward():
+                with torch.no_grad():
+                    return model(tensor)
+
+            return forward
+        return factory
+
+    def organic_forward():
+        from app.services.classifier import WasteClassifier
+
+        model = WasteClassifier().organic_model
+        pixels = food_batch(batch, model.input_spec)
+        return lambda: model.predict_pixels(pixels)
+
+    return {
+        "decode.pil": lambda: lambda: decode_pil(next_image()),
+        "decode.cv2": lambda: lambda: decode_image_buffer(next_image()),
+        "decode.cv2_reduced": lambda: lambda: decode_image_buffer(next_image(), max_side=640),
+        "preprocess.prepare": lambda: lambda: prepare_image(next_frame()),
+        "preprocess.general_batch": lambda: lambda: general_batch(batch),
+        "forward.general": classifier_forward("general"),
+        "forward.ewaste": classifier_forward("ewaste"),
+        "forward.organic": organic_forward,
+        "forward.yolo": yolo_forward,
+        "postprocess.yolo_results": process_results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time decode, preprocessing, model forward passes and post-processing")
+    parser.add_argument("--images", default="", help="folder of sample images (default: synthetic frames)")
+    parser.add_argument("--limit", type=int, default=8, help="number of sample images")
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=8, help="batch size of the classifier forward passes")
+    parser.add_argument("--only", default="", help="comma separated benchmark name prefixes")
+    parser.add_argument("--output", default="benchmarks/results/micro.json")
+    args = parser.parse_args()
+
+    images = sample_images(args.images, args.limit)
+    prefixes = [p.strip() for p in args.only.split(",") if p.strip()]
+
+    results = {}
+    for name, factory in build_benchmarks(images, args.batch_size).items():
+        if prefixes and not any(name.startswith(prefix) for prefix in prefixes):
+            continue
+        try:
+            fn = factory()
+        except Exception as e:
+            print(f"{name:24s} skipped: {str(e)}")
+            continue
+        latencies = time_calls(fn, args.repeats)
+        results[name] = summarize(latencies)
+        print_row(name, results[name])
+
+    write_results("micro", results, args.output, vars(args))
+
+
+if __name__ == "__main__":
+    main()
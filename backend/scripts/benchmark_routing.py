@@ -0,0 +1,130 @@
+"""
+Latency / accuracy trade-off of confidence routing on a labeled dataset.
+
+    python -m scripts.benchmark_routing --dataset path/to/labeled --write-priors
+
+The dataset has one folder per category (e-waste-useful, e-waste-not-useful,
+non-organic, biogas, compost). The baseline (both routes off) is run first,
+then every threshold in --thresholds with the prior route and with the
+low-res route. Each row reports accuracy, latency per image and how many
+images took each route. --write-priors stores the category shares of the
+dataset as the route priors (ROUTE_PRIORS_PATH) before benchmarking.
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter
+
+from app import config
+from app.models.schemas import WasteCategory
+from app.services.classifier import WasteClassifier
+from app.services.image_io import load_images
+from app.services.preprocessing import prepare_image
+
+GENERAL_CLASS = {
+    WasteCategory.E_WASTE_USEFUL.value: "E-waste",
+    WasteCategory.E_WASTE_NOT_USEFUL.value: "E-waste",
+    WasteCategory.COMPOST.value: "Organic",
+    WasteCategory.BIOGAS.value: "Organic",
+}
+
+
+def load_dataset(root: str, limit: int):
+    images, labels = [], []
+    for category in WasteCategory:
+        folder = os.path.join(root, category.value)
+        if not os.path.isdir(folder):
+            continue
+        for image in load_images(folder, limit):
+            images.append(image)
+            labels.append(category.value)
+    return images, labels
+
+
+def dataset_priors(labels):
+    """Share of each category within its general class (E-waste / Organic)."""
+    counts = Counter(label for label in labels if label in GENERAL_CLASS)
+    priors = {}
+    for label, count in counts.items():
+        priors.setdefault(GENERAL_CLASS[label], {})[label] = count
+    for shares in priors.values():
+        total = sum(shares.values())
+        for label in shares:
+            shares[label] /= total
+    return priors
+
+
+def run(classifier, prepared, labels, batch_size):
+    indices = list(prepared)
+    results = {}
+    start = time.perf_counter()
+    for offset in range(0, len(indices), batch_size):
+        chunk = {i: prepared[i] for i in indices[offset:offset + batch_size]}
+        results.update(classifier.classify_prepared(chunk))
+    elapsed = time.perf_counter() - start
+
+    correct = sum(1 for i in indices if results[i]["category"] == labels[i])
+    return {
+        "accuracy": correct / len(indices),
+        "ms_per_image": elapsed / len(indices) * 1000.0,
+        "routes": dict(Counter(results[i]["route"] or "error" for i in indices)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark confidence routing of the classification cascade")
+    parser.add_argument("--dataset", required=True, help="folder with one sub-folder of images per category")
+    parser.add_argument("--thresholds", default="0.8,0.9,0.95,0.98,0.99")
+    parser.add_argument("--low-res-size", type=int, default=config.ROUTE_LOW_RES_SIZE)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--limit", type=int, default=200, help="max images per category")
+    parser.add_argument("--write-priors", action="store_true", help=f"write dataset priors to {config.ROUTE_PRIORS_PATH}")
+    parser.add_argument("--json", default="", help="also write the results to this file")
+    args = parser.parse_args()
+
+    images, labels = load_dataset(args.dataset, args.limit)
+    if not images:
+        raise SystemExit(f"No labeled images found under {args.dataset}")
+    prepared = {i: prepare_image(image) for i, image in enumerate(images)}
+
+    classifier = WasteClassifier()
+    classifier.low_res_size = args.low_res_size
+    if args.write_priors:
+        classifier.priors = dataset_priors(labels)
+        with open(config.ROUTE_PRIORS_PATH, "w") as f:
+            json.dump(classifier.priors, f, indent=2)
+        print(f"Route priors written to {config.ROUTE_PRIORS_PATH}")
+    if not classifier.priors:
+        print("No route priors: the prior route is skipped (use --write-priors)")
+
+    configurations = [("baseline", 0.0)]
+    for threshold in (float(t) for t in args.thresholds.split(",")):
+        if classifier.priors:
+            configurations.append(("prior", threshold))
+        configurations.append(("low-res", threshold))
+
+    # Load every model once before timing anything
+    classifier.prior_threshold = classifier.low_res_threshold = 0.0
+    run(classifier, prepared, labels, args.batch_size)
+
+    rows = []
+    print(f"{len(images)} images, batch size {args.batch_size}")
+    for mode, threshold in configurations:
+        classifier.prior_threshold = threshold if mode == "prior" else 0.0
+        classifier.low_res_threshold = threshold if mode == "low-res" else 0.0
+        row = {"mode": mode, "threshold": threshold, **run(classifier, prepared, labels, args.batch_size)}
+        rows.append(row)
+        routes = " ".join(f"{route}={count}" for route, count in sorted(row["routes"].items()))
+        print(
+            f"{mode:8s} threshold={threshold:.2f} accuracy={row['accuracy']:.3f} "
+            f"{row['ms_per_image']:.1f}ms/image {routes}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"images": len(images), "batch_size": args.batch_size, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Classify a large archive of photos offline.
+
+    python -m scripts.bulk_classify photos.tar --output audit.jsonl
+    python -m scripts.bulk_classify photos/ --output audit.parquet --detect --resume
+
+The source is a directory (walked recursively), a tar file (read as a
+stream, compressed or not) or a zip file. Images are read one at a time,
+decoded and resized on a process pool, and fed to WasteClassifier (and,
+with --detect, ObjectDetector) in batches, so memory stays bounded by
+--batch-size and --prefetch rather than by the size of the archive.
+
+Results are appended as they come: one JSON object per image for a .jsonl
+output, or one Parquet part file per checkpoint inside a directory for a
+.parquet output (needs pyarrow). Every --checkpoint-every images the
+output is flushed and the progress and per-category aggregates are saved
+next to it; --resume continues from the last checkpoint. The aggregates
+and the images/second are written to <output>.summary.json at the end.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import tarfile
+import time
+import zipfile
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from app.services.image_io import IMAGE_EXTENSIONS
+from app.services.serialization import dumps
+
+# (key, path to read or the bytes themselves)
+Item = Tuple[str, Union[str, bytes]]
+
+
+def is_image(name: str) -> bool:
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def iter_source(source: str, skip: int = 0) -> Iterator[Item]:
+    """Images of a directory, tar or zip file in a stable order, skipping the first ``skip``."""
+    if os.path.isdir(source):
+        items = iter_directory(source)
+    elif zipfile.is_zipfile(source):
+        items = iter_zip(source)
+    elif tarfile.is_tarfile(source):
+        items = iter_tar(source)
+    else:
+        raise SystemExit(f"{source} is not a directory, tar or zip file")
+
+    for index, item in enumerate(items):
+        if index >= skip:
+            yield item
+
+
+def iter_directory(root: str) -> Iterator[Item]:
+    # Workers read the files themselves, so only paths cross the process boundary
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if is_image(name):
+                path = os.path.join(dirpath, name)
+                yield os.path.relpath(path, root), path
+
+
+def iter_tar(path: str) -> Iterator[Item]:
+    # "r|*" reads the archive front to back without seeking or an index
+    with tarfile.open(path, mode="r|*") as archive:
+        for member in archive:
+            if member.isfile() and is_image(member.name):
+                yield member.name, archive.extractfile(member).read()
+
+
+def iter_zip(path: str) -> Iterator[Item]:
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if not info.is_dir() and is_image(info.filename):
+                yield info.filename, archive.read(info)
+
+
+def init_worker():
+    import cv2
+
+    # One decode per process; the pool provides the parallelism
+    cv2.setNumThreads(1)
+
+
+def decode_item(key: str, payload: Union[str, bytes], max_side: Optional[int]):
+    """
+    Decode and prepare one image in a pool worker.
+
+    Returns (key, PreparedImage, detector frame, decode factor, error). With
+    ``max_side`` the image is decoded once for the detector and the
+    classifier input is cut from the same frame.
+    """
+    from app.services.image_io import decode_image_buffer
+    from app.services.preprocessing import RESIZE_SHORT_SIDE, PreparedImage
+
+    try:
+        if isinstance(payload, str):
+            with open(payload, "rb") as f:
+                payload = f.read()
+        if max_side:
+            frame, factor = decode_image_buffer(payload, max_side=max_side)
+            return key, PreparedImage(frame), frame, factor, None
+        rgb, _ = decode_image_buffer(payload, min_side=RESIZE_SHORT_SIDE)
+        return key, PreparedImage(rgb), None, 1, None
+    except Exception as e:
+        return key, None, None, 1, f"Invalid image data: {str(e)}"
+
+
+def decoded_batches(pool, items: Iterator[Item], batch_size: int, max_side: Optional[int], prefetch: int):
+    """Decode ``items`` on ``pool``, keeping ``prefetch`` batches in flight ahead of the consumer."""
+    pending = deque()
+    chunk: List[Item] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == batch_size:
+            pending.append([pool.submit(decode_item, key, payload, max_side) for key, payload in chunk])
+            chunk = []
+            if len(pending) > prefetch:
+                yield [future.result() for future in pending.popleft()]
+    if chunk:
+        pending.append([pool.submit(decode_item, key, payload, max_side) for key, payload in chunk])
+    while pending:
+        yield [future.result() for future in pending.popleft()]
+
+
+def classify_batch(classifier, detector, batch) -> List[Dict[str, Any]]:
+    """One output row per decoded item, in batch order."""
+    prepared = {index: item[1] for index, item in enumerate(batch) if item[4] is None}
+    results = classifier.classify_prepared(prepared)
+
+    detections = {}
+    if detector is not None and prepared:
+        indices = list(prepared)
+        frames = [batch[index][2] for index in indices]
+        scales = [batch[index][3] for index in indices]
+        detections = dict(zip(indices, detector.detect_batch(frames, scales)))
+
+    rows = []
+    for index, (key, _, _, _, error) in enumerate(batch):
+        result = results.get(index) or {"category": None, "confidence": 0.0, "recyclable": None, "route": None, "error": error}
+        row = {
+            "key": key,
+            "category": result["category"].value if result["category"] is not None else None,
+            "confidence": result["confidence"],
+            "recyclable": result["recyclable"],
+            "route": result["route"],
+            "error": result["error"],
+        }
+        if detector is not None:
+            row["detections"] = detections.get(index, [])
+        rows.append(row)
+    return rows
+
+
+class JsonlWriter:
+    """Appends rows to a JSON Lines file; commit() returns the byte offset to resume from."""
+
+    def __init__(self, path: str, state: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.file = open(path, "r+b" if state and os.path.exists(path) else "wb")
+        # Drop rows written after the last checkpoint
+        self.file.truncate(state["offset"] if state else 0)
+        self.file.seek(0, os.SEEK_END)
+
+    def write(self, rows: List[Dict[str, Any]]):
+        self.file.write(b"".join(dumps(row) + b"\n" for row in rows))
+
+    def commit(self) -> Dict[str, Any]:
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {"offset": self.file.tell()}
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """Writes one Parquet part file per commit into a directory; commit() returns the part count."""
+
+    def __init__(self, directory: str, state: Optional[Dict[str, Any]] = None):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow (pip install pyarrow); use a .jsonl output instead")
+
+        self.directory = directory
+        self.parts = state["parts"] if state else 0
+        self.rows: List[Dict[str, Any]] = []
+        os.makedirs(directory, exist_ok=True)
+        # Parts written after the last checkpoint are written again
+        for path in glob.glob(os.path.join(directory, "part-*.parquet")):
+            if int(os.path.basename(path)[5:10]) >= self.parts:
+                os.remove(path)
+
+    def write(self, rows: List[Dict[str, Any]]):
+        for row in rows:
+            if "detections" in row:
+                row = {**row, "detections": dumps(row["detections"]).decode()}
+            self.rows.append(row)
+
+    def commit(self) -> Dict[str, Any]:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.rows:
+            path = os.path.join(self.directory, f"part-{self.parts:05d}.parquet")
+            pq.write_table(pa.Table.from_pylist(self.rows), path)
+            self.parts += 1
+            self.rows = []
+        return {"parts": self.parts}
+
+    def close(self):
+        pass
+
+
+def update_aggregates(aggregates: Dict[str, Counter], rows: List[Dict[str, Any]]):
+    for row in rows:
+        aggregates["categories"][row["category"] or "error"] += 1
+        aggregates["routes"][row["route"] or "error"] += 1
+        for detection in row.get("detections", ()):
+            aggregates["detections"][detection["waste_category"]] += 1
+
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify a directory, tar or zip of photos in bulk")
+    parser.add_argument("source", help="directory, tar (optionally compressed) or zip file of images")
+    parser.add_argument("--output", required=True, help="results file: .jsonl, or .parquet (a directory of part files)")
+    parser.add_argument("--detect", action="store_true", help="also run the YOLOv8 detector on every image")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1), help="decode processes")
+    parser.add_argument("--prefetch", type=int, default=2, help="batches decoded ahead of inference")
+    parser.add_argument("--checkpoint-every", type=int, default=1000, help="images between checkpoints")
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between progress lines")
+    parser.add_argument("--resume", action="store_true", help="continue from the last checkpoint")
+    args = parser.parse_args()
+
+    checkpoint_path = args.output.rstrip("/") + ".checkpoint.json"
+    summary_path = args.output.rstrip("/") + ".summary.json"
+    checkpoint = None
+    if args.resume and os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint["source"] != os.path.abspath(args.source) or checkpoint["detect"] != args.detect:
+            raise SystemExit(f"{checkpoint_path} belongs to a different run; drop --resume to start over")
+        print(f"Resuming after {checkpoint['processed']} images")
+    elif os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    processed = checkpoint["processed"] if checkpoint else 0
+    aggregates = {
+        name: Counter(checkpoint["aggregates"][name] if checkpoint else {})
+        for name in ("categories", "routes", "detections")
+    }
+    writer_class = ParquetWriter if args.output.endswith(".parquet") else JsonlWriter
+    writer = writer_class(args.output, checkpoint["writer"] if checkpoint else None)
+
+    from app.services.classifier import WasteClassifier
+
+    classifier = WasteClassifier()
+    detector = None
+    max_side = None
+    if args.detect:
+        from app.models.detection import ObjectDetector  # noqa: F401 (registers "yolo")
+        from app.services.model_registry import registry
+
+        detector = registry.get("yolo")
+        max_side = detector.imgsz
+
+    def commit():
+        save_checkpoint(checkpoint_path, {
+            "source": os.path.abspath(args.source),
+            "detect": args.detect,
+            "processed": processed,
+            "writer": writer.commit(),
+            "aggregates": {name: dict(counts) for name, counts in aggregates.items()},
+        })
+
+    start_processed = processed
+    start = last_report = time.perf_counter()
+    last_commit = processed
+    items = iter_source(args.source, skip=processed)
+    try:
+        # Spawned, not forked: the parent already runs torch/OpenMP threads
+        # and a forked child can inherit their locks held
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=context, initializer=init_worker) as pool:
+            for batch in decoded_batches(pool, items, args.batch_size, max_side, args.prefetch):
+                rows = classify_batch(classifier, detector, batch)
+                writer.write(rows)
+                update_aggregates(aggregates, rows)
+                processed += len(rows)
+
+                if processed - last_commit >= args.checkpoint_every:
+                    commit()
+                    last_commit = processed
+                now = time.perf_counter()
+                if now - last_report >= args.report_every:
+                    rate = (processed - start_processed) / (now - start)
+                    print(f"{processed} images, {rate:.1f} images/s")
+                    last_report = now
+        commit()
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    rate = (processed - start_processed) / elapsed if elapsed else 0.0
+    summary = {
+        "source": os.path.abspath(args.source),
+        "images": processed,
+        "images_per_second": rate,
+        **{name: dict(counts.most_common()) for name, counts in aggregates.items() if counts},
+    }
+    with open(summary_path, "w") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"{processed} images ({processed - start_processed} this run) at {rate:.1f} images/s")
+    for category, count in aggregates["categories"].most_common():
+        print(f"  {category:20s} {count}")
+    print(f"Results in {args.output}, summary in {summary_path}")
+
+
+if __name__ == "__main__":
+    main()
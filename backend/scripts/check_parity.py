@@ -0,0 +1,112 @@
+"""
+Check exported graphs against the eager models and compare their latency.
+
+    python -m scripts.check_parity --backend onnx --images path/to/samples
+
+Without --images the classifiers are fed random tensors and the detector a
+few synthetic frames. Exits non-zero when any model's outputs drift beyond
+--atol or its top-1 predictions disagree.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.models.detection import ObjectDetector
+from app.services.classifier import load_ewaste_model, load_general_model
+from app.services.image_io import load_images
+from app.services.organic import load_organic_model
+from app.services.preprocessing import general_batch, prepare_image
+
+def timed(fn, repeats: int):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeats * 1000.0
+
+
+def compare_module(name, eager, exported, batch, atol, repeats):
+    import torch
+
+    with torch.no_grad():
+        expected, eager_ms = timed(lambda: eager(batch), repeats)
+        actual, exported_ms = timed(lambda: exported(batch), repeats)
+
+    max_diff = float((expected - actual).abs().max())
+    agreement = float((expected.argmax(dim=1) == actual.argmax(dim=1)).float().mean())
+    return report(name, max_diff, agreement, eager_ms, exported_ms, atol)
+
+
+def report(name, max_diff, agreement, eager_ms, exported_ms, atol):
+    ok = max_diff <= atol and agreement == 1.0
+    speedup = eager_ms / exported_ms if exported_ms else float("nan")
+    print(
+        f"{name:8s} max|diff|={max_diff:.2e} top1={agreement:.3f} "
+        f"eager={eager_ms:.1f}ms exported={exported_ms:.1f}ms speedup={speedup:.2f}x "
+        f"{'OK' if ok else 'MISMATCH'}"
+    )
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parity and latency of exported models vs eager")
+    parser.add_argument("--backend", choices=("onnx", "torchscript"), default="onnx")
+    parser.add_argument("--images", default="", help="folder of sample images")
+    parser.add_argument("--limit", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--atol", type=float, default=1e-3)
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.limit)
+    batch = general_batch([prepare_image(image) for image in images])
+
+    results = [
+        compare_module(
+            "general", load_general_model(), load_general_model(args.backend), batch, args.atol, args.repeats
+        ),
+        compare_module(
+            "ewaste", load_ewaste_model(), load_ewaste_model(args.backend), batch, args.atol, args.repeats
+        ),
+    ]
+
+    eager_organic = load_organic_model("torch")
+    exported_organic = load_organic_model(args.backend)
+    expected, eager_ms = timed(lambda: eager_organic.predict_proba(images), args.repeats)
+    actual, exported_ms = timed(lambda: exported_organic.predict_proba(images), args.repeats)
+    results.append(report(
+        "organic",
+        float(np.abs(expected - actual).max()),
+        float((expected.argmax(axis=1) == actual.argmax(axis=1)).mean()),
+        eager_ms,
+        exported_ms,
+        args.atol,
+    ))
+
+    # Detections are compared by their top class per frame; box coordinates
+    # shift slightly with the letterbox implementation of each backend.
+    frames = [np.array(image) for image in images]
+    eager_detector = ObjectDetector()
+    exported_detector = ObjectDetector(backend=args.backend)
+    expected, eager_ms = timed(lambda: eager_detector.detect_batch(frames), args.repeats)
+    actual, exported_ms = timed(lambda: exported_detector.detect_batch(frames), args.repeats)
+
+    def top_classes(batch_detections):
+        return [
+            max(d, key=lambda x: x["confidence"])["class_name"] if d else None
+            for d in batch_detections
+        ]
+
+    agreement = float(np.mean([a == b for a, b in zip(top_classes(expected), top_classes(actual))]))
+    max_diff = max(
+        (abs(a["confidence"] - b["confidence"]) for e, x in zip(expected, actual) for a, b in zip(e, x)),
+        default=0.0,
+    )
+    results.append(report("yolo", max_diff, agreement, eager_ms, exported_ms, max(args.atol, 1e-2)))
+
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
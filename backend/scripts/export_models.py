@@ -0,0 +1,140 @@
+"""
+Export the serving models to ONNX, falling back to TorchScript.
+
+Run from the backend directory:
+
+    python -m scripts.export_models                # all models
+    python -m scripts.export_models general ewaste
+    python -m scripts.export_models --format torchscript
+
+The graphs are written next to the original weights, where the onnx and
+torchscript backends (DETECTOR_BACKEND, CLASSIFIER_BACKEND, ORGANIC_BACKEND)
+look for them. "yolo" exports every tier in DETECTOR_TIERS. The YOLOv8 ONNX
+graphs take any input size; TorchScript is traced at DETECT_IMGSZ and the
+detector serves it at that size only.
+"""
+import argparse
+import os
+from typing import List, Union
+
+from app import config
+from app.services.classifier import (
+    EWASTE_WEIGHTS,
+    GENERAL_WEIGHTS,
+    load_ewaste_model,
+    load_general_model,
+)
+from app.services.onnx_backend import exported_path
+from app.services.organic import ORGANIC_MODEL_NAME, ORGANIC_ONNX_PATH, export_organic_onnx
+from app.services.tiering import parse_tiers
+
+YOLO_TIERS = parse_tiers(config.DETECTOR_TIERS)
+# The smallest tier is the one registered as "yolo"
+YOLO_WEIGHTS = f"yolov8{YOLO_TIERS[0]}.pt"
+MODELS = ("yolo", "general", "ewaste", "organic")
+
+
+def _export_module(module, weights_path: str, fmt: str, opset: int, input_size: int = 224) -> str:
+    import torch
+
+    dummy = torch.randn(1, 3, input_size, input_size)
+    path = exported_path(weights_path, fmt)
+    if fmt == "onnx":
+        torch.onnx.export(
+            module,
+            (dummy,),
+            path,
+            input_names=["input"],
+            output_names=["logits"],
+            dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=opset,
+        )
+    else:
+        with torch.no_grad():
+            traced = torch.jit.trace(module, dummy)
+        traced.save(path)
+    return path
+
+
+def export_general(fmt: str, opset: int) -> str:
+    return _export_module(load_general_model(), GENERAL_WEIGHTS, fmt, opset)
+
+
+def export_ewaste(fmt: str, opset: int) -> str:
+    return _export_module(load_ewaste_model(), EWASTE_WEIGHTS, fmt, opset)
+
+
+def export_yolo(fmt: str, opset: int) -> List[str]:
+    from ultralytics import YOLO
+
+    paths = []
+    for tier in YOLO_TIERS:
+        model = YOLO(f"yolov8{tier}.pt")
+        if fmt == "onnx":
+            paths.append(model.export(format="onnx", dynamic=True, opset=opset))
+        else:
+            paths.append(model.export(format="torchscript", imgsz=config.DETECT_IMGSZ))
+    return paths
+
+
+def export_organic(fmt: str, opset: int) -> str:
+    if fmt == "onnx":
+        export_organic_onnx(ORGANIC_ONNX_PATH, opset)
+        return ORGANIC_ONNX_PATH
+
+    import torch
+    from transformers import AutoModelForImageClassification
+
+    model = AutoModelForImageClassification.from_pretrained(ORGANIC_MODEL_NAME, torchscript=True)
+    model.eval()
+    size = getattr(model.config, "image_size", 224)
+    path = exported_path(ORGANIC_ONNX_PATH, "torchscript")
+    with torch.no_grad():
+        traced = torch.jit.trace(model, torch.randn(1, 3, size, size))
+    traced.save(path)
+    return path
+
+
+EXPORTERS = {
+    "yolo": export_yolo,
+    "general": export_general,
+    "ewaste": export_ewaste,
+    "organic": export_organic,
+}
+
+
+def export(name: str, fmt: str, opset: int) -> Union[str, List[str]]:
+    """Export one model, retrying as TorchScript if the ONNX export fails."""
+    try:
+        return EXPORTERS[name](fmt, opset)
+    except Exception as e:
+        if fmt != "onnx":
+            raise
+        print(f"ONNX export of {name} failed ({e}); falling back to TorchScript")
+        return EXPORTERS[name]("torchscript", opset)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export serving models to ONNX or TorchScript")
+    parser.add_argument("models", nargs="*", choices=MODELS, help="models to export (default: all)")
+    parser.add_argument("--format", choices=("onnx", "torchscript"), default="onnx")
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    failed = []
+    for name in args.models or MODELS:
+        try:
+            paths = export(name, args.format, args.opset)
+            for path in paths if isinstance(paths, list) else [paths]:
+                size_mb = os.path.getsize(path) / 1e6 if os.path.isfile(str(path)) else 0.0
+                print(f"{name}: {path} ({size_mb:.1f} MB)")
+        except Exception as e:
+            print(f"{name}: export failed: {e}")
+            failed.append(name)
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Build INT8 graphs for the general CNN, the e-waste ResNet-18 and YOLOv8n and
+gate them on top-1 agreement with the FP32 models.
+
+    python -m scripts.quantize_models --calibration path/to/images
+    python -m scripts.quantize_models general --mode dynamic --eval path/to/holdout
+
+Static mode calibrates activation ranges over the calibration folder;
+dynamic mode only quantizes weights. Each model is then evaluated against
+its FP32 ONNX graph and the result is recorded in the quantization manifest.
+QUANTIZED_MODELS serves a model in INT8 only if its recorded agreement is
+at least QUANTIZATION_MIN_AGREEMENT.
+"""
+import argparse
+import os
+
+import numpy as np
+
+from app import config
+from app.models.detection import ObjectDetector
+from app.services.classifier import EWASTE_WEIGHTS, GENERAL_WEIGHTS
+from app.services.image_io import load_images
+from app.services.preprocessing import general_batch, prepare_image
+from app.services.onnx_backend import OnnxModule, create_session, exported_path
+from app.services.quantization import (
+    QUANTIZABLE_MODELS,
+    ImageFolderCalibrationReader,
+    letterbox,
+    quantize,
+    read_manifest,
+    write_manifest,
+)
+from scripts.export_models import YOLO_WEIGHTS, export
+
+WEIGHTS = {
+    "general": GENERAL_WEIGHTS,
+    "ewaste": EWASTE_WEIGHTS,
+    "yolo": YOLO_WEIGHTS,
+}
+
+
+def classifier_preprocess(image: np.ndarray) -> np.ndarray:
+    return general_batch([prepare_image(image)]).numpy()
+
+
+def classifier_agreement(fp32_path, int8_path, images, preprocess):
+    import torch
+
+    fp32, int8 = OnnxModule(fp32_path), OnnxModule(int8_path)
+    batch = torch.from_numpy(np.concatenate([preprocess(image) for image in images]))
+    return float((fp32(batch).argmax(dim=1) == int8(batch).argmax(dim=1)).float().mean())
+
+
+def detector_agreement(images):
+    """Share of frames whose top detection (or lack of one) matches FP32."""
+    fp32 = ObjectDetector(backend="onnx")
+    int8 = ObjectDetector(backend="int8")
+    matches = []
+    for image in images:
+        expected = fp32.detect_batch([image])[0]
+        actual = int8.detect_batch([image])[0]
+        top = lambda detections: max(detections, key=lambda d: d["confidence"])["class_name"] if detections else None
+        matches.append(top(expected) == top(actual))
+    return float(np.mean(matches))
+
+
+def quantize_and_evaluate(name, mode, calibration_images, eval_images):
+    weights = WEIGHTS[name]
+    fp32_path = exported_path(weights, "onnx")
+    int8_path = exported_path(weights, "int8")
+    if not os.path.exists(fp32_path):
+        export(name, "onnx", 17)
+
+    preprocess = letterbox if name == "yolo" else classifier_preprocess
+    reader = None
+    if mode == "static":
+        input_name = create_session(fp32_path).get_inputs()[0].name
+        reader = ImageFolderCalibrationReader(input_name, calibration_images, preprocess)
+    quantize(fp32_path, int8_path, mode, reader)
+
+    if name == "yolo":
+        agreement = detector_agreement(eval_images)
+    else:
+        agreement = classifier_agreement(fp32_path, int8_path, eval_images, preprocess)
+
+    return {
+        "mode": mode,
+        "path": int8_path,
+        "agreement": agreement,
+        "threshold": config.QUANTIZATION_MIN_AGREEMENT,
+        "approved": agreement >= config.QUANTIZATION_MIN_AGREEMENT,
+        "eval_images": len(eval_images),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize serving models to INT8 with an agreement gate")
+    parser.add_argument("models", nargs="*", choices=QUANTIZABLE_MODELS, help="models to quantize (default: all)")
+    parser.add_argument("--calibration", required=True, help="folder of calibration images")
+    parser.add_argument("--eval", default="", help="folder of evaluation images (default: calibration folder)")
+    parser.add_argument("--mode", choices=("static", "dynamic"), default="static")
+    parser.add_argument("--limit", type=int, default=200, help="max images per folder")
+    args = parser.parse_args()
+
+    calibration_images = [np.array(image) for image in load_images(args.calibration, args.limit)]
+    eval_images = [np.array(image) for image in load_images(args.eval or args.calibration, args.limit)]
+    if not calibration_images or not eval_images:
+        raise SystemExit("No images found for calibration / evaluation")
+
+    manifest = read_manifest()
+    rejected = []
+    for name in args.models or QUANTIZABLE_MODELS:
+        entry = quantize_and_evaluate(name, args.mode, calibration_images, eval_images)
+        manifest[name] = entry
+        status = "approved" if entry["approved"] else "REJECTED"
+        print(f"{name}: top-1 agreement {entry['agreement']:.3f} (threshold {entry['threshold']:.3f}) {status}")
+        if not entry["approved"]:
+            rejected.append(name)
+
+    write_manifest(manifest)
+    if rejected:
+        raise SystemExit(f"Below agreement threshold: {', '.join(rejected)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture(autouse=True)
+def backend_cwd(monkeypatch):
+    # Model weights and exported graphs are addressed relative to backend/
+    monkeypatch.chdir(BACKEND_DIR)
@@ -0,0 +1,146 @@
+import asyncio
+import base64
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+torch = pytest.importorskip("torch")
+
+from app import config
+from app.services import classifier as classifier_module
+from app.services.classifier import WasteClassifier
+from app.services.model_registry import ModelRegistry
+from app.services.preprocessing import GENERAL_SPEC
+
+# The stub general model predicts the dominant color channel:
+# red -> E-waste, green -> Non-organic, blue -> Organic
+RED, GREEN, BLUE = (255, 0, 0), (0, 255, 0), (0, 0, 255)
+
+
+def encode(color, size=(320, 240)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+class StubGeneral:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, batch):
+        self.batches.append(len(batch))
+        channel = batch.mean(dim=(2, 3)).argmax(dim=1)
+        return torch.nn.functional.one_hot(channel, 3).float() * 10
+
+
+class StubEwaste:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, batch):
+        self.batches.append(len(batch))
+        # Always "Battery"
+        return torch.tensor([[5.0, 0.0]]).repeat(len(batch), 1)
+
+
+class StubOrganic:
+    input_spec = GENERAL_SPEC
+    resizable_input = False
+    id2label = {0: "Fruit", 1: "Meat"}
+
+    def __init__(self):
+        self.batches = []
+
+    def predict_pixels(self, pixel_values):
+        self.batches.append(len(pixel_values))
+        return np.tile(np.array([[0.9, 0.1]], dtype=np.float32), (len(pixel_values), 1))
+
+
+@pytest.fixture
+def models(monkeypatch):
+    stubs = {"general": StubGeneral(), "ewaste": StubEwaste(), "organic": StubOrganic()}
+    registry = ModelRegistry()
+    for name, stub in stubs.items():
+        registry.register(name, lambda stub=stub: stub)
+    monkeypatch.setattr(classifier_module, "registry", registry)
+    return stubs
+
+
+@pytest.fixture
+def waste_classifier(models):
+    waste_classifier = WasteClassifier()
+    # Every E-waste and Organic image takes the full route
+    waste_classifier.prior_threshold = 0
+    waste_classifier.low_res_threshold = 0
+    return waste_classifier
+
+
+IMAGES = [encode(RED), "not base64!", encode(GREEN), encode(BLUE), encode(RED, (64, 900)), encode(BLUE)]
+EXPECTED = [
+    ("e-waste-useful", "full"),
+    None,
+    ("non-organic", "general"),
+    ("compost", "full"),
+    ("e-waste-useful", "full"),
+    ("compost", "full"),
+]
+
+
+def check_results(results):
+    assert len(results) == len(EXPECTED)
+    for result, expected in zip(results, EXPECTED):
+        category = result["category"].value if hasattr(result["category"], "value") else result["category"]
+        if expected is None:
+            assert category is None
+            assert result["error"].startswith("Invalid image data")
+        else:
+            assert (category, result["route"]) == expected
+            assert result["error"] is None
+
+
+def test_classify_batch_keeps_order_and_runs_each_stage_once(waste_classifier, models):
+    results = waste_classifier.classify_batch(IMAGES)
+
+    check_results(results)
+    assert results[0]["confidence"] == pytest.approx(torch.softmax(torch.tensor([5.0, 0.0]), 0)[0].item())
+    assert results[3]["confidence"] == pytest.approx(0.9)
+    # One pass over the five decodable images, then one per group
+    assert models["general"].batches == [5]
+    assert models["ewaste"].batches == [2]
+    assert models["organic"].batches == [2]
+
+
+def test_stage_failure_only_fails_its_group(waste_classifier, models):
+    def broken(pixel_values):
+        raise RuntimeError("organic model crashed")
+
+    models["organic"].predict_pixels = broken
+    results = waste_classifier.classify_batch(IMAGES)
+
+    assert [result["error"] for result in results[3::2]] == ["organic model crashed"] * 2
+    assert results[0]["category"].value == "e-waste-useful"
+    assert results[2]["category"].value == "non-organic"
+
+
+def test_classify_batch_endpoint(waste_classifier, models, monkeypatch):
+    import httpx
+    from fastapi import FastAPI
+
+    from app.routers import classification
+
+    monkeypatch.setattr(classification, "classifier", waste_classifier)
+    monkeypatch.setattr(config, "WARMUP_MODELS", "")
+    app = FastAPI()
+    app.include_router(classification.router, prefix="/api")
+
+    async def call():
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            return await client.post("/api/classify-batch", json={"images": IMAGES})
+
+    response = asyncio.run(call())
+
+    assert response.status_code == 200
+    check_results(response.json()["results"])
+    assert models["general"].batches == [5]
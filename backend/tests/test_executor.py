@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from app import config
+from app import main
+from app.services.executor import InferenceExecutor, InferenceTimeoutError, QueueFullError
+
+
+def blocking_job(release: threading.Event, started: threading.Event = None):
+    def job(*args):
+        if started is not None:
+            started.set()
+        release.wait(5)
+        return []
+    return job
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def executor():
+    # Queued jobs that time out before starting are cancelled and give their
+    # slot back, so only the timeout tests shorten this
+    executor = InferenceExecutor("test", workers=1, max_queue=1, timeout=5)
+    yield executor
+    executor.shutdown()
+
+
+def test_admission_rejects_beyond_workers_plus_queue(executor):
+    release = threading.Event()
+
+    async def fill_then_overflow():
+        jobs = [asyncio.ensure_future(executor.run(blocking_job(release))) for _ in range(executor.capacity)]
+        await asyncio.sleep(0)
+        assert executor.in_flight == executor.capacity == 2
+        assert executor.queue_depth == 1
+        with pytest.raises(QueueFullError) as rejected:
+            await executor.run(blocking_job(release))
+        release.set()
+        await asyncio.gather(*jobs)
+        return rejected.value
+
+    error = asyncio.run(fill_then_overflow())
+
+    assert error.retry_after == config.RETRY_AFTER_SECONDS
+    assert wait_until(lambda: executor.in_flight == 0)
+
+
+def test_timed_out_job_keeps_its_slot_until_it_finishes(executor):
+    release, started = threading.Event(), threading.Event()
+    executor.timeout = 0.05
+
+    with pytest.raises(InferenceTimeoutError):
+        asyncio.run(executor.run(blocking_job(release, started)))
+
+    # The caller gave up, but the worker is still busy with the job
+    assert started.is_set()
+    assert executor.in_flight == 1
+    release.set()
+    assert wait_until(lambda: executor.in_flight == 0)
+
+
+@pytest.fixture
+def app_executor(monkeypatch, executor):
+    monkeypatch.setattr(main, "detector_executor", executor)
+    # No startup warm-up in these tests; the detector never gets called
+    monkeypatch.setattr(config, "WARMUP_MODELS", "")
+    return executor
+
+
+def post_frame(client, body):
+    return client.post("/detect-binary", content=body, headers={"content-type": "application/octet-stream"})
+
+
+def test_full_executor_answers_503_with_retry_after(app_executor, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(main, "detect_buffer", blocking_job(release))
+
+    async def overflow():
+        async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+            jobs = [asyncio.ensure_future(app_executor.run(blocking_job(release))) for _ in range(app_executor.capacity)]
+            await asyncio.sleep(0)
+            response = await post_frame(client, b"frame")
+            release.set()
+            await asyncio.gather(*jobs)
+        return response
+
+    response = asyncio.run(overflow())
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(config.RETRY_AFTER_SECONDS)
+    assert "queue is full" in response.json()["detail"]
+
+
+def test_timed_out_request_answers_504_and_holds_its_slot(app_executor, monkeypatch):
+    release, started = threading.Event(), threading.Event()
+    app_executor.timeout = 0.05
+    monkeypatch.setattr(main, "detect_buffer", blocking_job(release, started))
+
+    async def call():
+        async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+            return await post_frame(client, b"slow frame")
+
+    response = asyncio.run(call())
+
+    assert response.status_code == 504
+    assert "timed out" in response.json()["detail"]
+    assert started.is_set()
+    assert app_executor.in_flight == 1
+    release.set()
+    assert wait_until(lambda: app_executor.in_flight == 0)
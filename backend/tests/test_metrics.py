@@ -0,0 +1,73 @@
+import pytest
+
+from app.services.metrics import (
+    Callback,
+    Counter,
+    Histogram,
+    merge_families,
+    render_prometheus,
+    with_labels,
+)
+
+
+def test_counter_type_matches_sample_name():
+    counter = Counter("requests", "Requests served", labels=("route",))
+    counter.inc("detect")
+    counter.inc("detect", amount=2)
+
+    text = render_prometheus([counter.collect()])
+
+    assert text == (
+        "# HELP requests_total Requests served\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{route="detect"} 3.0\n'
+    )
+
+
+def test_callback_counter_and_gauge():
+    families = [
+        Callback("hits", "Cache hits", lambda: 5, kind="counter").collect(),
+        Callback("depth", "Queue depth", lambda: {("a",): 1, ("b",): 2}, labels=("queue",)).collect(),
+    ]
+
+    text = render_prometheus(families)
+
+    assert "# TYPE hits_total counter\nhits_total 5.0\n" in text
+    assert '# TYPE depth gauge\ndepth{queue="a"} 1.0\ndepth{queue="b"} 2.0\n' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency", (0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value)
+
+    text = render_prometheus([histogram.collect()])
+
+    assert 'latency_seconds_bucket{le="0.1"} 1.0\n' in text
+    assert 'latency_seconds_bucket{le="1.0"} 2.0\n' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3.0\n' in text
+    assert "latency_seconds_count 3.0\n" in text
+    assert histogram.snapshot()["sum"] == pytest.approx(5.55)
+
+
+def test_label_values_are_escaped():
+    counter = Counter("errors", "Errors", labels=("message",))
+    counter.inc('bad "quote"\\n')
+
+    assert 'errors_total{message="bad \\"quote\\"\\\\n"} 1.0' in render_prometheus([counter.collect()])
+
+
+def test_merge_families_across_processes():
+    web, server = Counter("passes", "Passes"), Counter("passes", "Passes")
+    web.inc()
+    server.inc(amount=2)
+
+    merged = merge_families(
+        with_labels([web.collect()], process="web"),
+        with_labels([server.collect()], process="model-server"),
+    )
+
+    assert len(merged) == 1
+    name, kind, _, samples = merged[0]
+    assert (name, kind) == ("passes_total", "counter")
+    assert [(labels["process"], value) for _, labels, value in samples] == [("web", 1), ("model-server", 2)]
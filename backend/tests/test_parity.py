@@ -0,0 +1,55 @@
+"""
+Exported classifier graphs against the eager models on a fixed input.
+
+Each case skips when torch, the backend's runtime, the eager weights or the
+exported graph is missing; run python -m scripts.export_models to produce
+the graphs. scripts/check_parity.py covers the organic model and the
+detector, and compares latency.
+"""
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from app.services.classifier import (  # noqa: E402
+    EWASTE_WEIGHTS,
+    GENERAL_WEIGHTS,
+    load_ewaste_model,
+    load_general_model,
+)
+from app.services.onnx_backend import exported_path  # noqa: E402
+
+ATOL = 1e-3
+
+MODELS = {
+    "general": (GENERAL_WEIGHTS, load_general_model),
+    "ewaste": (EWASTE_WEIGHTS, load_ewaste_model),
+}
+
+
+@pytest.fixture(scope="module")
+def batch():
+    generator = torch.Generator().manual_seed(0)
+    return torch.randn(4, 3, 224, 224, generator=generator)
+
+
+@pytest.mark.parametrize("backend", ["onnx", "torchscript"])
+@pytest.mark.parametrize("name", sorted(MODELS))
+def test_exported_matches_eager(name, backend, batch):
+    weights, load = MODELS[name]
+    if backend == "onnx":
+        pytest.importorskip("onnxruntime")
+    if not os.path.exists(weights):
+        pytest.skip(f"no eager weights at {weights}")
+    if not os.path.exists(exported_path(weights, backend)):
+        pytest.skip(f"no {backend} export of {name}")
+
+    eager, exported = load(), load(backend)
+    with torch.no_grad():
+        expected = eager(batch)
+        actual = exported(batch)
+
+    assert actual.shape == expected.shape
+    assert torch.equal(actual.argmax(dim=1), expected.argmax(dim=1))
+    assert float((actual - expected).abs().max()) <= ATOL
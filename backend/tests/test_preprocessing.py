@@ -0,0 +1,160 @@
+"""
+The shared preprocessing (app.services.preprocessing) against the
+pipelines it replaced: torchvision's Resize(256) -> CenterCrop(224) ->
+ToTensor -> Normalize for the general / e-waste models, and the Hugging
+Face AutoImageProcessor for the food model.
+
+The two differ only in resampling (OpenCV INTER_AREA from the shared
+256 intermediate instead of PIL bilinear from the full image) and in how
+an odd crop margin is rounded, so inputs are compared within a tolerance
+on the mean and the 99th percentile of the absolute difference, in
+normalised model-input units. Those bounds are about 2 grey levels on
+average for both models. The top-1 test runs the real models on both
+inputs and expects the same label wherever the baseline's top two
+classes are not a near tie.
+
+Samples are seeded synthetic JPEG scenes; set PARITY_IMAGES to a folder
+of photos to check those too. Each case skips when torch, torchvision,
+transformers (or the model download) or the model weights are missing.
+"""
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+torch = pytest.importorskip("torch")
+transforms = pytest.importorskip("torchvision.transforms")
+
+from app.services.image_io import load_images  # noqa: E402
+from app.services.organic import ORGANIC_MODEL_NAME  # noqa: E402
+from app.services.preprocessing import (  # noqa: E402
+    IMAGENET_MEAN,
+    IMAGENET_STD,
+    NormalizeSpec,
+    food_batch,
+    general_batch,
+    prepare_image,
+)
+
+GENERAL_MEAN_ATOL = 0.04
+GENERAL_P99_ATOL = 0.15
+FOOD_MEAN_ATOL = 0.02
+FOOD_P99_ATOL = 0.08
+# Baseline top-1 minus top-2 probability below which a label flip is a tie
+TOP1_MARGIN = 0.05
+
+SIZES = [(640, 480), (300, 500), (1024, 768), (4000, 3000)]
+
+baseline_general = transforms.Compose([
+    transforms.Resize(256),
+    transforms.CenterCrop(224),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=list(IMAGENET_MEAN), std=list(IMAGENET_STD)),
+])
+
+
+def scene(width, height, seed):
+    """A smooth random scene with one flat rectangle, saved as a JPEG."""
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (height // 40 + 2, width // 40 + 2, 3), dtype=np.uint8)
+    pixels = np.array(Image.fromarray(coarse).resize((width, height), Image.BICUBIC))
+    pixels[height // 3:height // 2, width // 4:width // 2] = rng.integers(0, 256, 3)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
+
+
+def encode(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def samples():
+    """(encoded bytes, PIL image decoded the way the baseline did) pairs."""
+    encoded = [scene(width, height, seed) for seed, (width, height) in enumerate(SIZES)]
+    folder = os.getenv("PARITY_IMAGES")
+    if folder:
+        encoded += [encode(image) for image in load_images(folder, 16)]
+    return [(data, Image.open(io.BytesIO(data)).convert("RGB")) for data in encoded]
+
+
+@pytest.fixture(scope="module")
+def processor():
+    transformers = pytest.importorskip("transformers")
+    try:
+        return transformers.AutoImageProcessor.from_pretrained(ORGANIC_MODEL_NAME)
+    except OSError as e:
+        pytest.skip(f"cannot load the {ORGANIC_MODEL_NAME} image processor: {e}")
+
+
+def general_inputs(samples):
+    ours = general_batch([prepare_image(data) for data, _ in samples])
+    baseline = torch.stack([baseline_general(image) for _, image in samples])
+    return ours, baseline
+
+
+def food_inputs(samples, processor):
+    spec = NormalizeSpec.from_processor(processor)
+    ours = food_batch([prepare_image(data) for data, _ in samples], spec)
+    baseline = np.concatenate([
+        processor(images=image, return_tensors="np")["pixel_values"] for _, image in samples
+    ])
+    return ours, baseline
+
+
+def assert_close(ours, baseline, mean_atol, p99_atol):
+    assert ours.shape == baseline.shape
+    for index, diff in enumerate(np.abs(np.asarray(ours) - np.asarray(baseline))):
+        assert diff.mean() <= mean_atol, f"sample {index}: mean difference {diff.mean():.4f}"
+        assert np.percentile(diff, 99) <= p99_atol, f"sample {index}: p99 difference {np.percentile(diff, 99):.4f}"
+
+
+def assert_same_top1(ours_probs, baseline_probs):
+    ours_probs, baseline_probs = np.asarray(ours_probs), np.asarray(baseline_probs)
+    top2 = np.sort(baseline_probs, axis=1)[:, -2:]
+    clear = top2[:, 1] - top2[:, 0] >= TOP1_MARGIN
+    agree = ours_probs.argmax(axis=1) == baseline_probs.argmax(axis=1)
+    assert agree[clear].all(), f"top-1 differs on samples {np.flatnonzero(clear & ~agree).tolist()}"
+
+
+def test_general_batch_matches_torchvision(samples):
+    ours, baseline = general_inputs(samples)
+
+    assert ours.dtype == baseline.dtype == torch.float32
+    assert_close(ours.numpy(), baseline.numpy(), GENERAL_MEAN_ATOL, GENERAL_P99_ATOL)
+
+
+def test_food_batch_matches_image_processor(samples, processor):
+    ours, baseline = food_inputs(samples, processor)
+
+    assert_close(ours, baseline, FOOD_MEAN_ATOL, FOOD_P99_ATOL)
+
+
+def test_general_model_top1_agrees(samples):
+    from app.services.classifier import GENERAL_WEIGHTS, load_general_model
+
+    if not os.path.exists(GENERAL_WEIGHTS):
+        pytest.skip(f"no eager weights at {GENERAL_WEIGHTS}")
+    model = load_general_model()
+    ours, baseline = general_inputs(samples)
+    with torch.no_grad():
+        ours_probs = torch.softmax(model(ours), dim=1)
+        baseline_probs = torch.softmax(model(baseline), dim=1)
+
+    assert_same_top1(ours_probs, baseline_probs)
+
+
+def test_food_model_top1_agrees(samples, processor):
+    from app.services.organic import load_organic_model
+
+    try:
+        model = load_organic_model("torch")
+    except OSError as e:
+        pytest.skip(f"cannot load {ORGANIC_MODEL_NAME}: {e}")
+    ours, baseline = food_inputs(samples, processor)
+
+    assert_same_top1(model.predict_pixels(ours), model.predict_pixels(baseline))
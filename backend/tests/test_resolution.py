@@ -0,0 +1,57 @@
+import pytest
+
+from app.services.resolution import ResolutionPolicy, parse_profiles, round_imgsz
+
+
+def test_round_imgsz_to_stride():
+    assert round_imgsz(640) == 640
+    assert round_imgsz(500) == 512
+    assert round_imgsz(360) == 352
+    assert round_imgsz(10) == 32
+    assert round_imgsz(100, minimum=320) == 320
+
+
+def test_parse_profiles():
+    assert parse_profiles("stream=320, detect=1000,bad,") == {"stream": 320, "detect": 992}
+    assert parse_profiles("") == {}
+
+
+def make_policy(load, profiles=None, downscale_depth=4):
+    policy = ResolutionPolicy(profiles or {}, default=640, min_imgsz=320, downscale_depth=downscale_depth)
+    policy.add_load(lambda: load["waiting"])
+    return policy
+
+
+def test_profiles_override_the_default():
+    policy = make_policy({"waiting": 0}, {"stream": 416})
+
+    assert policy.imgsz("stream") == 416
+    assert policy.imgsz("detect") == 640
+    assert policy.base_imgsz("stream") == 416
+
+
+@pytest.mark.parametrize("waiting, expected", [(0, 640), (3, 640), (4, 480), (8, 352), (12, 320), (100, 320)])
+def test_downscales_with_queue_depth(waiting, expected):
+    assert make_policy({"waiting": waiting}).imgsz("detect") == expected
+
+
+def test_never_scales_a_small_profile_up_to_the_minimum():
+    policy = make_policy({"waiting": 40}, {"stream": 256})
+
+    assert policy.imgsz("stream") == 256
+
+
+def test_downscaling_disabled():
+    policy = make_policy({"waiting": 100}, downscale_depth=0)
+
+    assert policy.imgsz("detect") == 640
+
+
+def test_load_sources_are_summed_and_requests_counted():
+    load = {"waiting": 2}
+    policy = make_policy(load)
+    policy.add_load(lambda: 2)
+
+    assert policy.load() == 4
+    assert policy.imgsz("resolution-test") == 480
+    assert policy.stats()["requests"]["resolution-test@480"] >= 1
@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+from app.services.result_cache import HIT, MISS, ResultCache, SingleFlight, cached_inference
+
+
+def test_put_then_hit():
+    cache = ResultCache(max_bytes=1 << 20, ttl=60)
+    value, status, digest, phash = cache.lookup("detect", b"image")
+    assert (value, status) == (None, MISS)
+
+    cache.put("detect", digest, [{"class_name": "bottle"}], phash)
+
+    assert cache.lookup("detect", b"image")[:2] == ([{"class_name": "bottle"}], HIT)
+    assert cache.lookup("classify", b"image")[1] == MISS
+
+
+def test_expired_entries_miss():
+    cache = ResultCache(max_bytes=1 << 20, ttl=60)
+    digest = cache.lookup("detect", b"image")[2]
+    cache.put("detect", digest, [])
+    cache._entries[("detect", digest)].expires_at = time.time() - 1
+
+    assert cache.lookup("detect", b"image")[1] == MISS
+    assert cache.stats()["entries"] == 0
+
+
+def test_evicts_least_recently_used_beyond_max_bytes():
+    cache = ResultCache(max_bytes=30, ttl=60)
+    for image in (b"a", b"b"):
+        cache.put("detect", cache.lookup("detect", image)[2], "x" * 10)
+    # Touch "a" so "b" is the oldest entry
+    cache.lookup("detect", b"a")
+    cache.put("detect", cache.lookup("detect", b"c")[2], "x" * 10)
+
+    assert cache.lookup("detect", b"a")[1] == HIT
+    assert cache.lookup("detect", b"b")[1] == MISS
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_hit_keeps_the_disk_expiry(tmp_path):
+    path = str(tmp_path / "cache.db")
+    writer = ResultCache(max_bytes=1 << 20, ttl=60, disk_path=path)
+    digest = writer.lookup("detect", b"image")[2]
+    writer.put("detect", digest, [1])
+    expires_at = time.time() + 5
+    writer._db.execute("UPDATE results SET expires_at = ?", (expires_at,))
+
+    reader = ResultCache(max_bytes=1 << 20, ttl=60, disk_path=path)
+
+    assert reader.lookup("detect", b"image")[:2] == ([1], HIT)
+    assert reader.stats()["disk_hits"] == 1
+    assert reader._entries[("detect", digest)].expires_at == expires_at
+
+
+def test_cached_inference_skips_uncacheable_results():
+    cache = ResultCache(max_bytes=1 << 20, ttl=60)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"error": "bad image"}
+
+    async def run():
+        for _ in range(2):
+            await cached_inference(cache, "classify", b"image", compute, cacheable=lambda r: r["error"] is None)
+
+    asyncio.run(run())
+
+    assert len(calls) == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_cached_inference_does_not_cache_failures():
+    cache = ResultCache(max_bytes=1 << 20, ttl=60)
+
+    async def compute():
+        raise ValueError("Invalid image data")
+
+    async def run():
+        try:
+            await cached_inference(cache, "detect", b"image", compute)
+        except ValueError:
+            return True
+        return False
+
+    assert asyncio.run(run())
+    assert cache.stats()["entries"] == 0
+
+
+def test_single_flight_shares_one_computation():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def run():
+        return await asyncio.gather(*(flight.run("detect", "digest", compute) for _ in range(3)))
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert [value for value, _ in results] == ["result"] * 3
+    assert [leader for _, leader in results] == [True, False, False]
+    assert flight.in_flight == 0
@@ -0,0 +1,119 @@
+import json
+import pickle
+
+import msgpack
+import numpy as np
+import pytest
+
+from app.models.detection import Detection, to_columns
+from app.models.schemas import WasteCategory
+from app.services import serialization
+from app.services.serialization import dumps, dumps_msgpack, encode_response, wants_msgpack
+
+
+def make_detection(tier=None):
+    return Detection("bottle", "non-organic", 0.9, [1.0, 2.0, 3.0, 4.0], tier)
+
+
+def test_detection_reads_like_a_dict():
+    detection = make_detection()
+
+    assert detection["bbox"] == [1.0, 2.0, 3.0, 4.0]
+    assert "tier" not in detection
+    assert len(detection) == 4
+    assert detection.get("tier", "none") == "none"
+    assert {**detection} == {
+        "class_name": "bottle",
+        "waste_category": "non-organic",
+        "confidence": 0.9,
+        "bbox": [1.0, 2.0, 3.0, 4.0],
+    }
+    with pytest.raises(KeyError):
+        detection["tier"]
+
+
+def test_detection_tier_and_assignment():
+    detection = make_detection()
+    detection["tier"] = "s"
+
+    assert "tier" in detection
+    assert list(detection) == ["class_name", "waste_category", "confidence", "bbox", "tier"]
+    assert detection.to_dict()["tier"] == "s"
+    with pytest.raises(KeyError):
+        detection["track_id"] = 1
+
+
+def test_detection_pickles_for_the_model_server():
+    detection = pickle.loads(pickle.dumps(make_detection("m")))
+
+    assert isinstance(detection, Detection)
+    assert detection.to_dict() == make_detection("m").to_dict()
+
+
+def test_to_columns():
+    columns = to_columns([make_detection(), Detection("cup", "non-organic", 0.5, [0, 0, 1, 1])])
+
+    assert columns["class_name"] == ["bottle", "cup"]
+    assert columns["confidence"] == [0.9, 0.5]
+    assert "track_id" not in columns
+    assert to_columns([])["bbox"] == []
+
+
+CONTENT = {
+    "success": True,
+    "detections": [make_detection("n")],
+    "category": WasteCategory.COMPOST,
+    "scores": np.array([0.5, 0.25]),
+    "count": np.int64(2),
+}
+EXPECTED = {
+    "success": True,
+    "detections": [make_detection("n").to_dict()],
+    "category": "compost",
+    "scores": [0.5, 0.25],
+    "count": 2,
+}
+
+
+def test_json_round_trip():
+    assert json.loads(dumps(CONTENT)) == EXPECTED
+
+
+def test_json_round_trip_without_orjson(monkeypatch):
+    monkeypatch.setattr(serialization, "orjson", None)
+
+    assert json.loads(dumps(CONTENT)) == EXPECTED
+
+
+def test_msgpack_round_trip():
+    assert msgpack.unpackb(dumps_msgpack(CONTENT), raw=False) == EXPECTED
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("application/msgpack", True),
+    ("application/x-msgpack, application/json;q=0.5", True),
+    ("application/json", False),
+    ("*/*", False),
+    (None, False),
+])
+def test_wants_msgpack(accept, expected):
+    assert wants_msgpack(accept) is expected
+
+
+def test_wants_msgpack_without_msgpack_installed(monkeypatch):
+    monkeypatch.setattr(serialization, "msgpack", None)
+
+    assert not wants_msgpack("application/msgpack")
+
+
+def test_encode_response_negotiates_on_accept():
+    json_response = encode_response(CONTENT, "application/json", headers={"X-Cache": "MISS"})
+    msgpack_response = encode_response(CONTENT, "application/msgpack", status_code=201)
+
+    assert json_response.media_type == "application/json"
+    assert json_response.headers["vary"] == "Accept"
+    assert json_response.headers["x-cache"] == "MISS"
+    assert json.loads(json_response.body) == EXPECTED
+    assert msgpack_response.status_code == 201
+    assert msgpack_response.media_type == "application/msgpack"
+    assert msgpack.unpackb(msgpack_response.body, raw=False) == EXPECTED
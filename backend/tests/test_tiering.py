@@ -0,0 +1,140 @@
+import threading
+import time
+
+import numpy as np
+
+from app.models.detection import TieredDetector
+from app.services.tiering import EWMA_ALPHA, TierScheduler, parse_tiers
+
+
+def make_scheduler(waiting=0, **kwargs):
+    options = {"slo_seconds": 0.2, "escalate_confidence": 0.5, "reprobe_seconds": 0}
+    options.update(kwargs)
+    scheduler = TierScheduler(["n", "s", "m"], **options)
+    scheduler.add_load(lambda: waiting)
+    return scheduler
+
+
+def test_parse_tiers():
+    assert parse_tiers(" n, s ,m") == ["n", "s", "m"]
+    assert parse_tiers("") == ["n"]
+
+
+def test_unmeasured_tiers_are_probed_not_picked():
+    idle, busy = make_scheduler(waiting=0), make_scheduler(waiting=1)
+
+    assert idle.pick() == busy.pick() == "n"
+    assert idle.probe_due() == ["s", "m"]
+    # Probes wait for a quiet moment too
+    assert busy.probe_due() == []
+
+
+def test_picks_largest_tier_within_slo():
+    scheduler = make_scheduler(waiting=1)
+    scheduler.observe("n", 0.01)
+    scheduler.observe("s", 0.05)
+    scheduler.observe("m", 0.15)
+
+    # (1 waiting + 1) * 0.15 is over the SLO, 2 * 0.05 is not
+    assert scheduler.pick() == "s"
+
+
+def test_observe_keeps_a_moving_average():
+    scheduler = make_scheduler()
+    scheduler.observe("s", 0.1)
+    scheduler.observe("s", 0.2)
+
+    assert scheduler.latency["s"] == EWMA_ALPHA * 0.2 + (1 - EWMA_ALPHA) * 0.1
+
+
+def test_tier_over_the_slo_is_never_picked():
+    scheduler = make_scheduler(waiting=0)
+    scheduler.observe("s", 0.05)
+    scheduler.observe("m", 0.5)
+
+    assert scheduler.pick() == "s"
+    assert scheduler.escalation("s", spent=0.0) is None
+    assert scheduler.probe_due() == []
+
+
+def test_stale_estimate_is_replaced_by_the_next_probe():
+    scheduler = make_scheduler(reprobe_seconds=30)
+    scheduler.observe("m", 0.1)
+    scheduler.observed_at["m"] -= 60
+
+    # Not routed to on an old measurement; probed again instead
+    assert scheduler.pick() == "n"
+    assert scheduler.probe_due() == ["s", "m"]
+    scheduler.observe("m", 10.0)
+    assert scheduler.latency["m"] == 10.0
+
+
+def test_escalation_accounts_for_time_spent_and_images():
+    scheduler = make_scheduler()
+    scheduler.observe("s", 0.05)
+
+    assert scheduler.escalation("n", spent=0.05) == "s"
+    assert scheduler.escalation("n", spent=0.05, images=4) is None
+    assert scheduler.escalation("n", spent=0.18) is None
+    assert scheduler.escalation("m", spent=0.0) is None
+
+
+def test_escalation_disabled_without_confidence_threshold():
+    scheduler = make_scheduler(escalate_confidence=0.0)
+    scheduler.observe("s", 0.01)
+
+    assert scheduler.escalation("n", spent=0.0) is None
+
+
+def test_low_confidence_ignores_empty_results():
+    scheduler = make_scheduler()
+
+    assert not scheduler.low_confidence([])
+    assert scheduler.low_confidence([{"confidence": 0.3}])
+    assert not scheduler.low_confidence([{"confidence": 0.9}])
+
+
+class StubDetector:
+    def __init__(self, tier, seconds, calls):
+        self.tier = tier
+        self.seconds = seconds
+        self.calls = calls
+
+    def warm_up(self):
+        self.calls.append((self.tier, "warm_up"))
+
+    def detect_batch_timed(self, images, scales=None, imgsz=None):
+        self.calls.append((self.tier, "probe" if not images[0].any() else "request"))
+        return [[] for _ in images], self.seconds
+
+
+def test_larger_tiers_are_loaded_and_measured_off_the_request_path():
+    calls, loaded = [], []
+    stubs = {"n": StubDetector("n", 0.01, calls), "s": StubDetector("s", 0.05, calls)}
+    scheduler = make_scheduler()
+    detector = TieredDetector(scheduler)
+    detector.imgsz = 64
+    detector.detector = lambda tier: loaded.append(tier) or stubs[tier]
+    probed = threading.Event()
+    probe = detector.probe
+    detector.probe = lambda tiers: (probe(tiers), probed.set())
+    frame = np.ones((64, 64, 3), dtype=np.uint8)
+
+    detector.detect_batch([frame])
+
+    assert probed.wait(2)
+    # The request ran on "n"; "s" and "m" were only touched by the probe
+    # ("m" has no stub, so its probe fails and it stays unmeasured)
+    assert calls[:2] == [("n", "warm_up"), ("n", "request")]
+    assert ("s", "probe") in calls and ("s", "request") not in calls
+    assert scheduler.latency["s"] == 0.05
+    assert scheduler.latency["m"] is None
+
+    deadline = time.monotonic() + 2
+    while detector._probe_lock.locked() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    calls.clear()
+    detector.probe = lambda tiers: None
+    detector.detect_batch([frame])
+
+    assert ("s", "request") in calls
@@ -0,0 +1,105 @@
+import asyncio
+
+import numpy as np
+
+from app.services.tracking import DetectionSession, IouTracker, iou_matrix
+
+
+def detection(bbox, class_name="bottle", confidence=0.8):
+    return {"class_name": class_name, "waste_category": "non-organic", "confidence": confidence, "bbox": bbox}
+
+
+def test_iou_matrix():
+    boxes = np.array([[0, 0, 10, 10], [5, 0, 10, 10], [20, 20, 5, 5]], dtype=float)
+
+    ious = iou_matrix(boxes[:1], boxes)
+
+    np.testing.assert_allclose(ious, [[1.0, 50 / 150, 0.0]])
+    assert iou_matrix(boxes, np.empty((0, 4))).shape == (3, 0)
+
+
+def test_tracker_keeps_ids_and_predicts_motion():
+    tracker = IouTracker(iou_threshold=0.3, smoothing=0.5)
+    first = tracker.update([detection([0, 0, 10, 10], confidence=0.8)])
+    track_id = first[0]["track_id"]
+
+    second = tracker.update([detection([2, 0, 10, 10], confidence=0.6)])
+
+    assert second[0]["track_id"] == track_id
+    assert second[0]["confidence"] == 0.7
+    assert tracker.predict()[0]["bbox"] == [4.0, 0.0, 10.0, 10.0]
+
+
+def test_tracker_does_not_match_other_classes():
+    tracker = IouTracker()
+    first = tracker.update([detection([0, 0, 10, 10], "bottle")])
+    second = tracker.update([detection([0, 0, 10, 10], "cup")])
+
+    assert second[0]["track_id"] != first[0]["track_id"]
+
+
+def test_unmatched_tracks_expire_after_max_misses():
+    tracker = IouTracker(max_misses=1)
+    tracker.update([detection([0, 0, 10, 10])])
+
+    assert tracker.update([]) == []
+    assert len(tracker.tracks) == 1
+    tracker.update([])
+    assert tracker.tracks == []
+
+
+class RecordingDetector:
+    def __init__(self, detections):
+        self.detections = detections
+        self.calls = []
+
+    async def __call__(self, image_np, imgsz=None, scale=1):
+        self.calls.append((image_np.shape, imgsz, scale))
+        return [
+            {**d, "bbox": [v * scale for v in d["bbox"]]}
+            for d in self.detections
+        ]
+
+
+def run(session, frames, scale=1):
+    async def process_all():
+        return [await session.process(frame, scale) for frame in frames]
+    return asyncio.run(process_all())
+
+
+def test_session_detects_every_nth_frame():
+    detect = RecordingDetector([detection([10, 10, 20, 20])])
+    session = DetectionSession(detect, detect_every=3)
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+
+    results = run(session, [frame] * 7)
+
+    assert [keyframe for _, keyframe in results] == [True, False, False, True, False, False, True]
+    assert len(detect.calls) == 3
+    assert {d["track_id"] for detections, _ in results for d in detections} == {1}
+
+
+def test_session_redetects_on_scene_change():
+    detect = RecordingDetector([])
+    session = DetectionSession(detect, detect_every=10, scene_change_threshold=12.0)
+    dark = np.zeros((120, 160, 3), dtype=np.uint8)
+    bright = np.full((120, 160, 3), 255, dtype=np.uint8)
+
+    results = run(session, [dark, dark, bright])
+
+    assert [keyframe for _, keyframe in results] == [True, False, True]
+
+
+def test_roi_keyframes_keep_original_frame_coordinates():
+    # Frames decoded at half scale: 320x240 originals arrive as 160x120
+    detect = RecordingDetector([detection([10, 10, 10, 10])])
+    session = DetectionSession(detect, detect_every=1, imgsz=lambda: 320, roi_full_every=2, roi_max_area=0.9)
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+
+    (full, _), (cropped, _) = run(session, [frame, frame], scale=2)
+
+    assert full[0]["bbox"] == [20.0, 20.0, 20.0, 20.0]
+    # The ROI grows the track by a 32 px margin in original coordinates
+    assert session.last_roi == [0, 0, 72, 72]
+    assert detect.calls[1] == ((36, 36, 3), 64, 2)
+    assert cropped[0]["bbox"] == [20.0, 20.0, 20.0, 20.0]
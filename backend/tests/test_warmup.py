@@ -0,0 +1,87 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app import config
+from app import main
+from app.services import model_registry
+from app.services.model_registry import ModelRegistry, ModelState, ModelsWarmingUpError
+
+
+@pytest.fixture
+def loads():
+    return []
+
+
+@pytest.fixture
+def registry(monkeypatch, loads):
+    registry = ModelRegistry()
+    for name in ("yolo", "general"):
+        registry.register(name, lambda name=name: loads.append(name) or name)
+    registry.register("broken", lambda: 1 / 0)
+    monkeypatch.setattr(model_registry, "registry", registry)
+    monkeypatch.setattr(config, "INFERENCE_MODE", "local")
+    monkeypatch.setattr(config, "WARMUP_MODELS", "yolo,general")
+    monkeypatch.setattr(main, "detect_buffer", lambda contents, imgsz=None: [])
+    return registry
+
+
+def post(path, **kwargs):
+    async def call():
+        async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+            return await client.post(path, **kwargs)
+    return asyncio.run(call())
+
+
+def post_frame():
+    return post("/detect-binary", content=b"frame", headers={"content-type": "application/octet-stream"})
+
+
+def test_pending_skips_loaded_and_failed_models(registry):
+    registry.get("yolo")
+    registry.warm_up(["broken"])
+
+    assert registry.pending(["yolo", "general", "broken"]) == ["general"]
+    assert registry.status()["broken"]["state"] == ModelState.FAILED
+
+
+def test_cold_requests_answer_503_without_loading(registry, loads):
+    detect = post_frame()
+    classify = post("/api/classify", json={"image_data": "aGVsbG8="})
+
+    for response in (detect, classify):
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == str(config.RETRY_AFTER_SECONDS)
+        assert response.json()["detail"] == "Models still warming up: yolo, general"
+    # The request did not start the load itself; that is the warm-up's job
+    assert loads == []
+
+
+def test_requests_pass_once_warm_up_has_finished(registry, loads):
+    registry.get("yolo")
+    assert post_frame().status_code == 503
+
+    registry.warm_up(["yolo", "general"])
+    response = post_frame()
+
+    assert response.status_code == 200
+    assert response.json()["success"] is False
+    assert loads == ["yolo", "general"]
+
+
+def test_empty_warm_up_list_never_gates(registry):
+    config.WARMUP_MODELS = ""
+
+    assert post_frame().status_code == 200
+
+
+def test_server_mode_leaves_the_check_to_the_model_server(registry):
+    config.INFERENCE_MODE = "server"
+
+    model_registry.require_warm_models()
+
+    config.INFERENCE_MODE = "local"
+    with pytest.raises(ModelsWarmingUpError) as pending:
+        model_registry.require_warm_models()
+    assert pending.value.pending == ["yolo", "general"]
@@ -0,0 +1,124 @@
+import types
+
+import pytest
+
+from app.services import weight_ledger as weight_ledger_module
+from app.services.weight_ledger import WeightLedger, bucket_start
+
+DAY = 86400
+HOUR = 3600
+# A UTC midnight
+T0 = 1_700_006_400
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = WeightLedger(str(tmp_path / "ledger.db"))
+    yield ledger
+    ledger.close()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {"t": T0}
+    monkeypatch.setattr(weight_ledger_module, "time", types.SimpleNamespace(time=lambda: now["t"]))
+    return now
+
+
+def record_at(ledger, clock, ts, category, weight, site=""):
+    clock["t"] = ts
+    return ledger.record(category, weight, site)
+
+
+def test_bucket_start():
+    assert bucket_start(T0 + 5 * HOUR + 10, HOUR) == T0 + 5 * HOUR
+    assert bucket_start(T0 + 5 * HOUR + 10, DAY) == T0
+
+
+def test_totals_per_site_and_reset(ledger):
+    futures = [
+        ledger.record("compost", 1.5, "a"),
+        ledger.record("compost", 2.0, "b"),
+        ledger.record("biogas", 0.5, "a"),
+    ]
+    for future in futures:
+        future.result(timeout=5)
+
+    assert ledger.totals()["compost"] == 3.5
+    site_a = ledger.totals("a")
+    assert (site_a["compost"], site_a["biogas"], site_a["non-organic"]) == (1.5, 0.5, 0.0)
+
+    ledger.reset("a").result(timeout=5)
+
+    assert ledger.totals("a")["compost"] == 0.0
+    assert ledger.totals("b")["compost"] == 2.0
+
+
+def test_reset_applies_after_weigh_ins_queued_before_it(ledger):
+    ledger.record("compost", 1.0)
+    ledger.reset()
+    ledger.record("compost", 2.0).result(timeout=5)
+
+    assert ledger.totals()["compost"] == 2.0
+
+
+def test_history_and_window_totals(ledger, clock):
+    record_at(ledger, clock, T0 + 1 * HOUR, "compost", 1.0)
+    record_at(ledger, clock, T0 + 1 * HOUR + 60, "compost", 2.0)
+    record_at(ledger, clock, T0 + DAY + 2 * HOUR, "compost", 4.0)
+    record_at(ledger, clock, T0 + 2 * DAY + 3 * HOUR, "biogas", 8.0).result(timeout=5)
+
+    hourly = ledger.history("hour", T0, T0 + DAY)
+    assert [(entry["start"], entry["weights"]["compost"]) for entry in hourly] == [(T0 + HOUR, 3.0)]
+
+    daily = ledger.history("day", T0, T0 + 3 * DAY)
+    assert [entry["start"] for entry in daily] == [T0, T0 + DAY, T0 + 2 * DAY]
+
+    # Partial first and last days come from the hourly rollups
+    window = ledger.window_totals(T0 + HOUR, T0 + 2 * DAY + 4 * HOUR)
+    assert window["compost"] == 7.0
+    assert window["biogas"] == 8.0
+    assert ledger.window_totals(T0 + 2 * HOUR, T0 + DAY)["compost"] == 0.0
+
+
+def test_close_flushes_queued_weigh_ins(tmp_path):
+    path = str(tmp_path / "ledger.db")
+    ledger = WeightLedger(path)
+    for _ in range(100):
+        ledger.record("compost", 1.0)
+    ledger.close()
+
+    reopened = WeightLedger(path)
+    try:
+        assert reopened.totals()["compost"] == 100.0
+    finally:
+        reopened.close()
+
+
+def test_weight_endpoints_serialize_without_warnings(ledger, monkeypatch):
+    import asyncio
+    import warnings
+
+    import httpx
+    from fastapi import FastAPI
+
+    from app.routers import classification
+
+    monkeypatch.setattr(classification, "weight_ledger", ledger)
+    app = FastAPI()
+    app.include_router(classification.router, prefix="/api")
+
+    async def call_all():
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            update = await client.post("/api/update-weight", json={"category": "compost", "weight": 1.5})
+            summary = await client.get("/api/weight-summary")
+            history = await client.get("/api/weight-history")
+        return update, summary, history
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", UserWarning)
+        update, summary, history = asyncio.run(call_all())
+
+    assert update.json()["weights"]["compost"] == 1.5
+    assert summary.json()["total_weight"] == 1.5
+    assert history.json()["weights"]["compost"] == 1.5
@@ -8,7 +8,10 @@ import {
   classToWasteCategory,
   wasteCategoryBorderColors,
 } from '@/types/scan/index';
-import { classifyWasteFromBase64 } from '@/services/scan/api';
+import {
+  DetectionStream,
+  openDetectionStream,
+} from '@/services/scan/api';
 import Loader from './Loader';
 
 interface WebcamDetectionProps {
@@ -26,6 +29,7 @@ const WebcamDetection: React.FC<WebcamDetectionProps> = ({
 }) => {
   const webcamRef = useRef<Webcam>(null);
   const canvasRef = useRef<HTMLCanvasElement>(null);
+  const streamRef = useRef<DetectionStream | null>(null);
   const [model, setModel] = useState<cocoSsd.ObjectDetection | null>(null);
   const [isModelLoading, setIsModelLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
@@ -105,58 +109,67 @@ const WebcamDetection: React.FC<WebcamDetectionProps> = ({
     }
   }, [isDetecting, model, onDetection]);
 
-  const detectObjectsServerSide = useCallback(async () => {
-    if (!isDetecting || !webcamRef.current || !canvasRef.current) return;
+  const sendFrameToStream = useCallback(() => {
+    const stream = streamRef.current;
+    if (!stream || !webcamRef.current || !canvasRef.current) return;
 
     const video = webcamRef.current.video;
     if (!video || video.readyState !== 4) return;
 
-    const videoWidth = video.videoWidth;
-    const videoHeight = video.videoHeight;
-    video.width = videoWidth;
-    video.height = videoHeight;
-
-    canvasRef.current.width = videoWidth;
-    canvasRef.current.height = videoHeight;
+    if (canvasRef.current.width !== video.videoWidth) {
+      canvasRef.current.width = video.videoWidth;
+      canvasRef.current.height = video.videoHeight;
+    }
 
-    const imageSrc = webcamRef.current.getScreenshot();
-    if (!imageSrc) return;
+    const frameCanvas = webcamRef.current.getCanvas();
+    frameCanvas?.toBlob(
+      (blob) => {
+        if (blob) stream.sendFrame(blob);
+      },
+      'image/jpeg',
+      0.8
+    );
+  }, []);
 
-    try {
-      const response = await classifyWasteFromBase64(imageSrc);
+  useEffect(() => {
+    if (!isDetecting || !useBackend) return;
 
+    const stream = openDetectionStream((message) => {
       if (
-        response.success &&
-        response.all_detections &&
-        response.all_detections.length > 0
+        canvasRef.current &&
+        message.success &&
+        message.all_detections &&
+        message.all_detections.length > 0
       ) {
-        const detections: Detection[] = response.all_detections;
+        const detections: Detection[] = message.all_detections;
 
         drawBoundingBoxes(detections, canvasRef.current);
 
         onDetection(detections);
       }
+    });
+    streamRef.current = stream;
 
-      if (isDetecting) {
-        setTimeout(detectObjectsServerSide, detectionInterval);
-      }
-    } catch (error) {
-      console.error('Error detecting objects via backend:', error);
-      if (isDetecting) {
-        setTimeout(detectObjectsServerSide, detectionInterval);
-      }
-    }
-  }, [isDetecting, onDetection, detectionInterval]);
+    const frameTimer = setInterval(sendFrameToStream, detectionInterval);
+
+    return () => {
+      clearInterval(frameTimer);
+      stream.close();
+      streamRef.current = null;
+    };
+  }, [
+    isDetecting,
+    useBackend,
+    detectionInterval,
+    onDetection,
+    sendFrameToStream,
+  ]);
 
   useEffect(() => {
     const detectionTimer: NodeJS.Timeout | null = null;
 
-    if (isDetecting) {
-      if (useBackend) {
-        detectObjectsServerSide();
-      } else if (model && !isModelLoading) {
-        detectObjectsClientSide();
-      }
+    if (isDetecting && !useBackend && model && !isModelLoading) {
+      detectObjectsClientSide();
     }
 
     return () => {
@@ -164,14 +177,7 @@ const WebcamDetection: React.FC<WebcamDetectionProps> = ({
         clearTimeout(detectionTimer);
       }
     };
-  }, [
-    isDetecting,
-    model,
-    isModelLoading,
-    useBackend,
-    detectObjectsClientSide,
-    detectObjectsServerSide,
-  ]);
+  }, [isDetecting, model, isModelLoading, useBackend, detectObjectsClientSide]);
 
   const drawBoundingBoxes = (
     detections: Detection[],
@@ -35,8 +35,62 @@ export const classifyWasteFromBase64 = async (
   }
 };
 
+export interface DetectionStreamMessage extends ClassificationResponse {
+  frame?: number;
+  dropped?: number;
+  keyframe?: boolean;
+  roi?: [number, number, number, number] | null;
+}
+
+export interface DetectionStream {
+  sendFrame: (frame: Blob) => boolean;
+  close: () => void;
+}
+
+// Streams binary webcam frames to /ws/detect. The server only processes the
+// newest frame, so callers can send at their own pace without queueing.
+// With `track`, the server only runs full detection every `every` frames
+// (or on scene change) and tracks boxes in between.
+export const openDetectionStream = (
+  onMessage: (message: DetectionStreamMessage) => void,
+  onError?: (error: Event) => void,
+  options: { track?: boolean; every?: number } = {}
+): DetectionStream => {
+  const params = new URLSearchParams();
+  if (options.track) params.set('track', 'true');
+  if (options.every) params.set('every', String(options.every));
+  const query = params.toString() ? `?${params.toString()}` : '';
+
+  const socket = new WebSocket(
+    `${API_BASE_URL.replace(/^http/, 'ws')}/ws/detect${query}`
+  );
+  socket.binaryType = 'arraybuffer';
+
+  socket.onmessage = (event) => {
+    try {
+      onMessage(JSON.parse(event.data));
+    } catch (error) {
+      console.error('Invalid detection stream message:', error);
+    }
+  };
+  socket.onerror = (event) => {
+    console.error('Detection stream error:', event);
+    onError?.(event);
+  };
+
+  return {
+    sendFrame: (frame: Blob) => {
+      if (socket.readyState !== WebSocket.OPEN) return false;
+      socket.send(frame);
+      return true;
+    },
+    close: () => socket.close(),
+  };
+};
+
 const apiService = {
   classifyWasteFromBase64,
+  openDetectionStream,
 };
 
 export default apiService;
@@ -12,12 +12,15 @@ export interface Detection {
   waste_category: WasteCategory;
   confidence: number;
   bbox?: [number, number, number, number]; // [x, y, width, height]
+  track_id?: number; // stable id across frames when streaming with tracking
+  tier?: string; // YOLOv8 tier (n, s, m, ...) that produced the detection
 }
 
 export interface ClassificationResponse {
   success: boolean;
   top_detection?: Detection;
   all_detections?: Detection[];
+  tier?: string;
   message: string;
 }
 
@@ -11,6 +11,7 @@ export interface ClassificationResponse {
   category: WasteCategory | null;
   confidence: number;
   recyclable: boolean | null;
+  route?: string | null;
   error: string | null;
 }
 
@@ -18,6 +19,7 @@ export interface ClassificationResponse {
 export interface WeightUpdateRequest {
   category: WasteCategory;
   weight: number;
+  site?: string;
 }
 
 // Interface for weight summary response